@@ -1,6 +1,7 @@
 import asyncio
 import uuid
 from datetime import datetime
+from functools import partial
 from json import dumps
 
 from fastapi import Body, FastAPI, HTTPException, Request
@@ -35,6 +36,11 @@ class Task(BaseModel):
         data['created_at'] = self.created_at.isoformat()
         return data
 
+# Events buffered per task for its SSE client; streamed tokens are dropped
+# and the oldest events evicted once a slow (or absent) client falls behind
+TASK_QUEUE_SIZE = 1000
+
+
 class TaskManager:
     def __init__(self):
         self.tasks = {}
@@ -49,39 +55,51 @@ class TaskManager:
             status="pending"
         )
         self.tasks[task_id] = task
-        self.queues[task_id] = asyncio.Queue()
+        self.queues[task_id] = asyncio.Queue(maxsize=TASK_QUEUE_SIZE)
         return task
 
+    def _publish(self, task_id: str, event: dict):
+        queue = self.queues[task_id]
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
     async def update_task_step(self, task_id: str, step: int, result: str, step_type: str = "step"):
         if task_id in self.tasks:
             task = self.tasks[task_id]
             task.steps.append({"step": step, "result": result, "type": step_type})
-            await self.queues[task_id].put({
+            self._publish(task_id, {
                 "type": step_type,
                 "step": step,
                 "result": result
             })
-            await self.queues[task_id].put({
+            self._publish(task_id, {
                 "type": "status",
                 "status": task.status,
                 "steps": task.steps
             })
 
+    async def push_token(self, task_id: str, content: str):
+        # Streamed LLM text is forwarded live but not stored in task.steps
+        queue = self.queues.get(task_id)
+        if queue is not None and not queue.full():
+            queue.put_nowait({"type": "token", "content": content})
+
     async def complete_task(self, task_id: str):
         if task_id in self.tasks:
             task = self.tasks[task_id]
             task.status = "completed"
-            await self.queues[task_id].put({
+            self._publish(task_id, {
                 "type": "status",
                 "status": task.status,
                 "steps": task.steps
             })
-            await self.queues[task_id].put({"type": "complete"})
+            self._publish(task_id, {"type": "complete"})
 
     async def fail_task(self, task_id: str, error: str):
         if task_id in self.tasks:
             self.tasks[task_id].status = f"failed: {error}"
-            await self.queues[task_id].put({
+            self._publish(task_id, {
                 "type": "error",
                 "message": error
             })
@@ -99,18 +117,39 @@ async def create_task(prompt: str = Body(..., embed=True)):
     return {"task_id": task.id}
 
 from app.agent.manus import Manus
+from app.agent.pool import AgentPool
+from app.config import config
+from app.json_repair import repair_stats
+from app.llm import token_sink
+from app.telemetry import telemetry, telemetry_context
+
+
+agent_pool = AgentPool(
+    lambda: Manus(
+        name="Manus",
+        description="A versatile agent that can solve various tasks using multiple tools",
+        max_steps=30,
+        # Stream steps so their text reaches the task's token sink live
+        stream_tool_calls=True,
+    ),
+    config.agent_pool,
+)
+
+
+@app.on_event("startup")
+async def start_agent_pool():
+    await agent_pool.start()
+
+
+@app.on_event("shutdown")
+async def close_agent_pool():
+    await agent_pool.close()
 
 
 async def run_task(task_id: str, prompt: str):
     try:
         task_manager.tasks[task_id].status = "running"
 
-        agent = Manus(
-            name="Manus",
-            description="A versatile agent that can solve various tasks using multiple tools",
-            max_steps=30
-        )
-
         async def on_think(thought):
             await task_manager.update_task_step(task_id, 0, thought, "think")
 
@@ -152,7 +191,11 @@ async def run_task(task_id: str, prompt: str):
         sse_handler = SSELogHandler(task_id)
         logger.add(sse_handler)
 
-        result = await agent.run(prompt)
+        async with agent_pool.agent() as agent:
+            with telemetry_context(task_id=task_id), token_sink(
+                partial(task_manager.push_token, task_id)
+            ):
+                result = await agent.run(prompt)
         await task_manager.update_task_step(task_id, 1, result, "result")
         await task_manager.complete_task(task_id)
     except Exception as e:
@@ -238,6 +281,16 @@ async def get_task(task_id: str):
         raise HTTPException(status_code=404, detail="Task not found")
     return task_manager.tasks[task_id]
 
+@app.get("/telemetry")
+async def get_telemetry(task_id: str = None):
+    filters = {"task_id": task_id} if task_id else {}
+    return {
+        "summary": telemetry.summary(**filters),
+        "tokens_by_task": telemetry.tokens_by_task(),
+        "json_repair": repair_stats.summary(),
+        "agent_pool": agent_pool.stats(),
+    }
+
 @app.exception_handler(Exception)
 async def generic_exception_handler(request: Request, exc: Exception):
     return JSONResponse(
@@ -1,13 +1,24 @@
 from abc import ABC, abstractmethod
 from contextlib import asynccontextmanager
-from typing import List, Literal, Optional
-
-from pydantic import BaseModel, Field, model_validator
-
+from typing import ClassVar, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter, model_validator
+
+from app.budget import BudgetUsage, RunBudget
+from app.checkpoint import (
+    CheckpointState,
+    CheckpointWriter,
+    new_checkpoint_path,
+    planning_tools,
+)
+from app.compaction import MemoryCompactor
+from app.exceptions import BudgetExceeded
 from app.llm import LLM
 from app.logger import logger
+from app.loop_detection import LoopDetector
 from app.schema import AgentState, Memory, Message
-from app.config import config
+from app.telemetry import telemetry_context
+from app.config import BudgetSettings, config
 
 
 class BaseAgent(BaseModel, ABC):
@@ -32,6 +43,9 @@ class BaseAgent(BaseModel, ABC):
     # Dependencies
     llm: LLM = Field(default_factory=LLM, description="Language model instance")
     memory: Memory = Field(default_factory=Memory, description="Agent's memory store")
+    compactor: Optional[MemoryCompactor] = Field(
+        None, description="Summarizes old memory in the background when enabled"
+    )
     state: AgentState = Field(
         default=AgentState.IDLE, description="Current agent state"
     )
@@ -41,6 +55,31 @@ class BaseAgent(BaseModel, ABC):
     current_step: int = Field(default=0, description="Current step in execution")
 
     duplicate_threshold: int = 2
+    max_stuck_nudges: int = Field(
+        default=2,
+        description="Stuck detections answered with a change-of-strategy prompt before the run is stopped",
+    )
+    stuck_count: int = Field(default=0, description="Stuck detections in this run")
+    loop_detector: Optional[LoopDetector] = Field(
+        None, description="Incremental index of repeated content and tool calls"
+    )
+    checkpoint: Optional[CheckpointWriter] = Field(
+        None, description="Receives a checkpoint record after every step"
+    )
+    budget: BudgetSettings = Field(
+        default_factory=lambda: config.budget,
+        description="Wall-clock, token and cost limits per run and per step",
+    )
+    budget_usage: BudgetUsage = Field(
+        default_factory=BudgetUsage,
+        description="Consumption of the current run, updated as it progresses",
+    )
+
+    # Fields saved with each checkpoint record, besides memory
+    checkpoint_fields: ClassVar[Tuple[str, ...]] = ("state", "current_step")
+
+    # next_step_prompt as configured, before any stuck-state prompts
+    _initial_next_step_prompt: Optional[str] = PrivateAttr(default=None)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -54,6 +93,13 @@ class BaseAgent(BaseModel, ABC):
                 self.next_step_prompt = agent_config.next_step_prompt
             if agent_config.max_steps:
                 self.max_steps = agent_config.max_steps
+            if agent_config.duplicate_threshold:
+                self.duplicate_threshold = agent_config.duplicate_threshold
+            if agent_config.max_stuck_nudges is not None:
+                self.max_stuck_nudges = agent_config.max_stuck_nudges
+            if agent_config.budget:
+                self.budget = agent_config.budget
+        self._initial_next_step_prompt = self.next_step_prompt
 
     class Config:
         arbitrary_types_allowed = True
@@ -66,6 +112,8 @@ class BaseAgent(BaseModel, ABC):
             self.llm = LLM(config_name=self.name.lower())
         if not isinstance(self.memory, Memory):
             self.memory = Memory()
+        if self.compactor is None and config.compaction.enabled:
+            self.compactor = MemoryCompactor(config.compaction)
         return self
 
     @asynccontextmanager
@@ -94,6 +142,15 @@ class BaseAgent(BaseModel, ABC):
         finally:
             self.state = previous_state  # Revert to previous state
 
+    @asynccontextmanager
+    async def _checkpointing(self):
+        """Close the checkpoint file when a run ends, however it ends"""
+        try:
+            yield
+        finally:
+            if self.checkpoint:
+                self.checkpoint.close()
+
     def update_memory(
         self,
         role: Literal["user", "system", "assistant", "tool"],
@@ -136,28 +193,64 @@ class BaseAgent(BaseModel, ABC):
         Raises:
             RuntimeError: If the agent is not in IDLE state at start.
         """
+        if self.state == AgentState.FINISHED:
+            # Restored from the checkpoint of a run that had already finished
+            self.state = AgentState.IDLE
+            if not request:
+                logger.info(f"Agent '{self.name}' run already finished; not resuming")
+                return "No steps executed: run already finished"
         if self.state != AgentState.IDLE:
             raise RuntimeError(f"Cannot run agent from state: {self.state}")
 
         if request:
             self.update_memory("user", request)
 
+        if self.checkpoint is None and config.checkpoint.enabled:
+            self.checkpoint = CheckpointWriter(new_checkpoint_path(self.name))
+
         results: List[str] = []
-        async with self.state_context(AgentState.RUNNING):
+        self.stuck_count = 0
+        self.budget_usage = BudgetUsage()
+        budget = RunBudget(self.budget, self.budget_usage)
+        exhausted: Optional[str] = None
+        async with self.state_context(AgentState.RUNNING), self._checkpointing():
             while (
                 self.current_step < self.max_steps and self.state != AgentState.FINISHED
             ):
+                exhausted = budget.exhausted()
+                if exhausted:
+                    logger.warning(f"Agent '{self.name}' budget exhausted: {exhausted}")
+                    break
+
                 self.current_step += 1
                 logger.info(f"Executing step {self.current_step}/{self.max_steps}")
-                step_result = await self.step()
+                try:
+                    with telemetry_context(agent=self.name, step=self.current_step):
+                        async with budget.step():
+                            if self.compactor:
+                                self.compactor.update(self.memory, self.llm, self.name)
+                            step_result = await self.step()
+                except BudgetExceeded as e:
+                    logger.warning(f"Step {self.current_step} interrupted: {e.message}")
+                    self.handle_interrupted_step(e.message)
+                    step_result = f"Interrupted: {e.message}"
 
                 # Check for stuck state
                 if self.is_stuck():
                     self.handle_stuck_state()
 
+                if self.checkpoint:
+                    self.checkpoint.record_agent(self)
+
                 results.append(f"Step {self.current_step}: {step_result}")
 
-            if self.current_step >= self.max_steps:
+            if exhausted:
+                results.append(f"Terminated: Budget exhausted ({exhausted})")
+            elif self.stuck_count > self.max_stuck_nudges:
+                results.append(
+                    f"Terminated: Stuck repeating itself ({self.stuck_count} times)"
+                )
+            elif self.current_step >= self.max_steps:
                 results.append(f"Terminated: Reached max steps ({self.max_steps})")
 
         return "\n".join(results) if results else "No steps executed"
@@ -169,30 +262,80 @@ class BaseAgent(BaseModel, ABC):
         Must be implemented by subclasses to define specific behavior.
         """
 
+    def handle_interrupted_step(self, reason: str) -> None:
+        """Repair state left by a step its budget interrupted.
+
+        Subclasses whose steps can be cut off halfway, e.g. between a tool
+        call and its result, should override this.
+        """
+
     def handle_stuck_state(self):
-        """Handle stuck state by adding a prompt to change strategy"""
+        """Handle stuck state by adding a prompt to change strategy.
+
+        Once the agent has ignored `max_stuck_nudges` prompts, the run stops.
+        """
+        self.stuck_count += 1
+        if self.stuck_count > self.max_stuck_nudges:
+            logger.warning(
+                f"Agent still stuck after {self.max_stuck_nudges} prompts; stopping"
+            )
+            self.state = AgentState.FINISHED
+            return
+
         stuck_prompt = "\
         Observed duplicate responses. Consider new strategies and avoid repeating ineffective paths already attempted."
         self.next_step_prompt = f"{stuck_prompt}\n{self.next_step_prompt}"
         logger.warning(f"Agent detected stuck state. Added prompt: {stuck_prompt}")
 
     def is_stuck(self) -> bool:
-        """Check if the agent is stuck in a loop by detecting duplicate content"""
-        if len(self.memory.messages) < 2:
-            return False
-
-        last_message = self.memory.messages[-1]
-        if not last_message.content:
-            return False
-
-        # Count identical content occurrences
-        duplicate_count = sum(
-            1
-            for msg in reversed(self.memory.messages[:-1])
-            if msg.role == "assistant" and msg.content == last_message.content
-        )
+        """Check whether this step repeated earlier content or tool calls.
+
+        Repeats are counted by an incremental index, so the check only looks
+        at messages added since the previous one.
+        """
+        if self.loop_detector is None:
+            self.loop_detector = LoopDetector(threshold=self.duplicate_threshold)
+        return self.loop_detector.observe(self.memory.messages)
 
-        return duplicate_count >= self.duplicate_threshold
+    async def reset(self) -> None:
+        """Return the agent to a fresh state so it can serve another request.
+
+        The LLM client and tools are kept; memory, counters, loop detection
+        and checkpointing start over.
+        """
+        self.memory = Memory(max_messages=self.memory.max_messages)
+        self.state = AgentState.IDLE
+        self.current_step = 0
+        self.stuck_count = 0
+        self.budget_usage = BudgetUsage()
+        self.next_step_prompt = self._initial_next_step_prompt
+        self.loop_detector = None
+        if self.checkpoint:
+            self.checkpoint.close()
+        self.checkpoint = None
+        if self.compactor:
+            self.compactor.cancel()
+
+    def restore_checkpoint(self, state: CheckpointState) -> None:
+        """Restore memory, checkpointed fields and plans recorded for this agent"""
+        saved = state.agents.get(self.name)
+        if saved is None:
+            logger.warning(f"No checkpoint recorded for agent '{self.name}'")
+            return
+        self.memory.messages = saved.messages
+        # A run interrupted mid-step resumes from IDLE; a finished one stays
+        # FINISHED so that `run()` does not start new steps
+        self.state = AgentState.FINISHED if saved.finished else AgentState.IDLE
+        for name, value in saved.fields.items():
+            if name in self.checkpoint_fields and name != "state":
+                annotation = self.model_fields[name].annotation
+                setattr(self, name, TypeAdapter(annotation).validate_python(value))
+        for tool in planning_tools(self):
+            tool.plans.update(state.plans.get(self.name, {}))
+        logger.info(
+            f"Restored agent '{self.name}' at step {self.current_step} "
+            f"with {len(saved.messages)} messages"
+        )
 
     @property
     def messages(self) -> List[Message]:
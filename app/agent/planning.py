@@ -1,11 +1,12 @@
 import time
-from typing import Dict, List, Literal, Optional
+from typing import ClassVar, Dict, List, Literal, Optional, Tuple
 
 from pydantic import Field, model_validator
 
 from app.agent.toolcall import ToolCallAgent
 from app.logger import logger
 from app.prompt.planning import NEXT_STEP_PROMPT, PLANNING_SYSTEM_PROMPT
+from app.router import CallKind, route_llm
 from app.schema import Message, ToolCall
 from app.tool import PlanningTool, Terminate, ToolCollection
 
@@ -37,6 +38,14 @@ class PlanningAgent(ToolCallAgent):
 
     max_steps: int = 20
 
+    checkpoint_fields: ClassVar[Tuple[str, ...]] = (
+        "state",
+        "current_step",
+        "tool_calls",
+        "active_plan_id",
+        "current_step_index",
+    )
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
@@ -50,6 +59,12 @@ class PlanningAgent(ToolCallAgent):
 
         return self
 
+    async def reset(self) -> None:
+        await super().reset()
+        self.active_plan_id = f"plan_{int(time.time())}"
+        self.step_execution_tracker = {}
+        self.current_step_index = None
+
     async def think(self) -> bool:
         """Decide the next action based on plan status."""
         prompt = (
@@ -209,9 +224,11 @@ class PlanningAgent(ToolCallAgent):
             )
         ]
         self.memory.add_messages(messages)
-        response = await self.llm.ask_tool(
+        system_msgs = [Message.system_message(self.system_prompt)]
+        llm = route_llm(CallKind.PLAN, self.llm, messages, system_msgs, agent=self.name)
+        response = await llm.ask_tool(
             messages=messages,
-            system_msgs=[Message.system_message(self.system_prompt)],
+            system_msgs=system_msgs,
             tools=self.available_tools.to_params(),
             tool_choice="required",
         )
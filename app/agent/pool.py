@@ -0,0 +1,200 @@
+"""A pool of pre-initialized agents that tasks check out and return.
+
+Building an agent reads configuration and instantiates every tool, and the
+first shell or browser call then starts a process. A pool pays that once:
+agents are created (and, with `warm_up`, their tools started) ahead of
+demand, reset when returned, and handed to the next task ready to step.
+Heavy tools listed in `cold_tools`, by default the browser, start on first
+use instead of holding a process per idle agent.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Dict, Iterable, Optional, Tuple
+
+from app.agent.base import BaseAgent
+from app.config import AgentPoolSettings
+from app.logger import logger
+from app.tool.base import BaseTool
+
+
+def _tools(agent: BaseAgent) -> Iterable[BaseTool]:
+    return getattr(agent, "available_tools", None) or ()
+
+
+class AgentPool:
+    """Keeps between `min_size` and `max_size` agents built by `factory`.
+
+    Idle agents above `min_size` are closed after `idle_timeout`; idle agents
+    failing a tool health check are replaced. When `max_size` agents are in
+    use, `acquire` waits for one to be returned.
+    """
+
+    def __init__(self, factory: Callable[[], BaseAgent], settings: AgentPoolSettings):
+        self.factory = factory
+        self.settings = settings
+        # Idle agents with the time they were returned, oldest first
+        self._idle: Deque[Tuple[BaseAgent, float]] = deque()
+        self._slots = asyncio.Semaphore(settings.max_size)
+        self._in_use = 0
+        self._maintenance: Optional[asyncio.Task] = None
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    async def start(self) -> None:
+        """Create the minimum number of agents and start periodic maintenance"""
+        await self._fill()
+        self._maintenance = asyncio.create_task(self._maintain())
+
+    async def close(self) -> None:
+        """Stop maintenance and release every idle agent's resources"""
+        if self._maintenance:
+            self._maintenance.cancel()
+            self._maintenance = None
+        while self._idle:
+            agent, _ = self._idle.popleft()
+            await self._discard(agent)
+
+    async def acquire(self) -> BaseAgent:
+        """Check out a ready agent, creating one if none is idle"""
+        await self._slots.acquire()
+        try:
+            if self._idle:
+                # Most recently returned first, so surplus agents age out
+                agent, _ = self._idle.pop()
+                self.reused += 1
+            else:
+                agent = await self._create()
+        except BaseException:
+            self._slots.release()
+            raise
+        self._in_use += 1
+        return agent
+
+    async def release(self, agent: BaseAgent) -> None:
+        """Reset a checked-out agent and make it available again.
+
+        The agent's slot is freed however the reset ends; an agent whose
+        reset fails or is cancelled is discarded rather than reused.
+        """
+        self._in_use -= 1
+        healthy = False
+        try:
+            await agent.reset()
+            healthy = await self._healthy(agent)
+        except Exception as e:
+            logger.warning(f"Failed to reset pooled agent '{agent.name}': {e}")
+        finally:
+            try:
+                if healthy:
+                    self._idle.append((agent, time.monotonic()))
+                else:
+                    await self._discard(agent)
+            finally:
+                self._slots.release()
+
+    @asynccontextmanager
+    async def agent(self) -> AsyncIterator[BaseAgent]:
+        """Check out an agent for the duration of the block"""
+        agent = await self.acquire()
+        try:
+            yield agent
+        finally:
+            await self.release(agent)
+
+    async def check(self) -> None:
+        """Close surplus idle agents, replace unhealthy ones and refill"""
+        now = time.monotonic()
+        while (
+            self._idle
+            and len(self._idle) + self._in_use > self.settings.min_size
+            and now - self._idle[0][1] > self.settings.idle_timeout
+        ):
+            agent, _ = self._idle.popleft()
+            await self._discard(agent)
+
+        for agent, _ in list(self._idle):
+            if not await self._healthy(agent) and self._take_idle(agent):
+                logger.warning(f"Replacing unhealthy pooled agent '{agent.name}'")
+                await self._discard(agent)
+        await self._fill()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            "created": self.created,
+            "reused": self.reused,
+            "discarded": self.discarded,
+        }
+
+    async def _create(self) -> BaseAgent:
+        agent = self.factory()
+        if self.settings.warm_up:
+            await asyncio.gather(
+                *(
+                    self._warm_up(tool)
+                    for tool in _tools(agent)
+                    if tool.name not in self.settings.cold_tools
+                )
+            )
+        self.created += 1
+        return agent
+
+    @staticmethod
+    async def _warm_up(tool: BaseTool) -> None:
+        """Warm up one tool; on failure, leave it cold to start on first use"""
+        try:
+            await tool.warm_up()
+        except Exception as e:
+            logger.warning(f"Failed to warm up tool '{tool.name}': {e}")
+            try:
+                await tool.cleanup()
+            except Exception as e:
+                logger.warning(f"Failed to clean up tool '{tool.name}': {e}")
+
+    async def _fill(self) -> None:
+        missing = self.settings.min_size - len(self._idle) - self._in_use
+        if missing <= 0:
+            return
+        results = await asyncio.gather(
+            *(self._create() for _ in range(missing)), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.error(f"Failed to create pooled agent: {result}")
+            else:
+                self._idle.append((result, time.monotonic()))
+
+    async def _maintain(self) -> None:
+        while True:
+            await asyncio.sleep(self.settings.health_check_interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.warning(f"Agent pool maintenance failed: {e}")
+
+    async def _healthy(self, agent: BaseAgent) -> bool:
+        for tool in _tools(agent):
+            if not await tool.health_check():
+                return False
+        return True
+
+    async def _discard(self, agent: BaseAgent) -> None:
+        self.discarded += 1
+        for tool in _tools(agent):
+            try:
+                await tool.cleanup()
+            except Exception as e:
+                logger.warning(f"Failed to clean up tool '{tool.name}': {e}")
+
+    def _take_idle(self, agent: BaseAgent) -> bool:
+        """Remove an agent from the idle queue if it is still there"""
+        for i, (idle, _) in enumerate(self._idle):
+            if idle is agent:
+                del self._idle[i]
+                return True
+        return False
@@ -1,11 +1,15 @@
+import asyncio
 import json
-from typing import Any, List, Literal, Dict, Type
+from collections import defaultdict
+from typing import Any, ClassVar, List, Literal, Dict, Optional, Tuple, Type
 
-from pydantic import Field, model_validator
+from pydantic import Field, PrivateAttr, model_validator
 
 from app.agent.react import ReActAgent
+from app.json_repair import repair_json
 from app.logger import logger
 from app.prompt.toolcall import NEXT_STEP_PROMPT, SYSTEM_PROMPT
+from app.router import CallKind, route_llm
 from app.schema import AgentState, Message, ToolCall
 from app.tool import Bash, CreateChatCompletion, PlanningTool, Terminate, ToolCollection, BaseTool
 from app.config import config
@@ -15,6 +19,8 @@ from app.tool.google_search import GoogleSearch
 from app.tool.baidu_search import BaiduSearch
 from app.tool.brave_search import BraveSearch
 from app.tool.python_execute import PythonExecute
+from app.tool.retrieval import ToolIndex
+from app.tool.tool_collection import accepts_kwargs
 
 
 TOOL_CALL_REQUIRED = "Tool calls required but none provided"
@@ -48,8 +54,28 @@ class ToolCallAgent(ReActAgent):
 
     tool_calls: List[ToolCall] = Field(default_factory=list)
 
+    # Streaming tool calls: start independent (read-only) calls while the
+    # model is still writing the rest of its response
+    stream_tool_calls: bool = False
+
+    # Tool retrieval: send only the top-k tools relevant to the current
+    # context, plus the always-on ones (None sends every tool)
+    tool_top_k: Optional[int] = 5
+    always_on_tools: List[str] = Field(default_factory=lambda: [Terminate().name])
+
     max_steps: int = 30
 
+    checkpoint_fields: ClassVar[Tuple[str, ...]] = (
+        "state",
+        "current_step",
+        "tool_calls",
+    )
+
+    _early_results: Dict[str, asyncio.Task] = PrivateAttr(default_factory=dict)
+    _early_dispatch_open: bool = PrivateAttr(default=True)
+    _tool_index: Optional[ToolIndex] = PrivateAttr(default=None)
+    _send_all_tools: bool = PrivateAttr(default=False)
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         # Initialize tools based on configuration
@@ -77,17 +103,42 @@ class ToolCallAgent(ReActAgent):
             user_msg = Message.user_message(self.next_step_prompt)
             self.messages += [user_msg]
 
+        self._cancel_early_results()
+
+        system_msgs = (
+            [Message.system_message(self.system_prompt)]
+            if self.system_prompt
+            else None
+        )
+        llm = route_llm(
+            CallKind.STEP, self.llm, self.messages, system_msgs, agent=self.name
+        )
+
+        tools = self._select_tools()
+
         # Get response with tool options
-        response = await self.llm.ask_tool(
+        response = await llm.ask_tool(
             messages=self.messages,
-            system_msgs=[Message.system_message(self.system_prompt)]
-            if self.system_prompt
-            else None,
-            tools=self.available_tools.to_params(),
+            system_msgs=system_msgs,
+            tools=[tool.to_param() for tool in tools],
             tool_choice=self.tool_choices,
+            stream=self.stream_tool_calls,
+            on_tool_call=self._dispatch_early if self.stream_tool_calls else None,
+            on_stream_error=self._cancel_early_results,
         )
         self.tool_calls = response.tool_calls
 
+        # The model asked for a tool it was not shown: offer all tools next step
+        sent = {tool.name for tool in tools}
+        unseen = [
+            call.function.name
+            for call in response.tool_calls or []
+            if call.function.name not in sent
+        ]
+        if unseen:
+            logger.info(f"🔎 Tools {unseen} were not offered; sending all tools next step")
+            self._send_all_tools = True
+
         # Log response info
         logger.info(f"✨ {self.name}'s thoughts: {response.content}")
         logger.info(
@@ -146,22 +197,164 @@ class ToolCallAgent(ReActAgent):
             # Return last message content if no tool calls
             return self.messages[-1].content or "No content or commands to execute"
 
-        results = []
-        for command in self.tool_calls:
-            result = await self.execute_tool(command)
+        results = await self._execute_tool_calls(self.tool_calls)
+        for command, result in zip(self.tool_calls, results):
             logger.info(
                 f"🎯 Tool '{command.function.name}' completed its mission! Result: {result}"
             )
 
-            # Add tool response to memory
+            # Add tool responses to memory in the original call order
             tool_msg = Message.tool_message(
                 content=result, tool_call_id=command.id, name=command.function.name
             )
             self.memory.add_message(tool_msg)
-            results.append(result)
 
         return "\n\n".join(results)
 
+    async def _execute_tool_calls(self, commands: List[ToolCall]) -> List[str]:
+        """Run a step's tool calls, overlapping those that are safe to overlap.
+
+        Consecutive calls that their tools mark as safe to run concurrently
+        (read-only) run together; any other call waits for everything before
+        it and runs alone. Calls on the same tool `resource` never overlap.
+        Results are returned in call order.
+        """
+        results: List[str] = [""] * len(commands)
+        locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+        async def run(index: int, command: ToolCall) -> None:
+            early_result = self._early_results.pop(command.id, None)
+            if early_result:
+                results[index] = await early_result
+                return
+            tool = self.available_tools.get_tool(command.function.name)
+            if tool and tool.resource:
+                async with locks[tool.resource]:
+                    results[index] = await self.execute_tool(command)
+            else:
+                results[index] = await self.execute_tool(command)
+
+        batch = []
+        for index, command in enumerate(commands):
+            if self._can_run_concurrently(command):
+                batch.append(run(index, command))
+                continue
+            await asyncio.gather(*batch)
+            batch = []
+            await run(index, command)
+        await asyncio.gather(*batch)
+        return results
+
+    def _can_run_concurrently(self, command: ToolCall) -> bool:
+        tool = self.available_tools.get_tool(command.function.name)
+        if not tool:
+            return False
+        try:
+            args = json.loads(command.function.arguments or "{}")
+        except json.JSONDecodeError:
+            # Malformed arguments get repaired (or rejected) when run alone
+            return False
+        return isinstance(args, dict) and tool.can_run_concurrently(**args)
+
+    def _select_tools(self) -> List[BaseTool]:
+        """Tools to offer this step, ranked against the recent conversation"""
+        tools = self.available_tools.tools
+        send_all, self._send_all_tools = self._send_all_tools, False
+        if (
+            send_all
+            or not self.tool_top_k
+            or len(tools) <= self.tool_top_k + len(self.always_on_tools)
+        ):
+            return list(tools)
+
+        if self._tool_index is None or self._tool_index.tools is not tools:
+            self._tool_index = ToolIndex(tools)
+        selected = self._tool_index.select(
+            self._retrieval_query(),
+            self.tool_top_k,
+            always=self.always_on_tools,
+            recent=[m.name for m in self.messages[-6:] if m.role == "tool" and m.name],
+        )
+        return list(tools) if selected is None else selected
+
+    def _retrieval_query(self, window: int = 4) -> str:
+        """The task plus the latest messages, without the repeated step prompt"""
+        contents = [
+            m.content
+            for m in self.messages
+            if m.role != "system" and m.content and m.content != self.next_step_prompt
+        ]
+        return " ".join(contents[:1] + contents[1:][-window:])
+
+    def _dispatch_early(self, command: ToolCall) -> None:
+        """Start a streamed tool call before the rest of the response arrives.
+
+        Only the leading run of calls that may overlap other work is started
+        early: read-only calls on tools without a shared `resource`. Special
+        tools are never started early, as their state changes must wait for
+        the final response. Results are picked up by `act` in call order.
+        """
+        if self.tool_choices == "none" or not command.id:
+            return
+        if not self._early_dispatch_open:
+            return
+        tool = self.available_tools.get_tool(command.function.name)
+        if (
+            self._is_special_tool(command.function.name)
+            or not self._can_run_concurrently(command)
+            or tool.resource
+        ):
+            # Later calls may depend on this one, so they wait for `act`
+            self._early_dispatch_open = False
+            return
+        logger.info(f"⚡ Dispatching tool '{command.function.name}' early")
+        self._early_results[command.id] = asyncio.create_task(
+            self.execute_tool(command)
+        )
+
+    async def reset(self) -> None:
+        """Reset the agent and the per-task state of its tools"""
+        await super().reset()
+        self.tool_calls = []
+        self._cancel_early_results()
+        self._send_all_tools = False
+        for tool in self.available_tools:
+            await tool.reset()
+
+    def handle_interrupted_step(self, reason: str) -> None:
+        """Answer the tool calls an interrupted step left without results.
+
+        Every tool call in the history needs a result before the next LLM call.
+        """
+        self._cancel_early_results()
+        answered = set()
+        for message in reversed(self.memory.messages):
+            if message.role == "tool":
+                answered.add(message.tool_call_id)
+                continue
+            if message.role == "assistant":
+                for call in message.tool_calls or []:
+                    if call.id not in answered:
+                        self.memory.add_message(
+                            Message.tool_message(
+                                content=f"Error: Interrupted: {reason}",
+                                tool_call_id=call.id,
+                                name=call.function.name,
+                            )
+                        )
+            break
+        self.tool_calls = []
+
+    def _cancel_early_results(self) -> None:
+        """Drop early-dispatched tool calls that were never consumed by `act`.
+
+        Early dispatch starts over with the next (or retried) response.
+        """
+        for task in self._early_results.values():
+            task.cancel()
+        self._early_results.clear()
+        self._early_dispatch_open = True
+
     async def execute_tool(self, command: ToolCall) -> str:
         """Execute a single tool call with robust error handling"""
         if not command or not command.function or not command.function.name:
@@ -172,8 +365,8 @@ class ToolCallAgent(ReActAgent):
             return f"Error: Unknown tool '{name}'"
 
         try:
-            # Parse arguments
-            args = json.loads(command.function.arguments or "{}")
+            # Parse arguments, repairing common breakage locally if needed
+            args = self._parse_arguments(name, command.function.arguments or "{}")
 
             # Execute the tool
             logger.info(f"🔧 Activating tool: '{name}'...")
@@ -201,6 +394,19 @@ class ToolCallAgent(ReActAgent):
             logger.error(error_msg)
             return f"Error: {error_msg}"
 
+    def _parse_arguments(self, name: str, arguments: str) -> dict:
+        """Parse tool-call arguments, falling back to schema-guided repair"""
+        try:
+            return json.loads(arguments)
+        except json.JSONDecodeError:
+            tool = self.available_tools.tool_map[name]
+            repaired = repair_json(
+                arguments, tool.parameters, allow_extra=accepts_kwargs(tool)
+            )
+            if repaired is None:
+                raise
+            return repaired
+
     async def _handle_special_tool(self, name: str, result: Any, **kwargs):
         """Handle special tool execution and state changes"""
         if not self._is_special_tool(name):
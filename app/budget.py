@@ -0,0 +1,149 @@
+"""Wall-clock, token and cost budgets for agent runs and their steps.
+
+Usage is metered from the telemetry record of every LLM call made during the
+run, including background calls such as compaction, and kept on the agent as
+`budget_usage`, so it can be watched while the run progresses.
+
+A step that reaches a step limit is interrupted and the run moves on to the
+next step. Reaching a run limit interrupts the current step and ends the run.
+Limits are checked as each LLM call completes, so a step is stopped at its
+next await instead of running on after its budget is spent.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Tuple, Union
+
+from pydantic import BaseModel, Field
+
+from app.config import BudgetSettings
+from app.exceptions import BudgetExceeded
+from app.telemetry import LLMCallRecord, usage_meter
+
+
+Number = Union[int, float]
+
+
+class BudgetUsage(BaseModel):
+    """Consumption of the current run and of its current step"""
+
+    started_at: Optional[float] = Field(None, description="Unix time the run started")
+    elapsed: float = Field(0.0, description="Run seconds as of the last update")
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = Field(0.0, description="Estimated cost of calls with known prices")
+
+    step_elapsed: float = 0.0
+    step_tokens: int = 0
+    step_cost: float = 0.0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+def _format(value: Number) -> str:
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+
+def _first_over(*checks: Tuple[Number, Optional[Number], str]) -> Optional[str]:
+    """Describe the first (used, limit, what) check whose limit is reached"""
+    for used, limit, what in checks:
+        if limit is not None and used >= limit:
+            return f"{what} {_format(used)} of {_format(limit)}"
+    return None
+
+
+class RunBudget:
+    """Meters one run against `settings`, updating `usage` in place"""
+
+    def __init__(self, settings: BudgetSettings, usage: BudgetUsage):
+        self.settings = settings
+        self.usage = usage
+        self._run_start = self._step_start = time.monotonic()
+        # Deadline of the step in progress, moved to now to interrupt it
+        self._timeout: Optional[asyncio.Timeout] = None
+        usage.started_at = time.time()
+
+    def record(self, record: LLMCallRecord) -> None:
+        """Add a completed LLM call, interrupting the step if a limit is reached"""
+        usage = self.usage
+        usage.llm_calls += 1
+        usage.prompt_tokens += record.prompt_tokens
+        usage.completion_tokens += record.completion_tokens
+        usage.step_tokens += record.total_tokens
+        cost = record.cost or 0.0
+        usage.cost += cost
+        usage.step_cost += cost
+        if self._timeout and (self.exhausted() or self.step_exhausted()):
+            self._timeout.reschedule(asyncio.get_running_loop().time())
+
+    def exhausted(self) -> Optional[str]:
+        """Why the run's budget is used up, or None"""
+        self._tick()
+        settings, usage = self.settings, self.usage
+        return _first_over(
+            (usage.elapsed, settings.max_seconds, "seconds"),
+            (usage.total_tokens, settings.max_tokens, "tokens"),
+            (usage.prompt_tokens, settings.max_prompt_tokens, "prompt tokens"),
+            (
+                usage.completion_tokens,
+                settings.max_completion_tokens,
+                "completion tokens",
+            ),
+            (usage.cost, settings.max_cost, "cost"),
+        )
+
+    def step_exhausted(self) -> Optional[str]:
+        """Why the current step's budget is used up, or None"""
+        self._tick()
+        settings, usage = self.settings, self.usage
+        return _first_over(
+            (usage.step_elapsed, settings.step_timeout, "step seconds"),
+            (usage.step_tokens, settings.max_step_tokens, "step tokens"),
+            (usage.step_cost, settings.max_step_cost, "step cost"),
+        )
+
+    @asynccontextmanager
+    async def step(self) -> AsyncIterator[None]:
+        """Run one step within the step limits and the run's remaining time.
+
+        LLM calls made in the block, and by tasks it starts, are metered.
+
+        Raises:
+            BudgetExceeded: If the step was interrupted
+        """
+        self._step_start = time.monotonic()
+        self.usage.step_elapsed = 0.0
+        self.usage.step_tokens = 0
+        self.usage.step_cost = 0.0
+        timeout = None
+        try:
+            with usage_meter(self.record):
+                async with asyncio.timeout(self._step_delay()) as timeout:
+                    self._timeout = timeout
+                    yield
+        except TimeoutError:
+            if timeout is None or not timeout.expired():
+                raise
+            reason = self.exhausted() or self.step_exhausted() or "budget reached"
+            raise BudgetExceeded(reason) from None
+        finally:
+            self._tick()
+            self._timeout = None
+
+    def _step_delay(self) -> Optional[float]:
+        """Seconds the next step may take, or None if unlimited"""
+        limits = [self.settings.step_timeout]
+        if self.settings.max_seconds is not None:
+            limits.append(self.settings.max_seconds - self.usage.elapsed)
+        limits = [limit for limit in limits if limit is not None]
+        return max(0.0, min(limits)) if limits else None
+
+    def _tick(self) -> None:
+        now = time.monotonic()
+        self.usage.elapsed = now - self._run_start
+        if self._timeout is not None:
+            self.usage.step_elapsed = now - self._step_start
@@ -0,0 +1,150 @@
+"""Two-tier (in-process LRU + SQLite) cache for deterministic LLM responses."""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+from app.config import PROJECT_ROOT, CacheSettings, config
+from app.logger import logger
+
+
+def request_key(**request: Any) -> str:
+    """Build a canonical hash for an LLM request.
+
+    Keys are sorted and non-JSON values are stringified, so logically identical
+    requests always hash to the same key regardless of dict ordering.
+    """
+    payload = json.dumps(
+        request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU memory tier in front of a SQLite disk tier, both with TTL eviction."""
+
+    def __init__(self, settings: CacheSettings):
+        self.ttl = settings.ttl
+        self.memory_max_entries = settings.memory_max_entries
+        self.disk_max_entries = settings.disk_max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+        if settings.disk_path:
+            path = Path(settings.disk_path)
+            if not path.is_absolute():
+                path = PROJECT_ROOT / path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+                "ON responses (accessed_at)"
+            )
+            self._db.commit()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return the cached value for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[0] > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._memory.pop(key, None)
+
+        value = await asyncio.to_thread(self._disk_get, key, now) if self._db else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._memory_set(key, value, now + self.ttl)
+        return value
+
+    async def set(self, key: str, value: str) -> None:
+        """Store value under key in both tiers"""
+        now = time.time()
+        self._memory_set(key, value, now + self.ttl)
+        if self._db:
+            await asyncio.to_thread(self._disk_set, key, value, now)
+
+    def clear(self) -> None:
+        """Drop every cached entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            if self._db:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def _memory_set(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_max_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            if row[1] <= now:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+            return row[0]
+
+    def _disk_set(self, key: str, value: str, now: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now),
+            )
+            self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.disk_max_entries,),
+            )
+            self._db.commit()
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide response cache, or None when caching is disabled"""
+    global _response_cache
+    if not config.cache.enabled:
+        return None
+    if _response_cache is None:
+        try:
+            _response_cache = ResponseCache(config.cache)
+        except sqlite3.Error as e:
+            logger.warning(f"Disk cache unavailable, using memory only: {e}")
+            _response_cache = ResponseCache(
+                config.cache.model_copy(update={"disk_path": None})
+            )
+    return _response_cache
@@ -0,0 +1,198 @@
+"""Step-level checkpoints of agent and flow state, for resuming interrupted runs.
+
+A checkpoint is an append-only JSON Lines file. After each agent step one
+record holds the messages added to that agent's memory since its previous
+record (plus how many old messages were evicted from the front), its
+checkpointed fields such as `state`, `current_step` and `tool_calls`, and
+any plan data that changed. Flows add a record per plan step. Writing a step
+costs the size of what the step added, not the size of the history; only a
+memory rewrite (e.g. compaction) is written in full.
+
+Resuming a run whose recorded state is FINISHED starts no new steps.
+
+Replaying the file in order rebuilds the latest state:
+
+    state = load_checkpoint("checkpoints/manus-1712345678.jsonl")
+    agent.restore_checkpoint(state)
+    await agent.run()
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, TextIO
+
+from pydantic import BaseModel, Field
+
+from app.config import PROJECT_ROOT, config
+from app.logger import logger
+from app.schema import AgentState, Message
+from app.tool.planning import PlanningTool
+
+
+if TYPE_CHECKING:
+    from app.agent.base import BaseAgent
+    from app.flow.planning import PlanningFlow
+
+
+class AgentCheckpoint(BaseModel):
+    """Latest recorded state of one agent"""
+
+    messages: List[Message] = Field(default_factory=list)
+    fields: Dict[str, Any] = Field(
+        default_factory=dict, description="Checkpointed agent fields, as JSON"
+    )
+
+    @property
+    def finished(self) -> bool:
+        """Whether the recorded run had already finished"""
+        return self.fields.get("state") == AgentState.FINISHED
+
+
+class CheckpointState(BaseModel):
+    """State rebuilt by replaying a checkpoint file"""
+
+    agents: Dict[str, AgentCheckpoint] = Field(default_factory=dict)
+    plans: Dict[str, Dict[str, Any]] = Field(
+        default_factory=dict, description="PlanningTool plans by owner"
+    )
+    flow: Dict[str, Any] = Field(default_factory=dict)
+
+
+def planning_tools(agent: "BaseAgent") -> List[PlanningTool]:
+    """PlanningTools among the agent's tools, whose plans are checkpointed"""
+    tools = getattr(getattr(agent, "available_tools", None), "tools", ())
+    return [tool for tool in tools if isinstance(tool, PlanningTool)]
+
+
+def new_checkpoint_path(name: str) -> Path:
+    """A fresh checkpoint file path in the configured directory"""
+    directory = Path(config.checkpoint.directory)
+    if not directory.is_absolute():
+        directory = PROJECT_ROOT / directory
+    return directory / f"{name.lower()}-{int(time.time() * 1000)}.jsonl"
+
+
+class CheckpointWriter:
+    """Appends step records to a checkpoint file.
+
+    Keeps references to the messages already written for each agent, so the
+    next record only needs the new ones. `close` releases the file between
+    runs; a later record reopens it for appending.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file: Optional[TextIO] = open(self.path, "a", encoding="utf-8")
+        self._written: Dict[str, List[Message]] = {}
+        self._plans: Dict[str, str] = {}
+        logger.info(f"Checkpointing to {self.path}")
+
+    def record_agent(self, agent: "BaseAgent") -> None:
+        """Append the agent's memory changes and fields after a step"""
+        messages = agent.memory.messages
+        record: Dict[str, Any] = {"type": "agent", "name": agent.name}
+        record.update(self._message_delta(agent.name, messages))
+        record["fields"] = agent.model_dump(
+            mode="json", include=set(agent.checkpoint_fields)
+        )
+        self._write(record)
+
+        for tool in planning_tools(agent):
+            self.record_plans(agent.name, tool)
+
+    def record_flow(self, flow: "PlanningFlow") -> None:
+        """Append the flow's position and any changed plan data"""
+        self.record_plans("flow", flow.planning_tool)
+        self._write(
+            {
+                "type": "flow",
+                "active_plan_id": flow.active_plan_id,
+                "current_step_index": flow.current_step_index,
+            }
+        )
+
+    def record_plans(self, owner: str, tool: PlanningTool) -> None:
+        """Append a PlanningTool's plans if they changed since the last record"""
+        encoded = json.dumps(tool.plans, ensure_ascii=False, separators=(",", ":"))
+        if self._plans.get(owner) == encoded:
+            return
+        self._plans[owner] = encoded
+        self._write({"type": "plans", "owner": owner, "plans": tool.plans})
+
+    def _message_delta(self, name: str, messages: List[Message]) -> Dict[str, Any]:
+        """Describe memory as (drop n oldest, append new) or a full reset.
+
+        An agent's first record in a file session is always a reset, so
+        resuming into an existing file starts from the restored memory.
+        """
+        written = self._written.get(name)
+        drop = 0
+        if written and messages:
+            drop = next(
+                (i for i, msg in enumerate(written) if msg is messages[0]), None
+            )
+        kept = len(written) - drop if written is not None and drop is not None else 0
+        unchanged = (
+            written is not None
+            and drop is not None
+            and kept <= len(messages)
+            and all(a is b for a, b in zip(messages, written[drop:]))
+        )
+        self._written[name] = list(messages)
+        if unchanged:
+            return {
+                "drop": drop,
+                "messages": [msg.to_dict() for msg in messages[kept:]],
+            }
+        return {"reset": True, "messages": [msg.to_dict() for msg in messages]}
+
+    def close(self) -> None:
+        """Close the file; safe to call more than once"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(
+            json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        )
+        self._file.flush()
+
+
+def load_checkpoint(path: Path) -> CheckpointState:
+    """Rebuild the latest state recorded in a checkpoint file.
+
+    A truncated last line, left by a crash mid-write, is ignored.
+    """
+    state = CheckpointState()
+    messages: Dict[str, List[dict]] = {}
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Ignoring incomplete checkpoint record in {path}")
+                break
+            kind = record.get("type")
+            if kind == "agent":
+                name = record["name"]
+                history = messages.setdefault(name, [])
+                if record.get("reset"):
+                    history.clear()
+                else:
+                    del history[: record.get("drop", 0)]
+                history.extend(record.get("messages", []))
+                agent = state.agents.setdefault(name, AgentCheckpoint())
+                agent.fields.update(record.get("fields", {}))
+            elif kind == "plans":
+                state.plans[record["owner"]] = record["plans"]
+            elif kind == "flow":
+                state.flow = {k: v for k, v in record.items() if k != "type"}
+
+    for name, history in messages.items():
+        state.agents[name].messages = [Message(**msg) for msg in history]
+    return state
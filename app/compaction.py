@@ -0,0 +1,181 @@
+"""Background compaction of agent memory by incremental summarization.
+
+Once memory crosses a message or token threshold, the oldest span of history
+is summarized into a single synthetic message. The summary call runs as a
+background task while the agent keeps stepping; its result is swapped into
+memory at the start of a later step, so no step ever waits on it. Each
+compaction folds the previous summary and the next span into a new summary.
+
+Memory layout after compaction:
+
+    [original request] [summary] [recent messages, verbatim]
+
+Spans end on a conversational unit boundary, so an assistant message is never
+separated from the tool results answering its tool calls.
+"""
+
+import asyncio
+from typing import List, Optional, Tuple
+
+from app.config import CompactionSettings
+from app.llm import LLM
+from app.logger import logger
+from app.rate_limit import Priority, request_priority
+from app.router import CallKind, route_llm
+from app.schema import Memory, Message
+from app.telemetry import telemetry_context
+
+
+SUMMARY_PREFIX = "[Summary of earlier conversation]"
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of an AI agent's work so it can continue "
+    "without the full history. Merge the existing summary with the new "
+    "conversation excerpt into one updated summary. Keep facts, findings, "
+    "decisions, file paths, URLs, values and errors the agent will need; note "
+    "what was tried and failed. Drop pleasantries and repeated output. Reply "
+    "with the summary only."
+)
+
+
+class MemoryCompactor:
+    """Summarizes the oldest part of an agent's memory in the background"""
+
+    def __init__(self, settings: CompactionSettings):
+        self.settings = settings
+        self.summary: Optional[Message] = None
+        self._task: Optional[asyncio.Task] = None
+        # Messages being summarized by the running task, and the summary
+        # message they follow (if any), used to check memory is unchanged
+        self._span: List[Message] = []
+        self._previous: Optional[Message] = None
+
+    def update(self, memory: Memory, llm: LLM, agent: Optional[str] = None) -> None:
+        """Apply a finished summary and start a new one if memory is too large.
+
+        Never waits on the summarizer; call it once per agent step.
+        """
+        if self._task and self._task.done():
+            self._apply(memory)
+        if self._task is None and self._over_threshold(memory, llm):
+            self._start(memory, llm, agent)
+
+    def cancel(self) -> None:
+        """Abandon any running summarization and forget the current summary"""
+        if self._task:
+            self._task.cancel()
+        self._task, self._span, self._previous = None, [], None
+        self.summary = None
+
+    def _over_threshold(self, memory: Memory, llm: LLM) -> bool:
+        if len(memory.messages) > self.settings.trigger_messages:
+            return True
+        limit = self.settings.trigger_tokens or llm.context_window // 2
+        return memory.token_count > limit
+
+    @staticmethod
+    def _pinned(messages: List[Message]) -> int:
+        """Number of leading messages never compacted: up to the first user message"""
+        return next((i + 1 for i, msg in enumerate(messages) if msg.role == "user"), 0)
+
+    def _span_bounds(self, messages: List[Message]) -> Optional[Tuple[int, int]]:
+        """Indices (start, end) of the span to summarize, or None.
+
+        Messages up to the first user message (the request) stay pinned; the
+        span starts after them and any current summary, and stops before the
+        most recent `keep_recent` messages, moved back so tool results stay
+        with the assistant message that called them.
+        """
+        start = self._pinned(messages)
+        if self.summary is not None:
+            if start < len(messages) and messages[start] is self.summary:
+                start += 1
+            else:
+                # Memory was rewritten underneath us; start a fresh summary
+                self.summary = None
+        end = len(messages) - self.settings.keep_recent
+        while end > start and messages[end].role == "tool":
+            end -= 1
+        if end <= start:
+            return None
+        return start, end
+
+    def _start(self, memory: Memory, llm: LLM, agent: Optional[str]) -> None:
+        bounds = self._span_bounds(memory.messages)
+        if not bounds:
+            return
+        start, end = bounds
+        self._span = memory.messages[start:end]
+        self._previous = self.summary
+        logger.info(f"Compacting {len(self._span)} oldest messages in the background")
+        self._task = asyncio.create_task(
+            self._summarize(llm, self._previous, self._span, agent)
+        )
+
+    def _apply(self, memory: Memory) -> None:
+        task, span, previous = self._task, self._span, self._previous
+        self._task, self._span = None, []
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error:
+            logger.warning(f"Memory compaction failed, will retry: {error}")
+            return
+
+        messages = memory.messages
+        pinned = self._pinned(messages)
+        start = pinned + (1 if previous is not None else 0)
+        end = start + len(span)
+        unchanged = (
+            previous is None
+            or (pinned < len(messages) and messages[pinned] is previous)
+        ) and all(a is b for a, b in zip(messages[start:end], span))
+        if not unchanged or end > len(messages):
+            logger.debug("Memory changed during compaction; discarding summary")
+            return
+
+        self.summary = Message.system_message(f"{SUMMARY_PREFIX}\n{task.result()}")
+        memory.replace(pinned, end, [self.summary])
+        logger.info(
+            f"Compacted {end - pinned} messages into a summary "
+            f"(~{self.summary.token_count} tokens)"
+        )
+
+    async def _summarize(
+        self,
+        llm: LLM,
+        previous: Optional[Message],
+        span: List[Message],
+        agent: Optional[str],
+    ) -> str:
+        existing = (
+            previous.content[len(SUMMARY_PREFIX) :].strip() if previous else "(none)"
+        )
+        excerpt = "\n\n".join(self._render(msg) for msg in span)
+        prompt = (
+            f"Existing summary:\n{existing}\n\n"
+            f"New conversation excerpt:\n{excerpt}\n\n"
+            "Write the updated summary."
+        )
+        system = Message.system_message(SUMMARY_SYSTEM_PROMPT)
+        user = Message.user_message(prompt)
+        llm = route_llm(CallKind.SUMMARY, llm, [user], [system], agent=agent)
+        with request_priority(Priority.BACKGROUND), telemetry_context(
+            purpose="compaction"
+        ):
+            return await llm.ask([user], system_msgs=[system], stream=False)
+
+    def _render(self, message: Message) -> str:
+        lines = []
+        if message.content:
+            content = message.content
+            limit = self.settings.max_tool_result_chars
+            if message.role == "tool" and len(content) > limit:
+                content = f"{content[:limit]}... [{len(content) - limit} chars omitted]"
+            label = f"tool {message.name}" if message.role == "tool" else message.role
+            lines.append(f"{label}: {content}")
+        for call in message.tool_calls or []:
+            lines.append(
+                f"{message.role} called {call.function.name}({call.function.arguments})"
+            )
+        return "\n".join(lines)
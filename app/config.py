@@ -15,14 +15,114 @@ PROJECT_ROOT = get_project_root()
 WORKSPACE_ROOT = PROJECT_ROOT / "workspace"
 
 
+class EndpointSettings(BaseModel):
+    """One OpenAI-compatible deployment serving an LLM config"""
+    base_url: Optional[str] = Field(None, description="API base URL; defaults to the config's base_url")
+    api_key: Optional[str] = Field(None, description="API key; defaults to the config's api_key")
+    api_type: Optional[str] = Field(None, description="AzureOpenai or Openai; defaults to the config's api_type")
+    api_version: Optional[str] = Field(None, description="Azure Openai version if AzureOpenai")
+    weight: float = Field(1.0, gt=0, description="Relative share of traffic")
+    max_concurrency: Optional[int] = Field(None, description="Maximum in-flight requests")
+
+
 class LLMSettings(BaseModel):
     model: str = Field(..., description="Model name")
     base_url: str = Field(..., description="API base URL")
     api_key: str = Field(..., description="API key")
     max_tokens: int = Field(4096, description="Maximum number of tokens per request")
+    context_window: int = Field(128000, description="Model context window in tokens")
+    context_margin: float = Field(0.1, description="Share of the context window held back for error in the local token estimate")
     temperature: float = Field(1.0, description="Sampling temperature")
     api_type: str = Field(..., description="AzureOpenai or Openai")
     api_version: str = Field(..., description="Azure Openai version if AzureOpenai")
+    endpoints: List[EndpointSettings] = Field(default_factory=list, description="Deployments to spread requests across; empty uses base_url")
+    endpoint_eject_failures: int = Field(2, description="Consecutive failures before an endpoint is ejected")
+    endpoint_eject_seconds: float = Field(30.0, description="How long an ejected endpoint is skipped")
+    endpoint_max_latency: Optional[float] = Field(None, description="Smoothed latency in seconds above which an endpoint is ejected")
+    rpm: Optional[int] = Field(None, description="Requests per minute shared by all users of this config")
+    tpm: Optional[int] = Field(None, description="Tokens per minute shared by all users of this config")
+    coalesce_requests: bool = Field(True, description="Share one upstream call among identical concurrent requests")
+    batch_concurrency: int = Field(8, description="Default requests in flight for ask_many / ask_tool_many")
+    structured_output: bool = Field(True, description="Use native JSON-schema response_format for ask_structured")
+    hedge: bool = Field(False, description="Send a duplicate request when a response is unusually slow")
+    hedge_config: Optional[str] = Field(None, description="LLM config that receives hedge requests; defaults to this one")
+    hedge_percentile: float = Field(0.95, description="Latency percentile after which a request is hedged")
+    hedge_max_fraction: float = Field(0.05, description="Maximum share of requests that may be hedged")
+    hedge_min_samples: int = Field(20, description="Calls recorded before hedging starts")
+    input_cost_per_million: Optional[float] = Field(None, description="Price per million prompt tokens, for cost estimates and budgets")
+    output_cost_per_million: Optional[float] = Field(None, description="Price per million completion tokens, for cost estimates and budgets")
+
+
+class CacheSettings(BaseModel):
+    """Configuration for the LLM response cache"""
+    enabled: bool = Field(False, description="Cache deterministic (temperature 0) LLM responses")
+    ttl: int = Field(86400, description="Seconds before a cached response expires")
+    memory_max_entries: int = Field(256, description="Maximum entries in the in-process LRU tier")
+    disk_path: Optional[str] = Field(".cache/llm_responses.sqlite3", description="SQLite file for the disk tier, relative to the project root; empty disables it")
+    disk_max_entries: int = Field(10000, description="Maximum entries in the disk tier")
+
+
+class HttpSettings(BaseModel):
+    """Connection pool and timeout settings for the shared LLM HTTP transport"""
+    max_connections: int = Field(100, description="Maximum concurrent connections across all LLM configs")
+    max_keepalive_connections: int = Field(20, description="Idle connections kept open for reuse")
+    keepalive_expiry: float = Field(30.0, description="Seconds an idle connection is kept open")
+    http2: bool = Field(False, description="Negotiate HTTP/2 (requires the 'h2' package)")
+    connect_timeout: float = Field(10.0, description="Seconds to establish a connection")
+    read_timeout: float = Field(600.0, description="Seconds to wait for response data")
+    pool_timeout: float = Field(30.0, description="Seconds to wait for a free pooled connection")
+
+
+class RoutingRule(BaseModel):
+    """Sends matching LLM calls to a named [llm.<name>] config"""
+    config: str = Field(..., description="LLM config that serves matching calls")
+    kinds: List[str] = Field(default_factory=list, description="Call kinds (plan, step, summary) this rule applies to; empty matches all")
+    agents: List[str] = Field(default_factory=list, description="Agent names this rule applies to; empty matches all")
+    min_prompt_tokens: Optional[int] = Field(None, description="Only match prompts at least this large")
+    max_prompt_tokens: Optional[int] = Field(None, description="Only match prompts at most this large")
+    max_latency: Optional[float] = Field(None, description="Latency budget in seconds; skip the rule while the config's p95 latency exceeds it")
+
+
+class RoutingSettings(BaseModel):
+    """Per-call LLM config selection; the first matching rule wins"""
+    rules: List[RoutingRule] = Field(default_factory=list, description="Routing rules, checked in order")
+
+
+class CompactionSettings(BaseModel):
+    """Background summarization of old agent memory"""
+    enabled: bool = Field(False, description="Summarize the oldest history in the background instead of dropping it")
+    trigger_messages: int = Field(60, description="Compact once memory holds more messages than this")
+    trigger_tokens: Optional[int] = Field(None, description="Compact once memory exceeds this many tokens; defaults to half the agent LLM's context window")
+    keep_recent: int = Field(12, description="Most recent messages always kept verbatim")
+    max_tool_result_chars: int = Field(2000, description="Characters of each tool result shown to the summarizer")
+
+
+class CheckpointSettings(BaseModel):
+    """Step-level checkpoints for resuming interrupted runs"""
+    enabled: bool = Field(False, description="Append agent and flow state to a checkpoint file after every step")
+    directory: str = Field("checkpoints", description="Directory for checkpoint files, relative to the project root")
+
+
+class AgentPoolSettings(BaseModel):
+    """Pre-initialized agents reused across web server tasks"""
+    min_size: int = Field(1, description="Agents kept initialized and ready, idle or in use")
+    max_size: int = Field(8, description="Maximum agents in use at once; further tasks wait for one")
+    idle_timeout: float = Field(300.0, description="Seconds an idle agent above min_size is kept before being closed")
+    health_check_interval: float = Field(60.0, description="Seconds between health checks of idle agents")
+    warm_up: bool = Field(True, description="Start tool resources such as the shell before the first task")
+    cold_tools: List[str] = Field(default_factory=lambda: ["browser_use"], description="Tools never warmed up, started on first use instead")
+
+
+class BudgetSettings(BaseModel):
+    """Limits on one agent run and on each of its steps; unset limits are off"""
+    max_seconds: Optional[float] = Field(None, description="Wall-clock seconds per run")
+    max_tokens: Optional[int] = Field(None, description="Prompt plus completion tokens per run")
+    max_prompt_tokens: Optional[int] = Field(None, description="Prompt tokens per run")
+    max_completion_tokens: Optional[int] = Field(None, description="Completion tokens per run")
+    max_cost: Optional[float] = Field(None, description="Estimated cost per run, from the LLM configs' token prices")
+    step_timeout: Optional[float] = Field(None, description="Wall-clock seconds per step")
+    max_step_tokens: Optional[int] = Field(None, description="Prompt plus completion tokens per step")
+    max_step_cost: Optional[float] = Field(None, description="Estimated cost per step")
 
 
 class BaseToolSettings(BaseModel):
@@ -46,6 +146,9 @@ class AgentSettings(BaseModel):
     system_prompt: Optional[str] = Field(None, description="System prompt for the agent")
     next_step_prompt: Optional[str] = Field(None, description="Next step prompt for the agent")
     max_steps: Optional[int] = Field(None, description="Maximum number of steps for the agent")
+    duplicate_threshold: Optional[int] = Field(None, description="Earlier repeats of a response or tool call that mark the agent as stuck")
+    max_stuck_nudges: Optional[int] = Field(None, description="Change-of-strategy prompts before a stuck run is stopped")
+    budget: Optional[BudgetSettings] = Field(None, description="Run and step limits for this agent; defaults to the [budget] section")
     config: Dict[str, Any] = Field(default_factory=dict, description="Additional agent-specific configuration")
 
 
@@ -58,6 +161,13 @@ class AppConfig(BaseModel):
     llm: Dict[str, LLMSettings]
     tool: ToolConfig
     agent: AgentConfig
+    cache: CacheSettings = Field(default_factory=CacheSettings)
+    http: HttpSettings = Field(default_factory=HttpSettings)
+    routing: RoutingSettings = Field(default_factory=RoutingSettings)
+    compaction: CompactionSettings = Field(default_factory=CompactionSettings)
+    checkpoint: CheckpointSettings = Field(default_factory=CheckpointSettings)
+    agent_pool: AgentPoolSettings = Field(default_factory=AgentPoolSettings)
+    budget: BudgetSettings = Field(default_factory=BudgetSettings)
 
 
 class Config:
@@ -110,9 +220,27 @@ class Config:
             "base_url": base_llm.get("base_url"),
             "api_key": base_llm.get("api_key"),
             "max_tokens": base_llm.get("max_tokens", 4096),
+            "context_window": base_llm.get("context_window", 128000),
+            "context_margin": base_llm.get("context_margin", 0.1),
             "temperature": base_llm.get("temperature", 1.0),
             "api_type": base_llm.get("api_type", ""),
             "api_version": base_llm.get("api_version", ""),
+            "endpoints": base_llm.get("endpoints", []),
+            "endpoint_eject_failures": base_llm.get("endpoint_eject_failures", 2),
+            "endpoint_eject_seconds": base_llm.get("endpoint_eject_seconds", 30.0),
+            "endpoint_max_latency": base_llm.get("endpoint_max_latency"),
+            "rpm": base_llm.get("rpm"),
+            "tpm": base_llm.get("tpm"),
+            "coalesce_requests": base_llm.get("coalesce_requests", True),
+            "batch_concurrency": base_llm.get("batch_concurrency", 8),
+            "structured_output": base_llm.get("structured_output", True),
+            "hedge": base_llm.get("hedge", False),
+            "hedge_config": base_llm.get("hedge_config"),
+            "hedge_percentile": base_llm.get("hedge_percentile", 0.95),
+            "hedge_max_fraction": base_llm.get("hedge_max_fraction", 0.05),
+            "hedge_min_samples": base_llm.get("hedge_min_samples", 20),
+            "input_cost_per_million": base_llm.get("input_cost_per_million"),
+            "output_cost_per_million": base_llm.get("output_cost_per_million"),
         }
 
         # Load tool configurations
@@ -137,14 +265,31 @@ class Config:
                 system_prompt=agent_settings.get("system_prompt"),
                 next_step_prompt=agent_settings.get("next_step_prompt"),
                 max_steps=agent_settings.get("max_steps"),
+                duplicate_threshold=agent_settings.get("duplicate_threshold"),
+                max_stuck_nudges=agent_settings.get("max_stuck_nudges"),
+                budget=agent_settings.get("budget"),
                 config=agent_settings.get("config", {})
             )
 
+        # Load cache, HTTP transport, routing, compaction, checkpoint, agent pool and budget configuration
+        cache_config = raw_config.get("cache", {})
+        http_config = raw_config.get("http", {})
+        routing_config = raw_config.get("routing", {})
+        compaction_config = raw_config.get("compaction", {})
+        checkpoint_config = raw_config.get("checkpoint", {})
+        agent_pool_config = raw_config.get("agent_pool", {})
+        budget_config = raw_config.get("budget", {})
+
         config_dict = {
             "llm": {
                 "default": default_settings,
                 **{
-                    name: {**default_settings, **override_config}
+                    name: {
+                        **default_settings,
+                        # A config with its own base_url does not inherit the default endpoints
+                        **({"endpoints": []} if "base_url" in override_config else {}),
+                        **override_config,
+                    }
                     for name, override_config in llm_overrides.items()
                 },
             },
@@ -153,7 +298,14 @@ class Config:
             },
             "agent": {
                 "agents": agents_config
-            }
+            },
+            "cache": cache_config,
+            "http": http_config,
+            "routing": routing_config,
+            "compaction": compaction_config,
+            "checkpoint": checkpoint_config,
+            "agent_pool": agent_pool_config,
+            "budget": budget_config,
         }
 
         self._config = AppConfig(**config_dict)
@@ -170,6 +322,34 @@ class Config:
     def agent(self) -> AgentConfig:
         return self._config.agent
 
+    @property
+    def cache(self) -> CacheSettings:
+        return self._config.cache
+
+    @property
+    def http(self) -> HttpSettings:
+        return self._config.http
+
+    @property
+    def routing(self) -> RoutingSettings:
+        return self._config.routing
+
+    @property
+    def compaction(self) -> CompactionSettings:
+        return self._config.compaction
+
+    @property
+    def checkpoint(self) -> CheckpointSettings:
+        return self._config.checkpoint
+
+    @property
+    def agent_pool(self) -> AgentPoolSettings:
+        return self._config.agent_pool
+
+    @property
+    def budget(self) -> BudgetSettings:
+        return self._config.budget
+
     def get_tool_config(self, tool_name: str) -> Optional[ToolSettings]:
         """Get configuration for a specific tool"""
         return self.tool.tools.get(tool_name)
@@ -0,0 +1,298 @@
+"""Weighted, health-tracked pool of OpenAI-compatible endpoints for one LLM config."""
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Iterable, List, Optional
+
+from openai import (
+    APIConnectionError,
+    AsyncAzureOpenAI,
+    AsyncOpenAI,
+    InternalServerError,
+    RateLimitError,
+)
+
+from app.config import EndpointSettings, LLMSettings
+from app.http_client import get_http_client
+from app.logger import logger
+
+
+# Errors that say nothing about the request itself and may succeed elsewhere
+FAILOVER_ERRORS = (APIConnectionError, InternalServerError, RateLimitError)
+
+_LATENCY_SMOOTHING = 0.3
+
+
+class Endpoint:
+    """One deployment in the pool together with its live health statistics"""
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        base_url: str,
+        weight: float = 1.0,
+        max_concurrency: Optional[int] = None,
+    ):
+        self.client = client
+        self.base_url = base_url
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+
+        self.outstanding = 0
+        self.latency: Optional[float] = None
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    @property
+    def has_capacity(self) -> bool:
+        return self.max_concurrency is None or self.outstanding < self.max_concurrency
+
+    @property
+    def load(self) -> float:
+        """Outstanding requests relative to weight; lower is preferred"""
+        return (self.outstanding + 1) / self.weight
+
+    def __repr__(self) -> str:
+        return f"Endpoint({self.base_url}, outstanding={self.outstanding})"
+
+
+class EndpointPool:
+    """Routes requests by weighted least-outstanding-requests across endpoints.
+
+    Endpoints are ejected for `eject_seconds` after `eject_failures` consecutive
+    failures, or when their smoothed latency exceeds `max_latency`. If every
+    endpoint is ejected the pool still routes to the one that recovers first
+    rather than failing outright.
+    """
+
+    def __init__(
+        self,
+        endpoints: List[Endpoint],
+        eject_failures: int = 2,
+        eject_seconds: float = 30.0,
+        max_latency: Optional[float] = None,
+    ):
+        if not endpoints:
+            raise ValueError("EndpointPool requires at least one endpoint")
+        self.endpoints = endpoints
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        self.max_latency = max_latency
+        self._capacity = asyncio.Condition()
+
+    @classmethod
+    def from_settings(cls, settings: LLMSettings) -> "EndpointPool":
+        """Build a pool from an LLM config, falling back to its single base_url.
+
+        Client-level retries are disabled; failover and the LLM retry policy
+        decide when to try again. All clients share one HTTP connection pool.
+        """
+        specs = settings.endpoints or [EndpointSettings()]
+        endpoints = []
+        for spec in specs:
+            base_url = spec.base_url or settings.base_url
+            api_key = spec.api_key or settings.api_key
+            if (spec.api_type or settings.api_type) == "azure":
+                client = AsyncAzureOpenAI(
+                    base_url=base_url,
+                    api_key=api_key,
+                    api_version=spec.api_version or settings.api_version,
+                    max_retries=0,
+                    http_client=get_http_client(),
+                )
+            else:
+                client = AsyncOpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    max_retries=0,
+                    http_client=get_http_client(),
+                )
+            endpoints.append(
+                Endpoint(
+                    client=client,
+                    base_url=base_url,
+                    weight=spec.weight,
+                    max_concurrency=spec.max_concurrency,
+                )
+            )
+        return cls(
+            endpoints,
+            eject_failures=settings.endpoint_eject_failures,
+            eject_seconds=settings.endpoint_eject_seconds,
+            max_latency=settings.endpoint_max_latency,
+        )
+
+    def select(self, exclude: Iterable[Endpoint] = ()) -> Optional[Endpoint]:
+        """Pick the least-loaded healthy endpoint with free capacity, if any"""
+        excluded = set(map(id, exclude))
+        available = [
+            ep for ep in self.endpoints if id(ep) not in excluded and ep.has_capacity
+        ]
+        candidates = [ep for ep in available if ep.healthy]
+        if not candidates and not self.has_alternative(exclude):
+            # Every endpoint is ejected: route to the one closest to recovery
+            candidates = sorted(available, key=lambda ep: ep.ejected_until)[:1]
+        if not candidates:
+            return None
+        best = min(ep.load for ep in candidates)
+        return random.choice([ep for ep in candidates if ep.load == best])
+
+    def has_alternative(self, exclude: Iterable[Endpoint]) -> bool:
+        """Check whether a healthy endpoint outside `exclude` exists"""
+        excluded = set(map(id, exclude))
+        return any(ep.healthy for ep in self.endpoints if id(ep) not in excluded)
+
+    @asynccontextmanager
+    async def acquire(
+        self, exclude: Iterable[Endpoint] = ()
+    ) -> AsyncIterator[Endpoint]:
+        """Reserve an endpoint slot for the duration of the block"""
+        endpoint = await self.reserve(exclude)
+        try:
+            yield endpoint
+        finally:
+            await self.release(endpoint)
+
+    async def reserve(self, exclude: Iterable[Endpoint] = ()) -> Endpoint:
+        """Reserve an endpoint slot, waiting while all endpoints are at capacity.
+
+        The slot must be given back with `release`.
+        """
+        exclude = list(exclude)
+        async with self._capacity:
+            endpoint = self.select(exclude)
+            while endpoint is None:
+                await self._capacity.wait()
+                endpoint = self.select(exclude)
+            endpoint.outstanding += 1
+        return endpoint
+
+    async def release(self, endpoint: Endpoint) -> None:
+        async with self._capacity:
+            endpoint.outstanding -= 1
+            self._capacity.notify_all()
+
+    def report_success(self, endpoint: Endpoint, latency: float) -> None:
+        """Record a successful call and eject the endpoint if it is too slow"""
+        endpoint.consecutive_failures = 0
+        endpoint.latency = (
+            latency
+            if endpoint.latency is None
+            else _LATENCY_SMOOTHING * latency
+            + (1 - _LATENCY_SMOOTHING) * endpoint.latency
+        )
+        if self.max_latency and endpoint.latency > self.max_latency:
+            self._eject(endpoint, f"latency {endpoint.latency:.1f}s")
+            endpoint.latency = None
+
+    def report_failure(self, endpoint: Endpoint, error: Exception) -> None:
+        """Record a failed call and eject the endpoint after repeated failures"""
+        if not endpoint.healthy:
+            return
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures >= self.eject_failures:
+            self._eject(endpoint, f"{type(error).__name__}: {error}")
+
+    def _eject(self, endpoint: Endpoint, reason: str) -> None:
+        if len(self.endpoints) > 1:
+            logger.warning(
+                f"Ejecting LLM endpoint {endpoint.base_url} for {self.eject_seconds}s ({reason})"
+            )
+        endpoint.ejected_until = time.monotonic() + self.eject_seconds
+        endpoint.consecutive_failures = 0
+
+
+class PooledStream:
+    """A streamed completion that keeps its endpoint slot until it ends.
+
+    The slot is released when the stream is exhausted, fails or is closed, so
+    streams count towards `outstanding` and `max_concurrency` while they are
+    read. The endpoint's latency is the time to the end of the stream, and an
+    error part-way through is reported as an endpoint failure.
+    """
+
+    def __init__(
+        self,
+        stream: Any,
+        pool: EndpointPool,
+        endpoint: Endpoint,
+        started: float,
+    ):
+        self._stream = stream
+        self._iterator = stream.__aiter__()
+        self._pool = pool
+        self._endpoint = endpoint
+        self._started = started
+        self._first: Optional[Any] = None
+        self._finished = False
+
+    @classmethod
+    async def open(
+        cls,
+        stream: Any,
+        pool: EndpointPool,
+        endpoint: Endpoint,
+        started: float,
+    ) -> "PooledStream":
+        """Wrap `stream` once its first chunk arrives.
+
+        An error before the first chunk propagates with the slot still held by
+        the caller, which can fail over to another endpoint since nothing has
+        been consumed yet.
+        """
+        pooled = cls(stream, pool, endpoint, started)
+        try:
+            pooled._first = await pooled._iterator.__anext__()
+        except StopAsyncIteration:
+            pass
+        except BaseException:
+            await stream.close()
+            raise
+        return pooled
+
+    def __aiter__(self) -> "PooledStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if self._first is not None:
+            chunk, self._first = self._first, None
+            return chunk
+        if self._finished:
+            raise StopAsyncIteration
+        try:
+            return await self._iterator.__anext__()
+        except StopAsyncIteration:
+            await self._finish()
+            raise
+        except BaseException as e:
+            await self._finish(e)
+            raise
+
+    async def close(self) -> None:
+        """Stop reading early and give the slot back"""
+        await self._finish(completed=False)
+
+    aclose = close
+
+    async def _finish(
+        self, error: Optional[BaseException] = None, completed: bool = True
+    ) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        try:
+            await self._stream.close()
+            if isinstance(error, FAILOVER_ERRORS):
+                self._pool.report_failure(self._endpoint, error)
+            elif error is None and completed:
+                self._pool.report_success(
+                    self._endpoint, time.monotonic() - self._started
+                )
+        finally:
+            await self._pool.release(self._endpoint)
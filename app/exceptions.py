@@ -3,3 +3,19 @@ class ToolError(Exception):
 
     def __init__(self, message):
         self.message = message
+
+
+class TokenLimitExceeded(Exception):
+    """Raised when a request cannot fit within the model's context window."""
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+class BudgetExceeded(Exception):
+    """Raised when an agent step is interrupted by its run or step budget."""
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
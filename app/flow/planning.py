@@ -5,9 +5,13 @@ from typing import Dict, List, Optional, Union
 from pydantic import Field
 
 from app.agent.base import BaseAgent
+from app.checkpoint import CheckpointState, CheckpointWriter, new_checkpoint_path
+from app.config import config
 from app.flow.base import BaseFlow
 from app.llm import LLM
 from app.logger import logger
+from app.rate_limit import Priority, request_priority
+from app.router import CallKind, route_llm
 from app.schema import AgentState, Message
 from app.tool import PlanningTool
 
@@ -20,6 +24,9 @@ class PlanningFlow(BaseFlow):
     executor_keys: List[str] = Field(default_factory=list)
     active_plan_id: str = Field(default_factory=lambda: f"plan_{int(time.time())}")
     current_step_index: Optional[int] = None
+    checkpoint: Optional[CheckpointWriter] = Field(
+        None, description="Receives flow and agent checkpoint records"
+    )
 
     def __init__(
         self, agents: Union[BaseAgent, List[BaseAgent], Dict[str, BaseAgent]], **data
@@ -44,6 +51,19 @@ class PlanningFlow(BaseFlow):
         if not self.executor_keys:
             self.executor_keys = list(self.agents.keys())
 
+    def restore_checkpoint(self, state: CheckpointState) -> None:
+        """Restore plans, flow position and agents from a checkpoint.
+
+        Call `execute("")` afterwards to continue from the first step that is
+        not completed; if every step of the plan was completed, no step is
+        executed.
+        """
+        self.planning_tool.plans.update(state.plans.get("flow", {}))
+        self.active_plan_id = state.flow.get("active_plan_id", self.active_plan_id)
+        self.current_step_index = state.flow.get("current_step_index")
+        for agent in self.agents.values():
+            agent.restore_checkpoint(state)
+
     def get_executor(self, step_type: Optional[str] = None) -> BaseAgent:
         """
         Get an appropriate executor agent for the current step.
@@ -67,6 +87,26 @@ class PlanningFlow(BaseFlow):
             if not self.primary_agent:
                 raise ValueError("No primary agent available")
 
+            if self.checkpoint is None and config.checkpoint.enabled:
+                self.checkpoint = CheckpointWriter(new_checkpoint_path("flow"))
+            if self.checkpoint:
+                # One file covers the plan and every agent working on it
+                for agent in self.agents.values():
+                    agent.checkpoint = self.checkpoint
+
+            if not input_text:
+                if self.active_plan_id not in self.planning_tool.plans:
+                    logger.warning("No plan was restored; nothing to resume")
+                    return "No steps executed: no plan to resume"
+                if self._plan_completed():
+                    logger.info("Checkpointed flow already finished; not resuming")
+                    return "No steps executed: flow already finished"
+                # Every step ends with terminate, so executors restored from a
+                # completed step are FINISHED; the remaining steps still run
+                for agent in self.agents.values():
+                    if agent.state == AgentState.FINISHED:
+                        agent.state = AgentState.IDLE
+
             # Create initial plan if input provided
             if input_text:
                 await self._create_initial_plan(input_text)
@@ -77,6 +117,8 @@ class PlanningFlow(BaseFlow):
                         f"Plan creation failed. Plan ID {self.active_plan_id} not found in planning tool."
                     )
                     return f"Failed to create plan for: {input_text}"
+                if self.checkpoint:
+                    self.checkpoint.record_flow(self)
 
             result = ""
             while True:
@@ -93,6 +135,8 @@ class PlanningFlow(BaseFlow):
                 executor = self.get_executor(step_type)
                 step_result = await self._execute_step(executor, step_info)
                 result += step_result + "\n"
+                if self.checkpoint:
+                    self.checkpoint.record_flow(self)
 
                 # Check if agent wants to terminate
                 if hasattr(executor, "state") and executor.state == AgentState.FINISHED:
@@ -102,6 +146,9 @@ class PlanningFlow(BaseFlow):
         except Exception as e:
             logger.error(f"Error in PlanningFlow: {str(e)}")
             return f"Execution failed: {str(e)}"
+        finally:
+            if self.checkpoint:
+                self.checkpoint.close()
 
     async def _create_initial_plan(self, request: str) -> None:
         """Create an initial plan based on the request using the flow's LLM and PlanningTool."""
@@ -120,7 +167,8 @@ class PlanningFlow(BaseFlow):
         )
 
         # Call LLM with PlanningTool
-        response = await self.llm.ask_tool(
+        llm = route_llm(CallKind.PLAN, self.llm, [user_message], [system_message])
+        response = await llm.ask_tool(
             messages=[user_message],
             system_msgs=[system_message],
             tools=[self.planning_tool.to_param()],
@@ -162,6 +210,16 @@ class PlanningFlow(BaseFlow):
             }
         )
 
+    def _plan_completed(self) -> bool:
+        """Whether the active plan exists and every one of its steps is completed"""
+        plan = self.planning_tool.plans.get(self.active_plan_id)
+        if not plan:
+            return False
+        statuses = plan.get("step_statuses", [])
+        return len(statuses) >= len(plan.get("steps", [])) and all(
+            status == "completed" for status in statuses
+        )
+
     async def _get_current_step_info(self) -> tuple[Optional[int], Optional[dict]]:
         """
         Parse the current plan to identify the first non-completed step's index and info.
@@ -376,9 +434,14 @@ class PlanningFlow(BaseFlow):
                 f"The plan has been completed. Here is the final plan status:\n\n{plan_text}\n\nPlease provide a summary of what was accomplished and any final thoughts."
             )
 
-            response = await self.llm.ask(
-                messages=[user_message], system_msgs=[system_message]
+            # The summary is bookkeeping; let interactive steps go first
+            llm = route_llm(
+                CallKind.SUMMARY, self.llm, [user_message], [system_message]
             )
+            with request_priority(Priority.BACKGROUND):
+                response = await llm.ask(
+                    messages=[user_message], system_msgs=[system_message]
+                )
 
             return f"Plan completed:\n\n{response}"
         except Exception as e:
@@ -0,0 +1,53 @@
+"""Shared, configurable async HTTP transport for every LLM client."""
+
+import importlib.util
+from typing import Optional
+
+import httpx
+from openai import DefaultAsyncHttpxClient
+
+from app.config import HttpSettings, config
+from app.logger import logger
+
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def build_http_client(settings: HttpSettings) -> httpx.AsyncClient:
+    """Create an httpx client with the pool limits and timeouts from settings"""
+    http2 = settings.http2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning(
+            "HTTP/2 requested but the 'h2' package is missing; using HTTP/1.1"
+        )
+        http2 = False
+
+    return DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(
+            settings.read_timeout,
+            connect=settings.connect_timeout,
+            pool=settings.pool_timeout,
+        ),
+        http2=http2,
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide HTTP client shared by all LLM configs"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = build_http_client(config.http)
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client and its pooled connections"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -0,0 +1,240 @@
+"""Tolerant local repair of malformed tool-call argument JSON.
+
+Models sometimes emit almost-JSON: wrapped in code fences, with single
+quotes, trailing commas, raw newlines or unescaped quotes inside strings.
+Repairing that locally saves a whole LLM round trip. A repair is only
+accepted when the result fits the tool's parameter schema; anything
+ambiguous is left to the normal error path.
+
+Arguments cut off mid-object are never repaired: closing a truncated string
+can turn a half-written command or file into a valid-looking call (e.g.
+`rm -rf /tmp/build` cut short to `rm -rf /`), so the model is asked again.
+"""
+
+import json
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.logger import logger
+from app.tool.validation import compile_schema
+
+
+_FENCE_PATTERN = re.compile(r"^\s*```[\w-]*\s*\n?(.*?)\n?\s*```\s*$", re.DOTALL)
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+class RepairStats:
+    """Counts repair attempts and outcomes, by kind of fix applied"""
+
+    def __init__(self):
+        self.attempts = 0
+        self.repaired = 0
+        self.fixes: Counter = Counter()
+
+    @property
+    def failed(self) -> int:
+        return self.attempts - self.repaired
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        return self.repaired / self.attempts if self.attempts else None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "attempts": self.attempts,
+            "repaired": self.repaired,
+            "failed": self.failed,
+            "hit_rate": self.hit_rate,
+            "fixes": dict(self.fixes),
+        }
+
+
+repair_stats = RepairStats()
+
+
+def _strip_wrapping(text: str, fixes: Set[str]) -> str:
+    """Remove code fences and any prose around the outermost object"""
+    match = _FENCE_PATTERN.match(text)
+    if match:
+        text = match.group(1)
+        fixes.add("code_fence")
+    start = text.find("{")
+    if start > 0:
+        fixes.add("surrounding_text")
+        text = text[start:]
+    end = text.rfind("}")
+    if 0 <= end < len(text.rstrip()) - 1:
+        fixes.add("surrounding_text")
+        text = text[: end + 1]
+    return text
+
+
+def _closes_string(text: str, i: int) -> bool:
+    """Whether a double quote at i plausibly ends a string (vs. an inner quote)"""
+    rest = text[i + 1 :].lstrip()
+    return not rest or rest[0] in ",}]:"
+
+
+def _drop_dangling(out: List[str], fixes: Set[str]) -> None:
+    """Remove a trailing comma, or a key left without a value by truncation"""
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+        fixes.add("trailing_comma")
+    elif out and out[-1] == ":":
+        # Drop `, "key":` back to the previous separator
+        while out and out[-1] not in ",{":
+            out.pop()
+        if out and out[-1] == ",":
+            out.pop()
+        fixes.add("truncated")
+
+
+def _normalize(text: str, fixes: Set[str]) -> str:
+    """Rewrite almost-JSON into JSON in a single character scan"""
+    out: List[str] = []
+    stack: List[str] = []
+    quote: Optional[str] = None
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if quote:
+            if c == "\\":
+                if i + 1 < n:
+                    out.append(text[i : i + 2])
+                i += 2
+                continue
+            if c == quote and (quote == "'" or _closes_string(text, i)):
+                out.append('"')
+                quote = None
+            elif c == '"':
+                out.append('\\"')
+                fixes.add("single_quotes" if quote == "'" else "unescaped_quotes")
+            elif c in _CONTROL_ESCAPES or ord(c) < 0x20:
+                out.append(_CONTROL_ESCAPES.get(c, f"\\u{ord(c):04x}"))
+                fixes.add("control_characters")
+            else:
+                out.append(c)
+        elif c in "\"'":
+            quote = c
+            out.append('"')
+            if c == "'":
+                fixes.add("single_quotes")
+        elif c in "{[":
+            stack.append(c)
+            out.append(c)
+        elif c in "}]":
+            _drop_dangling(out, fixes)
+            if stack:
+                stack.pop()
+            out.append(c)
+        elif c.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            if word in _PYTHON_LITERALS:
+                word = _PYTHON_LITERALS[word]
+                fixes.add("python_literals")
+            out.append(word)
+            i = j
+            continue
+        else:
+            out.append(c)
+        i += 1
+
+    if quote:
+        out.append('"')
+        fixes.add("truncated")
+    if stack:
+        _drop_dangling(out, fixes)
+        for opener in reversed(stack):
+            out.append("}" if opener == "{" else "]")
+        fixes.add("truncated")
+    return "".join(out)
+
+
+def _single_string_field(schema: Dict[str, Any]) -> Optional[str]:
+    """Name of the only required property, if it is a string (e.g. `code`)"""
+    required = schema.get("required") or []
+    if len(required) != 1:
+        return None
+    prop = (schema.get("properties") or {}).get(required[0], {})
+    return required[0] if prop.get("type") == "string" else None
+
+
+def _extract_string_field(
+    text: str, field: str, fixes: Set[str]
+) -> Optional[Dict[str, Any]]:
+    """Take everything between `{"field": "` and the last `"}` as the value.
+
+    Used for single-string tools such as code execution, where the payload
+    often contains unescaped quotes that defeat token-level repair.
+    """
+    match = re.match(
+        rf'^\s*\{{\s*["\']{re.escape(field)}["\']\s*:\s*["\'](.*)["\']\s*\}}\s*$',
+        text,
+        re.DOTALL,
+    )
+    if not match:
+        return None
+    raw = match.group(1)
+    escaped = re.sub(r'(?<!\\)"', r"\"", raw)
+    escaped = "".join(_CONTROL_ESCAPES.get(c, c) for c in escaped)
+    try:
+        value = json.loads(f'"{escaped}"')
+    except json.JSONDecodeError:
+        return None
+    fixes.add("string_field")
+    return {field: value}
+
+
+def repair_json(
+    text: str, schema: Optional[Dict[str, Any]] = None, allow_extra: bool = False
+) -> Optional[Dict[str, Any]]:
+    """Repair malformed tool-call arguments.
+
+    Args:
+        text: The raw arguments string that failed to parse
+        schema: The tool's JSON schema for its parameters, used to reject
+            repairs that do not produce plausible arguments
+        allow_extra: Accept undeclared top-level arguments, as the tool's
+            own validator does for tools that take `**kwargs`
+
+    Returns:
+        The repaired arguments, or None if no unambiguous repair was found
+    """
+    repair_stats.attempts += 1
+    fixes: Set[str] = set()
+    candidates: List[Tuple[Optional[Dict[str, Any]], Set[str]]] = []
+
+    stripped = _strip_wrapping(text, fixes)
+    try:
+        candidates.append((json.loads(_normalize(stripped, fixes)), fixes))
+    except json.JSONDecodeError:
+        pass
+
+    validate = compile_schema(schema, allow_extra=allow_extra)
+    field = _single_string_field(schema or {})
+    if field:
+        field_fixes = {f for f in fixes if f in ("code_fence", "surrounding_text")}
+        candidates.append(
+            (_extract_string_field(stripped, field, field_fixes), field_fixes)
+        )
+
+    for value, applied in candidates:
+        if "truncated" in applied:
+            continue
+        if isinstance(value, dict) and not validate(value):
+            repair_stats.repaired += 1
+            repair_stats.fixes.update(applied)
+            logger.info(
+                f"Repaired tool arguments locally ({', '.join(sorted(applied))})"
+            )
+            return value
+
+    logger.warning("Tool arguments could not be repaired unambiguously")
+    return None
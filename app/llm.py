@@ -1,22 +1,108 @@
-from typing import Dict, List, Literal, Optional, Union
+import asyncio
+import inspect
+import json
+import re
+import time
+from contextlib import aclosing, contextmanager
+from contextvars import ContextVar
+from functools import partial
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 
 from openai import (
     APIError,
-    AsyncAzureOpenAI,
-    AsyncOpenAI,
     AuthenticationError,
+    BadRequestError,
     OpenAIError,
     RateLimitError,
 )
-from tenacity import retry, stop_after_attempt, wait_random_exponential
+from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
+from pydantic import BaseModel, ConfigDict
+from tenacity import retry, stop_after_attempt
 
+from app.cache import ResponseCache, get_response_cache, request_key
 from app.config import LLMSettings, config
+from app.endpoint_pool import FAILOVER_ERRORS, Endpoint, EndpointPool, PooledStream
+from app.exceptions import TokenLimitExceeded
+from app.json_repair import repair_json
 from app.logger import logger  # Assuming a logger is set up in your app
+from app.rate_limit import Priority, get_rate_limiter, request_priority
+from app.retry import RetryBudget, retry_budget, retry_if_retryable, wait_retry_after
 from app.schema import Message
+from app.singleflight import SingleFlight
+from app.telemetry import LLMCallRecord, current_context, report_usage, telemetry
+from app.token_counter import (
+    REPLY_OVERHEAD,
+    count_message_tokens,
+    count_text_tokens,
+    count_tools_tokens,
+)
+from app.tool.create_chat_completion import CreateChatCompletion
+from app.tool.tool_collection import accepts_kwargs
+
+
+# Seconds before the learned hedge delay is recomputed from telemetry
+_HEDGE_DELAY_REFRESH = 30.0
+
+# Structured-output tool and response_format per response type, built once
+_structured_formats: Dict[Any, Tuple[CreateChatCompletion, dict]] = {}
+
+# Telemetry record of the logical call currently being served
+_current_record: ContextVar[Optional[LLMCallRecord]] = ContextVar(
+    "llm_call_record", default=None
+)
+
+
+# Receives streamed text deltas; a sync sink or an awaitable one (backpressure)
+TokenSink = Callable[[str], Any]
+
+_token_sink: ContextVar[Optional[TokenSink]] = ContextVar(
+    "llm_token_sink", default=None
+)
+
+
+@contextmanager
+def token_sink(sink: Optional[TokenSink]) -> Iterator[None]:
+    """Send text streamed by LLM calls made inside the block to `sink`"""
+    token = _token_sink.set(sink)
+    try:
+        yield
+    finally:
+        _token_sink.reset(token)
+
+
+class BatchResult(BaseModel):
+    """Outcome of one item of an ask_many / ask_tool_many batch"""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: int
+    result: Any = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
 
 class LLM:
     _instances: Dict[str, "LLM"] = {}
+    # Identical concurrent requests share one upstream call, across all configs
+    inflight: SingleFlight = SingleFlight()
 
     def __new__(
         cls, config_name: str = "default", llm_config: Optional[LLMSettings] = None
@@ -33,21 +119,405 @@ class LLM:
         if not hasattr(self, "client"):  # Only initialize if not already initialized
             llm_config = llm_config or config.llm
             llm_config = llm_config.get(config_name, llm_config["default"])
+            self.config_name = config_name
             self.model = llm_config.model
             self.max_tokens = llm_config.max_tokens
+            self.context_window = llm_config.context_window
+            self.context_margin = llm_config.context_margin
             self.temperature = llm_config.temperature
             self.api_type = llm_config.api_type
             self.api_key = llm_config.api_key
             self.api_version = llm_config.api_version
             self.base_url = llm_config.base_url
-            if self.api_type == "azure":
-                self.client = AsyncAzureOpenAI(
-                    base_url=self.base_url,
-                    api_key=self.api_key,
-                    api_version=self.api_version,
+            self.pool = EndpointPool.from_settings(llm_config)
+            self.rate_limiter = get_rate_limiter(
+                config_name, rpm=llm_config.rpm, tpm=llm_config.tpm
+            )
+            self.client = self.pool.endpoints[0].client
+            self.cache: Optional[ResponseCache] = get_response_cache()
+            self.coalesce_requests = llm_config.coalesce_requests
+            self.batch_concurrency = llm_config.batch_concurrency
+            self.structured_output = llm_config.structured_output
+            self.hedge = llm_config.hedge
+            self.hedge_config = llm_config.hedge_config
+            self.hedge_percentile = llm_config.hedge_percentile
+            self.hedge_min_samples = llm_config.hedge_min_samples
+            self.input_cost_per_million = llm_config.input_cost_per_million
+            self.output_cost_per_million = llm_config.output_cost_per_million
+            self.hedge_budget = RetryBudget(
+                ratio=llm_config.hedge_max_fraction, min_per_minute=0
+            )
+            self._hedge_delays: Dict[bool, tuple] = {}
+
+    async def _create_completion(self, prompt_tokens: int = 0, **params):
+        """
+        Send a chat completion request, hedging it when it runs unusually long.
+
+        With hedging enabled, if the response (or, when streaming, the first
+        byte) has not arrived within the learned hedge delay, a duplicate
+        request goes to `hedge_config` (or this config again). The first
+        successful response wins and the other request is cancelled. Hedges
+        are capped at `hedge_max_fraction` of this config's requests.
+        """
+        stream = bool(params.get("stream"))
+        primary = asyncio.ensure_future(self._send_completion(prompt_tokens, **params))
+        delay = self._hedge_delay(stream)
+        if delay is None:
+            return await primary
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(primary), delay)
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            primary.cancel()
+            raise
+        if not self.hedge_budget.try_spend():
+            return await primary
+
+        target = LLM(self.hedge_config) if self.hedge_config else self
+        logger.info(f"Hedging LLM request to '{target.config_name}' after {delay:.2f}s")
+        record = _current_record.get()
+        if record:
+            record.hedged = True
+        hedge = asyncio.ensure_future(
+            target._send_completion(prompt_tokens, **{**params, "model": target.model})
+        )
+        return await self._first_success([primary, hedge])
+
+    @staticmethod
+    async def _first_success(tasks: List[asyncio.Future]) -> Any:
+        """Return the first successful result and cancel or close the rest"""
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
                 )
+                winners = [t for t in done if not t.cancelled() and not t.exception()]
+                if winners:
+                    for loser in winners[1:]:
+                        close = getattr(loser.result(), "close", None)
+                        if close and inspect.iscoroutinefunction(close):
+                            await close()
+                    return winners[0].result()
+                error = next((t.exception() for t in done if not t.cancelled()), error)
+            raise error or asyncio.CancelledError()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _hedge_delay(self, stream: bool) -> Optional[float]:
+        """Hedge threshold learned from recent telemetry, or None if not hedging"""
+        if not self.hedge:
+            return None
+        now = time.monotonic()
+        cached = self._hedge_delays.get(stream)
+        if cached and now - cached[0] < _HEDGE_DELAY_REFRESH:
+            return cached[1]
+        delay = telemetry.latency_percentile(
+            self.hedge_percentile,
+            field="ttft" if stream else "attempt_latency",
+            min_samples=self.hedge_min_samples,
+            config_name=self.config_name,
+            stream=stream,
+        )
+        if delay is not None:
+            self._hedge_delays[stream] = (now, delay)
+        return delay
+
+    async def _send_completion(self, prompt_tokens: int = 0, **params):
+        """
+        Send a chat completion request through the rate limiter and endpoint pool.
+
+        The call first waits for its turn in the config's shared rate limiter
+        (charging `prompt_tokens` against the TPM bucket).
+
+        Transient failures (connection errors, 5xx, rate limits) are reported
+        to the pool and the request is immediately retried on another healthy
+        endpoint. The error propagates to the caller's retry policy once no
+        untried healthy endpoint is left.
+
+        A stream is returned once its first chunk arrives, as a `PooledStream`
+        holding the endpoint slot until it is read to the end or closed; a
+        stream failing before its first chunk fails over like any request.
+        """
+        await self.rate_limiter.acquire(prompt_tokens)
+        retry_budget.record_request()
+        self.hedge_budget.record_request()
+
+        record = _current_record.get()
+        stream = bool(params.get("stream"))
+        tried: List[Endpoint] = []
+        while True:
+            endpoint = await self.pool.reserve(exclude=tried)
+            # A returned stream holds the slot until it is read to the end
+            handed_off = False
+            try:
+                if record:
+                    record.attempts += 1
+                    record.endpoint = endpoint.base_url
+                start = time.monotonic()
+                try:
+                    response = await endpoint.client.chat.completions.create(**params)
+                    if stream:
+                        response = await PooledStream.open(
+                            response, self.pool, endpoint, start
+                        )
+                        if record and record.ttft is None:
+                            record.ttft = time.monotonic() - start
+                except FAILOVER_ERRORS as e:
+                    self.pool.report_failure(endpoint, e)
+                    tried.append(endpoint)
+                    if not self.pool.has_alternative(tried):
+                        raise
+                    logger.warning(
+                        f"LLM endpoint {endpoint.base_url} failed, failing over: {e}"
+                    )
+                    continue
+                if stream:
+                    handed_off = True
+                    return response
+                elapsed = time.monotonic() - start
+                self.pool.report_success(endpoint, elapsed)
+                if record and record.attempt_latency is None:
+                    record.attempt_latency = elapsed
+                usage = getattr(response, "usage", None)
+                if usage:
+                    self.rate_limiter.record_usage(usage.completion_tokens)
+                    self._record_usage(usage)
+                return response
+            finally:
+                if not handed_off:
+                    await self.pool.release(endpoint)
+
+    async def _observe(
+        self, method: str, stream: bool, call: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Run one logical call (with its retries) and record its telemetry"""
+        context = current_context()
+        record = LLMCallRecord(
+            method=method,
+            model=self.model,
+            config_name=self.config_name,
+            stream=stream,
+            agent=context.get("agent"),
+            step=context.get("step"),
+            task_id=context.get("task_id"),
+            purpose=context.get("purpose"),
+        )
+        token = _current_record.set(record)
+        start = time.monotonic()
+        try:
+            return await call()
+        except BaseException as e:
+            record.success = False
+            record.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_record.reset(token)
+            record.latency = time.monotonic() - start
+            record.cost = self._estimate_cost(record)
+            telemetry.record(record)
+            report_usage(record)
+            logger.debug(f"LLM call: {record.model_dump_json(exclude_none=True)}")
+
+    def _estimate_cost(self, record: LLMCallRecord) -> Optional[float]:
+        """Cost of a call from the config's token prices, if any are set"""
+        if self.input_cost_per_million is None and self.output_cost_per_million is None:
+            return None
+        return (
+            record.prompt_tokens * (self.input_cost_per_million or 0.0)
+            + record.completion_tokens * (self.output_cost_per_million or 0.0)
+        ) / 1_000_000
+
+    @staticmethod
+    def _mark_cache_hit() -> None:
+        record = _current_record.get()
+        if record:
+            record.cache_hit = True
+            record.prompt_tokens = 0
+            record.usage_estimated = False
+
+    @staticmethod
+    def _record_usage(usage: Any) -> None:
+        """Copy provider-reported token usage onto the current telemetry record"""
+        record = _current_record.get()
+        if not record or not usage:
+            return
+        record.prompt_tokens = usage.prompt_tokens or 0
+        record.completion_tokens = usage.completion_tokens or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        record.cached_tokens = (
+            (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        )
+        record.usage_estimated = False
+
+    @staticmethod
+    def _record_stream_chunk(chunk: Any) -> None:
+        """Track any usage reported in a stream"""
+        if getattr(chunk, "usage", None):
+            LLM._record_usage(chunk.usage)
+
+    def _record_stream_completion(self, text: str) -> None:
+        """Charge a finished stream's completion tokens to the TPM bucket.
+
+        Streams rarely report usage, so unless one did, the tokens are
+        estimated from the streamed text (and recorded as estimates).
+        """
+        record = _current_record.get()
+        if record and not record.usage_estimated:
+            completion_tokens = record.completion_tokens
+        else:
+            completion_tokens = count_text_tokens(text)
+            if record:
+                record.completion_tokens = completion_tokens
+        self.rate_limiter.record_usage(completion_tokens)
+
+    def _coalesce_key(
+        self,
+        kind: str,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        **request,
+    ) -> Optional[str]:
+        """Return the single-flight key for a request, or None if coalescing is off"""
+        if not self.coalesce_requests:
+            return None
+        return request_key(
+            kind=kind,
+            model=self.model,
+            max_tokens=self.max_tokens,
+            messages=self.format_messages((system_msgs or []) + list(messages)),
+            **request,
+        )
+
+    def _temperature(self, temperature: Optional[float]) -> float:
+        """The requested temperature, including an explicit 0, else the config's"""
+        return self.temperature if temperature is None else temperature
+
+    def _cache_key(self, kind: str, temperature: float, **request) -> Optional[str]:
+        """Return the response-cache key for a request, or None if it is not cacheable.
+
+        Only deterministic requests (temperature 0) are cached.
+        """
+        if not self.cache or temperature != 0:
+            return None
+        return request_key(
+            kind=kind,
+            model=self.model,
+            max_tokens=self.max_tokens,
+            temperature=temperature,
+            **request,
+        )
+
+    def _estimate_prompt_tokens(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        tools: Optional[List[dict]] = None,
+    ) -> int:
+        """Estimate prompt tokens for rate limiting and telemetry"""
+        prompt_tokens = (
+            sum(self.count_tokens(msg) for msg in (system_msgs or []) + list(messages))
+            + count_tools_tokens(tools)
+            + REPLY_OVERHEAD
+        )
+        record = _current_record.get()
+        if record:
+            record.prompt_tokens = prompt_tokens
+            record.usage_estimated = True
+        return prompt_tokens
+
+    @staticmethod
+    def count_tokens(message: Union[dict, Message]) -> int:
+        """Estimate the tokens of one message, using the cached count for Message objects"""
+        if isinstance(message, Message):
+            return message.token_count
+        return count_message_tokens(message)
+
+    def fit_to_context(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        tools: Optional[List[dict]] = None,
+    ) -> List[Union[dict, Message]]:
+        """
+        Trim the oldest history so the request fits the model's context window.
+
+        Messages are dropped from the front in whole conversational units: an
+        assistant message is never separated from the tool results answering
+        its tool calls, and system messages are always kept. The most recent
+        unit is never dropped. Token counts are local estimates, so
+        `context_margin` of the window is kept free for their error.
+
+        Args:
+            messages: Conversation messages, oldest first
+            system_msgs: System messages that will be prepended to the request
+            tools: Tool definitions that will be sent with the request
+
+        Returns:
+            List of messages that fits within the usable context window
+            less `max_tokens`
+
+        Raises:
+            TokenLimitExceeded: If the request cannot fit even after trimming
+        """
+        budget = (
+            int(self.context_window * (1 - self.context_margin))
+            - self.max_tokens
+            - REPLY_OVERHEAD
+            - count_tools_tokens(tools)
+            - sum(self.count_tokens(msg) for msg in system_msgs or [])
+        )
+
+        units: List[List[Union[dict, Message]]] = []
+        unit_tokens: List[int] = []
+        for message in messages:
+            role = message["role"] if isinstance(message, dict) else message.role
+            if role == "tool" and units:
+                units[-1].append(message)
+                unit_tokens[-1] += self.count_tokens(message)
             else:
-                self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+                units.append([message])
+                unit_tokens.append(self.count_tokens(message))
+
+        total = sum(unit_tokens)
+        if total <= budget:
+            return messages
+
+        kept: List[Union[dict, Message]] = []
+        dropped = 0
+        for i, (unit, tokens) in enumerate(zip(units, unit_tokens)):
+            role = unit[0]["role"] if isinstance(unit[0], dict) else unit[0].role
+            if total > budget and role != "system" and i < len(units) - 1:
+                total -= tokens
+                dropped += len(unit)
+                continue
+            kept.extend(unit)
+
+        if total > budget:
+            raise TokenLimitExceeded(
+                f"Request needs ~{total} tokens but only {budget} are available "
+                f"in the {self.context_window}-token context window "
+                f"(less a {self.context_margin:.0%} estimation margin)"
+            )
+        logger.warning(
+            f"Trimmed {dropped} oldest messages to fit the context window "
+            f"(~{total}/{budget} tokens)"
+        )
+        return kept
+
+    @staticmethod
+    def _is_context_overflow(error: OpenAIError) -> bool:
+        """Check whether a provider error reports a context-length overflow"""
+        if not isinstance(error, BadRequestError):
+            return False
+        if getattr(error, "code", None) == "context_length_exceeded":
+            return True
+        message = str(error).lower()
+        return "context length" in message or "context window" in message
 
     @staticmethod
     def format_messages(messages: List[Union[dict, Message]]) -> List[dict]:
@@ -97,16 +567,26 @@ class LLM:
 
         return formatted_messages
 
-    @retry(
-        wait=wait_random_exponential(min=1, max=60),
-        stop=stop_after_attempt(6),
-    )
+    @staticmethod
+    async def _emit_token(
+        sink: Optional[TokenSink], delta: str, end: bool = False
+    ) -> None:
+        """Hand a streamed delta to the sink, or print it if there is none"""
+        if sink is None:
+            print(delta, end="\n" if end else "", flush=True)
+            return
+        if delta:
+            result = sink(delta)
+            if inspect.isawaitable(result):
+                await result
+
     async def ask(
         self,
         messages: List[Union[dict, Message]],
         system_msgs: Optional[List[Union[dict, Message]]] = None,
         stream: bool = True,
         temperature: Optional[float] = None,
+        on_token: Optional[TokenSink] = None,
     ) -> str:
         """
         Send a prompt to the LLM and get the response.
@@ -116,6 +596,9 @@ class LLM:
             system_msgs: Optional system messages to prepend
             stream (bool): Whether to stream the response
             temperature (float): Sampling temperature for the response
+            on_token: Optional callback (sync or async) receiving each text
+                delta while streaming. Defaults to the sink installed with
+                `token_sink`, or printing to the console if there is none.
 
         Returns:
             str: The generated response
@@ -125,7 +608,124 @@ class LLM:
             OpenAIError: If API call fails after retries
             Exception: For unexpected errors
         """
+        on_token = on_token or _token_sink.get()
+        # Token sinks are per caller, so streams feeding one are never shared
+        key = (
+            None
+            if stream and on_token
+            else self._coalesce_key(
+                "ask",
+                messages,
+                system_msgs,
+                temperature=self._temperature(temperature),
+            )
+        )
+        call = partial(
+            self._observe,
+            "ask",
+            stream,
+            partial(self._ask, messages, system_msgs, stream, temperature, on_token),
+        )
+        if key is None:
+            return await call()
+        return await self.inflight.do(key, call)
+
+    async def ask_stream(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        temperature: Optional[float] = None,
+        buffer: int = 64,
+    ) -> AsyncIterator[str]:
+        """
+        Stream the response to a prompt as text deltas.
+
+        At most `buffer` deltas are held for a slow consumer before reading
+        from the provider pauses. Leaving the loop early cancels the request.
+        If a stream fails part-way and is retried, deltas restart from the
+        beginning of the new response.
+
+        Args:
+            messages: List of conversation messages
+            system_msgs: Optional system messages to prepend
+            temperature: Sampling temperature for the response
+            buffer: Maximum deltas queued ahead of the consumer
+
+        Yields:
+            str: Text deltas in arrival order
+        """
+        deltas: asyncio.Queue = asyncio.Queue(maxsize=buffer)
+        request = asyncio.ensure_future(
+            self.ask(
+                messages,
+                system_msgs,
+                stream=True,
+                temperature=temperature,
+                on_token=deltas.put,
+            )
+        )
         try:
+            while True:
+                getter = asyncio.ensure_future(deltas.get())
+                await asyncio.wait(
+                    [getter, request], return_when=asyncio.FIRST_COMPLETED
+                )
+                if not getter.done():
+                    getter.cancel()
+                    break
+                yield getter.result()
+            while not deltas.empty():
+                yield deltas.get_nowait()
+            request.result()  # Raise the request's error, if any
+        finally:
+            request.cancel()
+
+    async def ask_many(
+        self,
+        prompts: Iterable[List[Union[dict, Message]]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        temperature: Optional[float] = None,
+        concurrency: Optional[int] = None,
+    ) -> AsyncIterator[BatchResult]:
+        """
+        Run many independent prompts and yield results as they complete.
+
+        Args:
+            prompts: Message lists, one per independent request
+            system_msgs: Optional system messages prepended to every prompt
+            temperature: Sampling temperature for the responses
+            concurrency: Maximum requests in flight (defaults to the
+                config's batch_concurrency)
+
+        Yields:
+            BatchResult: In completion order; `index` is the prompt's position
+            and a failed item carries its exception in `error`
+        """
+        calls = (
+            partial(self.ask, messages, system_msgs, False, temperature)
+            for messages in prompts
+        )
+        async for result in self._run_batch(calls, concurrency):
+            yield result
+
+    @retry(
+        wait=wait_retry_after(),
+        stop=stop_after_attempt(6),
+        retry=retry_if_retryable(),
+    )
+    async def _ask(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        stream: bool = True,
+        temperature: Optional[float] = None,
+        on_token: Optional[TokenSink] = None,
+    ) -> str:
+        """Send the request for `ask`, retried per the LLM retry policy"""
+        try:
+            messages = self.fit_to_context(messages, system_msgs)
+            prompt_tokens = self._estimate_prompt_tokens(messages, system_msgs)
+
             # Format system and user messages
             if system_msgs:
                 system_msgs = self.format_messages(system_msgs)
@@ -133,38 +733,64 @@ class LLM:
             else:
                 messages = self.format_messages(messages)
 
+            temperature = self._temperature(temperature)
+            cache_key = self._cache_key(
+                "ask", messages=messages, temperature=temperature
+            )
+            if cache_key:
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    logger.debug("LLM response served from cache")
+                    self._mark_cache_hit()
+                    if stream:
+                        await self._emit_token(on_token, cached, end=True)
+                    return cached
+
             if not stream:
                 # Non-streaming request
-                response = await self.client.chat.completions.create(
+                response = await self._create_completion(
+                    prompt_tokens=prompt_tokens,
                     model=self.model,
                     messages=messages,
                     max_tokens=self.max_tokens,
-                    temperature=temperature or self.temperature,
+                    temperature=temperature,
                     stream=False,
                 )
                 if not response.choices or not response.choices[0].message.content:
                     raise ValueError("Empty or invalid response from LLM")
-                return response.choices[0].message.content
+                content = response.choices[0].message.content
+                if cache_key:
+                    await self.cache.set(cache_key, content)
+                return content
 
             # Streaming request
-            response = await self.client.chat.completions.create(
+            response = await self._create_completion(
+                prompt_tokens=prompt_tokens,
                 model=self.model,
                 messages=messages,
                 max_tokens=self.max_tokens,
-                temperature=temperature or self.temperature,
+                temperature=temperature,
                 stream=True,
             )
 
             collected_messages = []
-            async for chunk in response:
-                chunk_message = chunk.choices[0].delta.content or ""
-                collected_messages.append(chunk_message)
-                print(chunk_message, end="", flush=True)
+            async with aclosing(response):
+                async for chunk in response:
+                    self._record_stream_chunk(chunk)
+                    if not chunk.choices:
+                        continue
+                    chunk_message = chunk.choices[0].delta.content or ""
+                    collected_messages.append(chunk_message)
+                    if chunk_message:
+                        await self._emit_token(on_token, chunk_message)
 
-            print()  # Newline after streaming
+            await self._emit_token(on_token, "", end=True)
             full_response = "".join(collected_messages).strip()
+            self._record_stream_completion(full_response)
             if not full_response:
                 raise ValueError("Empty response from streaming LLM")
+            if cache_key:
+                await self.cache.set(cache_key, full_response)
             return full_response
 
         except ValueError as ve:
@@ -172,15 +798,157 @@ class LLM:
             raise
         except OpenAIError as oe:
             logger.error(f"OpenAI API error: {oe}")
+            if self._is_context_overflow(oe):
+                raise TokenLimitExceeded(str(oe)) from oe
             raise
         except Exception as e:
             logger.error(f"Unexpected error in ask: {e}")
             raise
 
+    async def ask_structured(
+        self,
+        messages: List[Union[dict, Message]],
+        response_type: Type = str,
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        temperature: Optional[float] = None,
+    ) -> Any:
+        """
+        Ask for a response of a given type, such as a pydantic model.
+
+        Uses the provider's native JSON-schema response_format when the config
+        allows it. If the provider rejects response_format, this LLM switches
+        to the CreateChatCompletion tool-call form for this and later calls;
+        if a native response does not parse or validate, only this call is
+        retried in the tool-call form.
+
+        Args:
+            messages: List of conversation messages
+            response_type: Type of the response (pydantic model, str, int,
+                List[...], Dict[...], Union[...])
+            system_msgs: Optional system messages to prepend
+            temperature: Sampling temperature for the response
+
+        Returns:
+            The response converted to `response_type`
+
+        Raises:
+            ValueError: If the response does not match the schema
+            TokenLimitExceeded: If the request does not fit the context window
+        """
+        tool, response_format = self._structured_format(response_type)
+        if self.structured_output:
+            try:
+                content = await self._observe(
+                    "ask_structured",
+                    False,
+                    partial(
+                        self._ask_structured,
+                        messages,
+                        system_msgs,
+                        response_format,
+                        temperature,
+                    ),
+                )
+                return await self._to_response_type(tool, content)
+            except BadRequestError as e:
+                if not self._rejects_response_format(e):
+                    raise
+                logger.warning(
+                    f"Native structured output unavailable for {self.model}, "
+                    f"falling back to tool calling: {e}"
+                )
+                self.structured_output = False
+            except (ValueError, TypeError) as e:
+                logger.warning(
+                    f"Structured response from {self.model} did not match the "
+                    f"schema, retrying with tool calling: {e}"
+                )
+
+        response = await self.ask_tool(
+            messages,
+            system_msgs,
+            tools=[tool.to_param()],
+            tool_choice="required",
+            temperature=temperature,
+        )
+        if not response.tool_calls:
+            raise ValueError("Model did not return a structured response")
+        return await self._to_response_type(
+            tool, response.tool_calls[0].function.arguments
+        )
+
+    @staticmethod
+    def _rejects_response_format(error: BadRequestError) -> bool:
+        """Whether a 400 error is the provider refusing response_format itself"""
+        message = str(error).lower()
+        return "response_format" in message or "json_schema" in message
+
+    @staticmethod
+    def _structured_format(
+        response_type: Type,
+    ) -> Tuple[CreateChatCompletion, dict]:
+        """Schema tool and response_format for a response type, cached per type"""
+        if response_type not in _structured_formats:
+            tool = CreateChatCompletion(response_type)
+            name = re.sub(
+                r"[^a-zA-Z0-9_-]", "_", getattr(response_type, "__name__", "response")
+            )
+            response_format = {
+                "type": "json_schema",
+                "json_schema": {"name": name, "schema": tool.parameters},
+            }
+            _structured_formats[response_type] = (tool, response_format)
+        return _structured_formats[response_type]
+
+    @staticmethod
+    async def _to_response_type(tool: CreateChatCompletion, text: str) -> Any:
+        """Parse (repairing if needed) structured output into the response type"""
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            data = repair_json(
+                text, tool.parameters, allow_extra=accepts_kwargs(tool)
+            )
+        if not isinstance(data, dict):
+            raise ValueError("Structured response must be a JSON object")
+        response_type = tool.response_type
+        if isinstance(response_type, type) and issubclass(response_type, BaseModel):
+            return response_type.model_validate(data)
+        return await tool.execute(**data)
+
     @retry(
-        wait=wait_random_exponential(min=1, max=60),
+        wait=wait_retry_after(),
         stop=stop_after_attempt(6),
+        retry=retry_if_retryable(),
     )
+    async def _ask_structured(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]],
+        response_format: dict,
+        temperature: Optional[float] = None,
+    ) -> str:
+        """Send the request for `ask_structured`, retried per the LLM retry policy"""
+        messages = self.fit_to_context(messages, system_msgs)
+        prompt_tokens = self._estimate_prompt_tokens(messages, system_msgs)
+        messages = self.format_messages((system_msgs or []) + messages)
+        try:
+            response = await self._create_completion(
+                prompt_tokens=prompt_tokens,
+                model=self.model,
+                messages=messages,
+                max_tokens=self.max_tokens,
+                temperature=self._temperature(temperature),
+                response_format=response_format,
+            )
+        except BadRequestError as e:
+            if self._is_context_overflow(e):
+                raise TokenLimitExceeded(str(e)) from e
+            raise
+        if not response.choices or not response.choices[0].message.content:
+            raise ValueError("Empty or invalid response from LLM")
+        return response.choices[0].message.content
+
     async def ask_tool(
         self,
         messages: List[Union[dict, Message]],
@@ -189,6 +957,10 @@ class LLM:
         tools: Optional[List[dict]] = None,
         tool_choice: Literal["none", "auto", "required"] = "auto",
         temperature: Optional[float] = None,
+        stream: bool = False,
+        on_tool_call: Optional[Callable[[ChatCompletionMessageToolCall], Any]] = None,
+        on_token: Optional[TokenSink] = None,
+        on_stream_error: Optional[Callable[[], Any]] = None,
         **kwargs,
     ):
         """
@@ -201,6 +973,18 @@ class LLM:
             tools: List of tools to use
             tool_choice: Tool choice strategy
             temperature: Sampling temperature for the response
+            stream: Whether to stream the response and assemble tool calls
+                from the incremental deltas
+            on_tool_call: Optional callback (sync or async) invoked with each
+                tool call as soon as its JSON arguments are complete. Only
+                used when streaming.
+            on_token: Optional callback (sync or async) receiving the text
+                content deltas while streaming. Defaults to the sink installed
+                with `token_sink`; nothing is printed without one.
+            on_stream_error: Optional callback (sync or async) invoked when a
+                stream fails after calls were passed to `on_tool_call`. Those
+                calls are void: the request is retried or fails, so work
+                started for them should be cancelled.
             **kwargs: Additional completion arguments
 
         Returns:
@@ -211,11 +995,150 @@ class LLM:
             OpenAIError: If API call fails after retries
             Exception: For unexpected errors
         """
+        on_token = on_token or _token_sink.get()
+        call = partial(
+            self._observe,
+            "ask_tool",
+            stream,
+            partial(
+                self._ask_tool,
+                messages,
+                system_msgs,
+                timeout,
+                tools,
+                tool_choice,
+                temperature,
+                stream,
+                on_tool_call,
+                on_token,
+                on_stream_error,
+                **kwargs,
+            ),
+        )
+        # Early-dispatch callbacks and token sinks are per caller, so those
+        # calls are never shared
+        key = (
+            None
+            if on_tool_call or (stream and on_token)
+            else self._coalesce_key(
+                "ask_tool",
+                messages,
+                system_msgs,
+                temperature=self._temperature(temperature),
+                tools=tools,
+                tool_choice=tool_choice,
+                **kwargs,
+            )
+        )
+        if key is None:
+            return await call()
+        return await self.inflight.do(key, call)
+
+    async def ask_tool_many(
+        self,
+        prompts: Iterable[List[Union[dict, Message]]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        tools: Optional[List[dict]] = None,
+        tool_choice: Literal["none", "auto", "required"] = "auto",
+        temperature: Optional[float] = None,
+        concurrency: Optional[int] = None,
+        **kwargs,
+    ) -> AsyncIterator[BatchResult]:
+        """
+        Run many independent tool-calling prompts and yield results as they complete.
+
+        Takes the same arguments as ask_tool, shared by every prompt. Results
+        are ChatCompletionMessage objects wrapped in BatchResult, as in ask_many.
+        """
+        calls = (
+            partial(
+                self.ask_tool,
+                messages,
+                system_msgs,
+                tools=tools,
+                tool_choice=tool_choice,
+                temperature=temperature,
+                **kwargs,
+            )
+            for messages in prompts
+        )
+        async for result in self._run_batch(calls, concurrency):
+            yield result
+
+    async def _run_batch(
+        self,
+        calls: Iterable[Callable[[], Awaitable[Any]]],
+        concurrency: Optional[int] = None,
+    ) -> AsyncIterator[BatchResult]:
+        """Run calls on a bounded worker pool, yielding results in completion order.
+
+        Calls run in the background rate-limiter lane, so interactive agent
+        steps are served first. Items are pulled lazily from `calls`, and the
+        workers are cancelled if the consumer stops iterating early.
+        """
+        items = enumerate(calls)
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def worker() -> None:
+            try:
+                for index, call in items:
+                    try:
+                        result = BatchResult(index=index, result=await call())
+                    except Exception as e:
+                        logger.warning(f"Batch item {index} failed: {e}")
+                        result = BatchResult(index=index, error=e)
+                    results.put_nowait(result)
+            finally:
+                results.put_nowait(None)  # this worker is finished
+
+        with request_priority(Priority.BACKGROUND):
+            workers = [
+                asyncio.ensure_future(worker())
+                for _ in range(max(1, concurrency or self.batch_concurrency))
+            ]
+        try:
+            running = len(workers)
+            while running:
+                result = await results.get()
+                if result is None:
+                    running -= 1
+                else:
+                    yield result
+            # Surface failures of the prompt iterable itself
+            for task in workers:
+                task.result()
+        finally:
+            for task in workers:
+                task.cancel()
+
+    @retry(
+        wait=wait_retry_after(),
+        stop=stop_after_attempt(6),
+        retry=retry_if_retryable(),
+    )
+    async def _ask_tool(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        timeout: int = 60,
+        tools: Optional[List[dict]] = None,
+        tool_choice: Literal["none", "auto", "required"] = "auto",
+        temperature: Optional[float] = None,
+        stream: bool = False,
+        on_tool_call: Optional[Callable[[ChatCompletionMessageToolCall], Any]] = None,
+        on_token: Optional[TokenSink] = None,
+        on_stream_error: Optional[Callable[[], Any]] = None,
+        **kwargs,
+    ):
+        """Send the request for `ask_tool`, retried per the LLM retry policy"""
         try:
             # Validate tool_choice
             if tool_choice not in ["none", "auto", "required"]:
                 raise ValueError(f"Invalid tool_choice: {tool_choice}")
 
+            messages = self.fit_to_context(messages, system_msgs, tools)
+            prompt_tokens = self._estimate_prompt_tokens(messages, system_msgs, tools)
+
             # Format messages
             if system_msgs:
                 system_msgs = self.format_messages(system_msgs)
@@ -229,29 +1152,58 @@ class LLM:
                     if not isinstance(tool, dict) or "type" not in tool:
                         raise ValueError("Each tool must be a dict with 'type' field")
 
+            temperature = self._temperature(temperature)
+            cache_key = self._cache_key(
+                "ask_tool",
+                messages=messages,
+                temperature=temperature,
+                tools=tools,
+                tool_choice=tool_choice,
+                **kwargs,
+            )
+            if cache_key:
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    logger.debug("LLM tool response served from cache")
+                    self._mark_cache_hit()
+                    return ChatCompletionMessage.model_validate_json(cached)
+
             # Set up the completion request
-            response = await self.client.chat.completions.create(
+            response = await self._create_completion(
+                prompt_tokens=prompt_tokens,
                 model=self.model,
                 messages=messages,
-                temperature=temperature or self.temperature,
+                temperature=temperature,
                 max_tokens=self.max_tokens,
                 tools=tools,
                 tool_choice=tool_choice,
                 timeout=timeout,
+                stream=stream,
                 **kwargs,
             )
 
-            # Check if response is valid
-            if not response.choices or not response.choices[0].message:
-                print(response)
-                raise ValueError("Invalid or empty response from LLM")
+            if stream:
+                message = await self._collect_tool_call_stream(
+                    response, on_tool_call, on_token, on_stream_error
+                )
+            else:
+                # Check if response is valid
+                if not response.choices or not response.choices[0].message:
+                    print(response)
+                    raise ValueError("Invalid or empty response from LLM")
+                message = response.choices[0].message
 
-            return response.choices[0].message
+            if cache_key:
+                await self.cache.set(cache_key, message.model_dump_json())
+            return message
 
         except ValueError as ve:
             logger.error(f"Validation error in ask_tool: {ve}")
             raise
         except OpenAIError as oe:
+            if self._is_context_overflow(oe):
+                logger.error(f"Request exceeds the context window: {oe}")
+                raise TokenLimitExceeded(str(oe)) from oe
             if isinstance(oe, AuthenticationError):
                 logger.error("Authentication failed. Check API key.")
             elif isinstance(oe, RateLimitError):
@@ -262,3 +1214,111 @@ class LLM:
         except Exception as e:
             logger.error(f"Unexpected error in ask_tool: {e}")
             raise
+
+    @staticmethod
+    def _arguments_complete(arguments: str) -> bool:
+        """Check whether streamed tool-call arguments form a complete JSON object"""
+        if not arguments.rstrip().endswith("}"):
+            return False
+        try:
+            json.loads(arguments)
+        except json.JSONDecodeError:
+            return False
+        return True
+
+    async def _collect_tool_call_stream(
+        self,
+        response,
+        on_tool_call: Optional[Callable[[ChatCompletionMessageToolCall], Any]] = None,
+        on_token: Optional[TokenSink] = None,
+        on_stream_error: Optional[Callable[[], Any]] = None,
+    ) -> ChatCompletionMessage:
+        """
+        Assemble a streamed tool-call completion into a single message.
+
+        Tool-call deltas are accumulated per index. Each call is handed to
+        `on_tool_call` once its arguments parse as a complete JSON object, so
+        the caller can start executing it while later calls are still being
+        generated. Calls that never parse are dispatched when the stream ends.
+
+        Args:
+            response: The async chunk stream returned by the completions API
+            on_tool_call: Optional callback for early dispatch of tool calls
+            on_token: Optional sink for the text content deltas
+            on_stream_error: Optional callback invoked if the stream fails
+                after a call was dispatched
+
+        Returns:
+            ChatCompletionMessage: The assembled response
+
+        Raises:
+            ValueError: If the stream contains neither content nor tool calls
+        """
+        content_parts: List[str] = []
+        pending: Dict[int, dict] = {}
+        assembled: Dict[int, ChatCompletionMessageToolCall] = {}
+
+        async def dispatch(index: int) -> None:
+            entry = pending[index]
+            tool_call = ChatCompletionMessageToolCall(
+                id=entry["id"],
+                type="function",
+                function=Function(name=entry["name"], arguments=entry["arguments"]),
+            )
+            assembled[index] = tool_call
+            if on_tool_call:
+                result = on_tool_call(tool_call)
+                if inspect.isawaitable(result):
+                    await result
+
+        try:
+            async with aclosing(response):
+                async for chunk in response:
+                    self._record_stream_chunk(chunk)
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta
+                    if delta.content:
+                        content_parts.append(delta.content)
+                        if on_token:
+                            await self._emit_token(on_token, delta.content)
+
+                    for tool_delta in delta.tool_calls or []:
+                        entry = pending.setdefault(
+                            tool_delta.index, {"id": "", "name": "", "arguments": ""}
+                        )
+                        if tool_delta.id:
+                            entry["id"] = tool_delta.id
+                        if tool_delta.function:
+                            entry["name"] += tool_delta.function.name or ""
+                            entry["arguments"] += tool_delta.function.arguments or ""
+                        if (
+                            tool_delta.index not in assembled
+                            and self._arguments_complete(entry["arguments"])
+                        ):
+                            await dispatch(tool_delta.index)
+        except BaseException:
+            # Dispatched calls will not be in any message: the request is
+            # retried (with new call ids) or fails
+            if assembled and on_stream_error:
+                result = on_stream_error()
+                if inspect.isawaitable(result):
+                    await result
+            raise
+
+        for index in sorted(pending):
+            if index not in assembled:
+                await dispatch(index)
+
+        content = "".join(content_parts) or None
+        tool_calls = [assembled[index] for index in sorted(assembled)] or None
+        self._record_stream_completion(
+            (content or "")
+            + "".join(call.function.arguments for call in tool_calls or [])
+        )
+        if not content and not tool_calls:
+            raise ValueError("Empty response from streaming LLM")
+
+        return ChatCompletionMessage(
+            role="assistant", content=content, tool_calls=tool_calls
+        )
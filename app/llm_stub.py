@@ -0,0 +1,380 @@
+"""Local OpenAI-compatible chat completions server for offline load testing.
+
+Point an LLM config at it to run main.py, run_flow.py or app.py without a
+provider:
+
+    python -m app.llm_stub --port 8001 --ttft 0.4 --tps 60 --error-rate 0.02
+
+    [llm]
+    base_url = "http://localhost:8001/v1"
+    api_key = "stub"
+
+Responses come from an optional JSON script (``--script``), checked in order:
+
+    {
+      "latency": {"ttft": 0.5, "tokens_per_second": 40, "error_rate": 0.01},
+      "rules": [
+        {"match": "weather", "tool_calls": [
+          {"name": "google_search", "arguments": {"query": "weather"}}]},
+        {"match": "hello", "content": "Hi there!"},
+        {"match": "flaky", "status": 503}
+      ],
+      "transcript": [
+        {"content": "Let me look that up.", "tool_calls": [...]},
+        {"content": "Done."}
+      ]
+    }
+
+A rule's ``match`` is a regex searched in the latest user or tool message.
+Without a matching rule, transcript entries are replayed by turn (the number
+of assistant messages already in the conversation). Without either, the stub
+answers in plain text and calls ``terminate`` once ``max_turns`` is reached.
+Tool calls forced with ``tool_choice="required"`` get arguments built from the
+tool's JSON schema.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+
+from app.token_counter import REPLY_OVERHEAD, count_message_tokens, count_text_tokens
+
+
+_TOKEN_CHUNK_PATTERN = re.compile(r"\s*\S+|\s+")
+
+
+class StubLatency(BaseModel):
+    """Latency and failure profile of the stand-in server"""
+
+    ttft: float = Field(0.3, ge=0, description="Median seconds to the first token")
+    ttft_sigma: float = Field(
+        0.5, ge=0, description="Log-normal spread of time to first token (0 = fixed)"
+    )
+    tokens_per_second: float = Field(
+        50.0, ge=0, description="Generation speed after TTFT (0 = no pacing)"
+    )
+    error_rate: float = Field(
+        0.0, ge=0, le=1, description="Share of requests failing with 5xx"
+    )
+    error_status: int = Field(503, description="Status code of injected errors")
+    rate_limit_rate: float = Field(
+        0.0, ge=0, le=1, description="Share of requests answered 429"
+    )
+    retry_after: float = Field(
+        1.0, ge=0, description="Retry-After sent with 429 responses"
+    )
+
+    @property
+    def token_delay(self) -> float:
+        """Seconds between generated tokens"""
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return 1.0 / self.tokens_per_second
+
+    def sample_ttft(self) -> float:
+        if self.ttft <= 0:
+            return 0.0
+        if self.ttft_sigma <= 0:
+            return self.ttft
+        return random.lognormvariate(0, self.ttft_sigma) * self.ttft
+
+
+class StubRule(BaseModel):
+    """A scripted response returned when `match` is found in the latest input"""
+
+    match: str = ".*"
+    content: Optional[str] = None
+    tool_calls: List[Dict[str, Any]] = Field(default_factory=list)
+    status: Optional[int] = Field(None, description="Fail with this HTTP status")
+
+
+class StubScript(BaseModel):
+    latency: StubLatency = Field(default_factory=StubLatency)
+    rules: List[StubRule] = Field(default_factory=list)
+    transcript: List[Dict[str, Any]] = Field(default_factory=list)
+    max_turns: int = Field(
+        3, description="Assistant turns before the default reply calls terminate"
+    )
+
+    @classmethod
+    def load(cls, path: Optional[str]) -> "StubScript":
+        if not path:
+            return cls()
+        return cls.model_validate_json(Path(path).read_text(encoding="utf-8"))
+
+
+def _latest_input(messages: List[dict]) -> str:
+    for message in reversed(messages):
+        if message.get("role") in ("user", "tool") and message.get("content"):
+            content = message["content"]
+            return content if isinstance(content, str) else json.dumps(content)
+    return ""
+
+
+def _example_value(schema: Dict[str, Any]) -> Any:
+    """Build a placeholder value that satisfies a (simple) JSON schema"""
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type", "string")
+    if isinstance(kind, list):
+        kind = kind[0]
+    if kind == "object":
+        return {
+            name: _example_value(prop)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [_example_value(schema.get("items", {})) for _ in range(2)]
+    if kind in ("integer", "number"):
+        return 0
+    if kind == "boolean":
+        return False
+    return "stub"
+
+
+class StubResponder:
+    """Chooses the assistant message for a request according to a script"""
+
+    def __init__(self, script: StubScript):
+        self.script = script
+        self.rules = [(re.compile(rule.match), rule) for rule in script.rules]
+
+    def respond(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Return {"content", "tool_calls"} or {"status"} for a request"""
+        messages = request.get("messages", [])
+        tools = request.get("tools") or []
+        tool_choice = request.get("tool_choice", "auto")
+        turn = sum(1 for m in messages if m.get("role") == "assistant")
+
+        latest = _latest_input(messages)
+        for pattern, rule in self.rules:
+            if pattern.search(latest):
+                if rule.status:
+                    return {"status": rule.status}
+                return {"content": rule.content, "tool_calls": rule.tool_calls}
+
+        if self.script.transcript:
+            entry = self.script.transcript[turn % len(self.script.transcript)]
+            return {
+                "content": entry.get("content"),
+                "tool_calls": entry.get("tool_calls", []),
+            }
+
+        names = [tool["function"]["name"] for tool in tools]
+        if (
+            tool_choice != "none"
+            and "terminate" in names
+            and turn >= self.script.max_turns
+        ):
+            return {
+                "content": None,
+                "tool_calls": [
+                    {"name": "terminate", "arguments": {"status": "success"}}
+                ],
+            }
+        if tool_choice == "required" and tools:
+            function = tools[0]["function"]
+            arguments = _example_value(function.get("parameters", {"type": "object"}))
+            return {
+                "content": None,
+                "tool_calls": [{"name": function["name"], "arguments": arguments}],
+            }
+        return {
+            "content": f"Stub response {turn + 1} to: {latest[:80]}",
+            "tool_calls": [],
+        }
+
+
+def _tool_call_payload(index: int, call: Dict[str, Any]) -> Dict[str, Any]:
+    arguments = call.get("arguments", {})
+    if not isinstance(arguments, str):
+        arguments = json.dumps(arguments)
+    return {
+        "index": index,
+        "id": call.get("id") or f"call_{uuid.uuid4().hex[:24]}",
+        "type": "function",
+        "function": {"name": call["name"], "arguments": arguments},
+    }
+
+
+def _error_response(status: int, retry_after: Optional[float] = None) -> JSONResponse:
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else None
+    return JSONResponse(
+        status_code=status,
+        headers=headers,
+        content={
+            "error": {
+                "message": f"Injected stub error ({status})",
+                "type": "rate_limit_error" if status == 429 else "server_error",
+                "code": None,
+            }
+        },
+    )
+
+
+def create_app(script: StubScript) -> FastAPI:
+    app = FastAPI(title="OpenManus LLM stub")
+    responder = StubResponder(script)
+    latency = script.latency
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model"}]}
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        roll = random.random()
+        if roll < latency.rate_limit_rate:
+            return _error_response(429, latency.retry_after)
+        if roll < latency.rate_limit_rate + latency.error_rate:
+            await asyncio.sleep(latency.sample_ttft())
+            return _error_response(latency.error_status)
+
+        reply = responder.respond(body)
+        if reply.get("status"):
+            return _error_response(reply["status"])
+
+        content = reply["content"]
+        tool_calls = [
+            _tool_call_payload(i, call) for i, call in enumerate(reply["tool_calls"])
+        ]
+        prompt_tokens = (
+            sum(count_message_tokens(m) for m in body.get("messages", []))
+            + REPLY_OVERHEAD
+        )
+        completion_tokens = count_text_tokens(content) + sum(
+            count_text_tokens(c["function"]["arguments"]) for c in tool_calls
+        )
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "stub")
+        finish_reason = "tool_calls" if tool_calls else "stop"
+
+        if body.get("stream"):
+            chunks = _stream_chunks(
+                latency, content, tool_calls, completion_id, model, finish_reason
+            )
+            return StreamingResponse(chunks, media_type="text/event-stream")
+
+        await asyncio.sleep(
+            latency.sample_ttft() + completion_tokens * latency.token_delay
+        )
+        message: Dict[str, Any] = {"role": "assistant", "content": content}
+        if tool_calls:
+            message["tool_calls"] = [
+                {k: v for k, v in call.items() if k != "index"} for call in tool_calls
+            ]
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {"index": 0, "message": message, "finish_reason": finish_reason}
+            ],
+            "usage": usage,
+        }
+
+    return app
+
+
+async def _stream_chunks(
+    latency: StubLatency,
+    content: Optional[str],
+    tool_calls: List[Dict[str, Any]],
+    completion_id: str,
+    model: str,
+    finish_reason: str,
+) -> AsyncIterator[str]:
+    """Yield SSE chunks: one word (or argument fragment) per generated token"""
+    created = int(time.time())
+    token_delay = latency.token_delay
+
+    def chunk(delta: Dict[str, Any], finish: Optional[str] = None) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    await asyncio.sleep(latency.sample_ttft())
+    yield chunk({"role": "assistant", "content": ""})
+
+    for piece in _TOKEN_CHUNK_PATTERN.findall(content or ""):
+        await asyncio.sleep(token_delay)
+        yield chunk({"content": piece})
+
+    for call in tool_calls:
+        header = {**call, "function": {**call["function"], "arguments": ""}}
+        yield chunk({"tool_calls": [header]})
+        arguments = call["function"]["arguments"]
+        for start in range(0, len(arguments), 8):
+            await asyncio.sleep(token_delay)
+            fragment = {"arguments": arguments[start : start + 8]}
+            yield chunk(
+                {"tool_calls": [{"index": call["index"], "function": fragment}]}
+            )
+
+    yield chunk({}, finish_reason)
+    yield "data: [DONE]\n\n"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--script", help="JSON file with rules and/or a transcript")
+    parser.add_argument("--ttft", type=float, help="Median seconds to first token")
+    parser.add_argument("--ttft-sigma", type=float, help="Log-normal TTFT spread")
+    parser.add_argument("--tps", type=float, help="Tokens per second")
+    parser.add_argument("--error-rate", type=float, help="Share of 5xx responses")
+    parser.add_argument("--rate-limit-rate", type=float, help="Share of 429 responses")
+    parser.add_argument("--seed", type=int, help="Random seed for repeatable runs")
+    args = parser.parse_args()
+
+    script = StubScript.load(args.script)
+    overrides = {
+        "ttft": args.ttft,
+        "ttft_sigma": args.ttft_sigma,
+        "tokens_per_second": args.tps,
+        "error_rate": args.error_rate,
+        "rate_limit_rate": args.rate_limit_rate,
+    }
+    try:
+        script.latency = StubLatency.model_validate(
+            {
+                **script.latency.model_dump(),
+                **{k: v for k, v in overrides.items() if v is not None},
+            }
+        )
+    except ValidationError as e:
+        parser.error(str(e))
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    import uvicorn
+
+    uvicorn.run(create_app(script), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
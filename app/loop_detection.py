@@ -0,0 +1,154 @@
+"""Incremental detection of agents stuck repeating themselves.
+
+Messages are indexed once, as they arrive, into a sliding window of recent
+activity with three kinds of fingerprints:
+
+- exact: a hash of the assistant's whitespace-normalized content
+- near-duplicate: a 64-bit SimHash of the content, compared by Hamming
+  distance against the fingerprints in the window
+- tool call: a hash of (tool name, canonical arguments); results are left
+  out, since output that embeds timestamps, ids or progress differs on every
+  run of a call that is still going nowhere
+
+Exact and tool-call repeats flag a step on their own. Near-duplicate content
+only does when the same step also repeats an earlier tool call: an agent
+making progress often narrates similar steps in similar words.
+
+The window bounds the work per new message, so a check costs the same on the
+fifth step as on the five-hundredth, whatever the length of the history.
+"""
+
+import hashlib
+import json
+import re
+from collections import Counter, deque
+from typing import Deque, List, Optional, Tuple
+
+from app.schema import Message
+
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Content shorter than this many words is only compared exactly
+MIN_SIMHASH_WORDS = 10
+
+
+def simhash(text: str) -> Optional[int]:
+    """64-bit SimHash over words and word pairs, or None for very short text"""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < MIN_SIMHASH_WORDS:
+        return None
+    features = Counter(words)
+    features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    # A bit is set when features hashing to 1 there outweigh those hashing to 0
+    set_weight = [0] * 64
+    for feature, weight in features.items():
+        digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        for bit, digit in enumerate(f"{int.from_bytes(digest):064b}"):
+            if digit == "1":
+                set_weight[bit] += weight
+    half = sum(features.values()) / 2
+    return sum(1 << (63 - bit) for bit in range(64) if set_weight[bit] > half)
+
+
+class LoopDetector:
+    """Sliding-window repeat counters over an agent's messages.
+
+    Args:
+        threshold: Earlier occurrences in the window that make a message a
+            repeat (the agent's `duplicate_threshold`)
+        window: Number of recent fingerprints kept
+        max_distance: SimHash bits (of 64) two contents may differ in and
+            still count as near-duplicates; small edits to one text stay
+            within a few bits, while distinct steps of one task can fall
+            under 12
+    """
+
+    def __init__(self, threshold: int = 2, window: int = 30, max_distance: int = 3):
+        self.threshold = threshold
+        self.window = window
+        self.max_distance = max_distance
+        self.reset()
+
+    def reset(self) -> None:
+        self._last: Optional[Message] = None
+        # ("exact", hash), ("call", hash) or ("simhash", fingerprint), oldest first
+        self._entries: Deque[Tuple[str, int]] = deque()
+        self._counts: Counter = Counter()
+
+    def observe(self, messages: List[Message]) -> bool:
+        """Index messages added since the last call.
+
+        Returns whether any of them repeats earlier activity at least
+        `threshold` times, counting near-duplicate content only alongside a
+        repeated tool call.
+        """
+        new = self._new_messages(messages)
+        if new is None:
+            # Our last message was evicted or compacted away; start over
+            self.reset()
+            new = messages
+        if new:
+            self._last = new[-1]
+
+        stuck = near_duplicate = repeated_call = False
+        for message in new:
+            if message.role != "assistant":
+                continue
+            if message.content and message.content.strip():
+                repeats, near_repeats = self._add_content(message.content)
+                stuck |= repeats >= self.threshold
+                near_duplicate |= near_repeats >= self.threshold
+            for call in message.tool_calls or []:
+                function = call.function
+                repeats = self._add_tool_call(function.name, function.arguments)
+                stuck |= repeats >= self.threshold
+                repeated_call |= repeats > 0
+        return stuck or (near_duplicate and repeated_call)
+
+    def _new_messages(self, messages: List[Message]) -> Optional[List[Message]]:
+        """Messages after the last one seen, found by scanning back from the end"""
+        if self._last is None:
+            return messages
+        for i in range(len(messages) - 1, -1, -1):
+            if messages[i] is self._last:
+                return messages[i + 1 :]
+        return None
+
+    def _add_content(self, content: str) -> Tuple[int, int]:
+        """Index content; return its exact and near-duplicate repeat counts"""
+        key = ("exact", hash(" ".join(content.split())))
+        repeats = self._counts[key]
+        self._push(key)
+
+        near_repeats = 0
+        fingerprint = simhash(content)
+        if fingerprint is not None:
+            near_repeats = sum(
+                1
+                for kind, other in self._entries
+                if kind == "simhash"
+                and (other ^ fingerprint).bit_count() <= self.max_distance
+            )
+            self._push(("simhash", fingerprint))
+        return repeats, near_repeats
+
+    def _add_tool_call(self, name: str, arguments: str) -> int:
+        """Index a tool call; return its repeat count"""
+        try:
+            arguments = json.dumps(json.loads(arguments or "{}"), sort_keys=True)
+        except json.JSONDecodeError:
+            pass
+        key = ("call", hash((name, arguments)))
+        repeats = self._counts[key]
+        self._push(key)
+        return repeats
+
+    def _push(self, entry: Tuple[str, int]) -> None:
+        self._counts[entry] += 1
+        self._entries.append(entry)
+        if len(self._entries) > self.window:
+            expired = self._entries.popleft()
+            self._counts[expired] -= 1
+            if not self._counts[expired]:
+                del self._counts[expired]
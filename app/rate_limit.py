@@ -0,0 +1,143 @@
+"""Process-wide request and token rate limiting for LLM configs."""
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class Priority(IntEnum):
+    """Rate-limiter lanes; lower values are served first"""
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+_request_priority: ContextVar[Priority] = ContextVar(
+    "request_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def request_priority(priority: Priority) -> Iterator[None]:
+    """Run LLM calls made inside the block in the given rate-limiter lane"""
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _request_priority.get()
+
+
+class TokenBucket:
+    """Bucket holding up to `per_minute` units, refilled continuously"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(
+            self.capacity, self.level + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def clamp(self, amount: float) -> float:
+        """Limit a request to the bucket size so oversized requests can still run"""
+        return min(amount, self.capacity)
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if available now)"""
+        deficit = self.clamp(amount) - self.level
+        return max(0.0, deficit / self.rate)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter with priority lanes.
+
+    Waiters are served strictly by (priority, arrival order): a waiting
+    interactive request is never overtaken by a background one, and within a
+    lane requests are first come, first served.
+    """
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.requests or self.tokens)
+
+    async def acquire(self, tokens: int = 0, priority: Optional[Priority] = None):
+        """Wait until one request of roughly `tokens` tokens may be sent"""
+        if not self.enabled:
+            return
+        priority = current_priority() if priority is None else priority
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: self._dispatch() if f.cancelled() else None)
+        heapq.heappush(self._waiters, (priority, next(self._sequence), tokens, future))
+        self._dispatch()
+        await future
+
+    def record_usage(self, tokens: int) -> None:
+        """Charge tokens that were only known after the response arrived"""
+        if self.tokens and tokens > 0:
+            self.tokens.refill(time.monotonic())
+            self.tokens.level -= tokens
+
+    def _dispatch(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+        now = time.monotonic()
+        for bucket in (self.requests, self.tokens):
+            if bucket:
+                bucket.refill(now)
+
+        while self._waiters:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            wait = max(
+                self.requests.wait_time(1) if self.requests else 0.0,
+                self.tokens.wait_time(tokens) if self.tokens else 0.0,
+            )
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(
+                    wait, self._dispatch
+                )
+                return
+
+            heapq.heappop(self._waiters)
+            if self.requests:
+                self.requests.level -= 1
+            if self.tokens:
+                self.tokens.level -= self.tokens.clamp(tokens)
+            future.set_result(None)
+
+
+_limiters: Dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(
+    config_name: str, rpm: Optional[int] = None, tpm: Optional[int] = None
+) -> RateLimiter:
+    """Return the limiter shared by every caller of an LLM config"""
+    if config_name not in _limiters:
+        _limiters[config_name] = RateLimiter(rpm=rpm, tpm=tpm)
+    return _limiters[config_name]
@@ -0,0 +1,133 @@
+"""Error-classified retry policy for LLM calls with a process-wide retry budget."""
+
+import email.utils
+import threading
+import time
+from typing import Optional
+
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    InternalServerError,
+    RateLimitError,
+)
+from tenacity import RetryCallState, retry_base, wait_random_exponential
+from tenacity.wait import wait_base
+
+from app.logger import logger
+
+
+# Status codes worth retrying: timeout, conflict, rate limit and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+MAX_RETRY_AFTER = 120.0
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an error is transient, as opposed to a problem with the request.
+
+    Authentication and validation failures, context overflows and our own
+    ValueErrors fail the same way on every attempt, so they are not retried.
+    """
+    if isinstance(error, (APIConnectionError, RateLimitError, InternalServerError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Read the server's Retry-After hint from an API error, if present"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return parsed.timestamp() - time.time()
+
+
+class RetryBudget:
+    """Caps retries at a fraction of recent traffic, shared process-wide.
+
+    Every request deposits `ratio` retry credits and every retry spends one.
+    A small baseline of `min_per_minute` credits keeps low-traffic processes
+    able to retry at all. When providers fail broadly, this stops retries
+    from multiplying the load.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_minute: float = 10.0):
+        self.ratio = ratio
+        self.min_rate = min_per_minute / 60.0
+        self.capacity = max(min_per_minute, 1.0)
+        self.credits = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.credits = min(
+            self.capacity, self.credits + (now - self.updated_at) * self.min_rate
+        )
+        self.updated_at = now
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._refill()
+            self.credits = min(self.capacity, self.credits + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self.credits < 1:
+                return False
+            self.credits -= 1
+            return True
+
+
+retry_budget = RetryBudget()
+
+
+class retry_if_retryable(retry_base):
+    """Retry only transient errors, and only while the retry budget allows"""
+
+    def __call__(self, retry_state: RetryCallState) -> bool:
+        if not retry_state.outcome.failed:
+            return False
+        error = retry_state.outcome.exception()
+        if not is_retryable(error):
+            return False
+        if not retry_budget.try_spend():
+            logger.warning(f"Retry budget exhausted, not retrying: {error}")
+            return False
+        return True
+
+
+class wait_retry_after(wait_base):
+    """Honor the server's Retry-After hint, else back off exponentially"""
+
+    def __init__(self, fallback: wait_base = wait_random_exponential(min=1, max=60)):
+        self.fallback = fallback
+
+    def __call__(self, retry_state: RetryCallState) -> float:
+        if retry_state.outcome and retry_state.outcome.failed:
+            hint = retry_after_seconds(retry_state.outcome.exception())
+            if hint is not None and hint >= 0:
+                return min(hint, MAX_RETRY_AFTER)
+        return self.fallback(retry_state)
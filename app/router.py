@@ -0,0 +1,112 @@
+"""Per-call selection of an LLM config from the [routing] rules."""
+
+from enum import Enum
+from typing import List, Optional, Union
+
+from app.config import RoutingRule, RoutingSettings, config
+from app.llm import LLM
+from app.logger import logger
+from app.schema import Message
+from app.telemetry import telemetry
+
+
+# Calls recorded before a rule's latency budget is checked against telemetry
+LATENCY_MIN_SAMPLES = 5
+
+
+class CallKind(str, Enum):
+    """What an LLM call is for, as matched by routing rules"""
+
+    PLAN = "plan"
+    STEP = "step"
+    SUMMARY = "summary"
+
+
+class LLMRouter:
+    """Picks the LLM config for each call from declared rules.
+
+    Rules match on call kind, agent name, prompt size and a latency budget
+    (the target config's recent p95 latency). The first matching rule wins;
+    when none matches, the caller's own LLM is used.
+    """
+
+    def __init__(self, settings: RoutingSettings):
+        self.rules: List[RoutingRule] = []
+        for rule in settings.rules:
+            if rule.config not in config.llm:
+                logger.warning(
+                    f"Routing rule targets unknown LLM config '{rule.config}'; ignoring it"
+                )
+                continue
+            self.rules.append(rule)
+
+    def select(
+        self,
+        kind: CallKind,
+        default: LLM,
+        messages: Optional[List[Union[dict, Message]]] = None,
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        agent: Optional[str] = None,
+    ) -> LLM:
+        """Return the LLM that should serve a call of `kind`"""
+        if not self.rules:
+            return default
+
+        prompt_tokens: Optional[int] = None
+        for rule in self.rules:
+            if rule.kinds and kind.value not in rule.kinds:
+                continue
+            if rule.agents and agent not in rule.agents:
+                continue
+            if rule.min_prompt_tokens is not None or rule.max_prompt_tokens is not None:
+                if prompt_tokens is None:
+                    prompt_tokens = sum(
+                        LLM.count_tokens(m)
+                        for m in (system_msgs or []) + (messages or [])
+                    )
+                if (
+                    rule.min_prompt_tokens is not None
+                    and prompt_tokens < rule.min_prompt_tokens
+                ):
+                    continue
+                if (
+                    rule.max_prompt_tokens is not None
+                    and prompt_tokens > rule.max_prompt_tokens
+                ):
+                    continue
+            if rule.max_latency is not None and not self._within_budget(rule):
+                continue
+
+            if rule.config == default.config_name:
+                return default
+            logger.debug(f"Routing {kind.value} call to LLM config '{rule.config}'")
+            return LLM(rule.config)
+        return default
+
+    @staticmethod
+    def _within_budget(rule: RoutingRule) -> bool:
+        p95 = telemetry.latency_percentile(
+            0.95, min_samples=LATENCY_MIN_SAMPLES, config_name=rule.config
+        )
+        return p95 is None or p95 <= rule.max_latency
+
+
+_router: Optional[LLMRouter] = None
+
+
+def get_router() -> LLMRouter:
+    global _router
+    if _router is None:
+        _router = LLMRouter(config.routing)
+    return _router
+
+
+def route_llm(
+    kind: CallKind,
+    default: LLM,
+    messages: Optional[List[Union[dict, Message]]] = None,
+    system_msgs: Optional[List[Union[dict, Message]]] = None,
+    agent: Optional[str] = None,
+) -> LLM:
+    """Select the LLM for a call using the process-wide router"""
+    return get_router().select(kind, default, messages, system_msgs, agent)
@@ -1,7 +1,10 @@
+from collections import deque
 from enum import Enum
-from typing import Any, List, Literal, Optional, Union
+from typing import Any, Deque, List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
+
+from app.token_counter import count_message_tokens
 
 
 class AgentState(str, Enum):
@@ -35,6 +38,23 @@ class Message(BaseModel):
     name: Optional[str] = Field(default=None)
     tool_call_id: Optional[str] = Field(default=None)
 
+    # Serialized wire form and token estimate, rebuilt lazily after any field changes
+    _wire_cache: Optional[dict] = PrivateAttr(default=None)
+    _token_count: Optional[int] = PrivateAttr(default=None)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in self.model_fields:
+            self.__pydantic_private__.update(_wire_cache=None, _token_count=None)
+
+    @property
+    def token_count(self) -> int:
+        """Estimated tokens for this message, cached until a field changes"""
+        private = self.__pydantic_private__
+        if private["_token_count"] is None:
+            private["_token_count"] = count_message_tokens(self.to_dict())
+        return private["_token_count"]
+
     def __add__(self, other) -> List["Message"]:
         """支持 Message + list 或 Message + Message 的操作"""
         if isinstance(other, list):
@@ -56,7 +76,20 @@ class Message(BaseModel):
             )
 
     def to_dict(self) -> dict:
-        """Convert message to dictionary format"""
+        """Convert message to dictionary format.
+
+        The result is cached and shared between calls, so callers must not
+        mutate it. Reassigning any field invalidates the cache; in-place edits
+        of nested `tool_calls` do not.
+        """
+        # Read the private slot directly; pydantic's __getattr__ fallback for
+        # private attributes costs more than rebuilding a small dict
+        private = self.__pydantic_private__
+        if private["_wire_cache"] is None:
+            private["_wire_cache"] = self._build_dict()
+        return private["_wire_cache"]
+
+    def _build_dict(self) -> dict:
         message = {"role": self.role}
         if self.content is not None:
             message["content"] = self.content
@@ -107,25 +140,104 @@ class Message(BaseModel):
         )
 
 
+class _UnitIndex:
+    """Sizes of the conversational units covering a message list.
+
+    A unit is a message plus any tool results that follow it. Units are kept
+    oldest first as [message count, tokens] so eviction and token totals never
+    rescan the list.
+    """
+
+    __slots__ = ("messages", "units", "tracked", "tokens")
+
+    def __init__(self):
+        self.messages: Optional[List[Message]] = None
+        self.units: Deque[List[int]] = deque()
+        self.tracked = 0
+        self.tokens = 0
+
+    def sync(self, messages: List[Message]) -> None:
+        """Index messages appended since the last call; rebuild after rewrites"""
+        if messages is not self.messages or len(messages) < self.tracked:
+            self.messages = messages
+            self.units.clear()
+            self.tracked = self.tokens = 0
+        units = self.units
+        for i in range(self.tracked, len(messages)):
+            message = messages[i]
+            tokens = message.token_count
+            if message.role == "tool" and units:
+                units[-1][0] += 1
+                units[-1][1] += tokens
+            else:
+                units.append([1, tokens])
+            self.tokens += tokens
+        self.tracked = len(messages)
+
+    def evict(self, limit: int) -> None:
+        """Drop the oldest whole units until at most `limit` messages remain.
+
+        The newest unit is always kept, even if it alone exceeds the limit.
+        """
+        excess = self.tracked - limit
+        if excess <= 0:
+            return
+        dropped = 0
+        while dropped < excess and len(self.units) > 1:
+            count, tokens = self.units.popleft()
+            dropped += count
+            self.tokens -= tokens
+        del self.messages[:dropped]
+        self.tracked -= dropped
+
+
 class Memory(BaseModel):
+    """Conversation history, evicted oldest-first in whole conversational units.
+
+    Eviction never separates an assistant message from the tool results
+    answering its tool calls. `messages` stays a plain list: appending to it
+    directly is picked up incrementally; other rewrites must go through
+    assignment, `clear` or `replace`, which rebuild the unit index.
+    """
+
     messages: List[Message] = Field(default_factory=list)
     max_messages: int = Field(default=100)
 
+    _units: _UnitIndex = PrivateAttr(default_factory=_UnitIndex)
+
     def add_message(self, message: Message) -> None:
         """Add a message to memory"""
         self.messages.append(message)
-        # Optional: Implement message limit
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages :]
+        self._evict()
 
     def add_messages(self, messages: List[Message]) -> None:
         """Add multiple messages to memory"""
         self.messages.extend(messages)
+        self._evict()
+
+    def replace(self, start: int, end: int, messages: List[Message]) -> None:
+        """Replace messages[start:end], e.g. with a summary of them"""
+        self.messages[start:end] = messages
+        self.__pydantic_private__["_units"].messages = None
 
     def clear(self) -> None:
         """Clear all messages"""
         self.messages.clear()
 
+    @property
+    def token_count(self) -> int:
+        """Estimated tokens across all messages in memory"""
+        units = self.__pydantic_private__["_units"]
+        units.sync(self.messages)
+        return units.tokens
+
+    def _evict(self) -> None:
+        # Read the private slot directly; pydantic's __getattr__ fallback for
+        # private attributes dominates the cost of an append otherwise
+        units = self.__pydantic_private__["_units"]
+        units.sync(self.messages)
+        units.evict(self.max_messages)
+
     def get_recent_messages(self, n: int) -> List[Message]:
         """Get n most recent messages"""
         return self.messages[-n:]
@@ -0,0 +1,65 @@
+"""Single-flight coalescing of identical concurrent async calls."""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run at most one upstream call per key; concurrent callers share its result.
+
+    The upstream call runs in its own task, so cancelling any single caller
+    (including the one that started it) only stops that caller from waiting.
+    The upstream call is cancelled once no caller is waiting for it any more.
+    Failures propagate to every waiting caller, and the key is released as soon
+    as the call finishes, so a later call always starts a fresh request.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight,
+        }
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._release(key, flight))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _release(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Retrieve the outcome so an unobserved failure is not logged as lost
+        if not flight.task.cancelled():
+            flight.task.exception()
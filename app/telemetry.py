@@ -0,0 +1,183 @@
+"""Per-call LLM usage and latency telemetry with an in-process aggregator."""
+
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+
+_call_context: ContextVar[Dict[str, Any]] = ContextVar("llm_call_context", default={})
+
+
+@contextmanager
+def telemetry_context(**fields: Any) -> Iterator[None]:
+    """Attach fields such as agent, step, task_id or purpose to LLM calls made in the block"""
+    token = _call_context.set({**_call_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _call_context.reset(token)
+
+
+def current_context() -> Dict[str, Any]:
+    return _call_context.get()
+
+
+class LLMCallRecord(BaseModel):
+    """One logical LLM call, including all of its retries"""
+
+    method: str = Field(..., description="ask or ask_tool")
+    model: str
+    config_name: str
+    endpoint: Optional[str] = None
+    stream: bool = False
+    success: bool = True
+    error: Optional[str] = None
+    cache_hit: bool = False
+
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    usage_estimated: bool = Field(
+        False, description="True when token counts are local estimates"
+    )
+    cost: Optional[float] = Field(
+        None, description="Estimated cost; None when the config sets no token prices"
+    )
+
+    started_at: float = Field(default_factory=time.time)
+    ttft: Optional[float] = Field(
+        None,
+        description="Seconds from sending the winning request to its first streamed chunk",
+    )
+    attempt_latency: Optional[float] = Field(
+        None,
+        description="Seconds from sending the winning request to its full response",
+    )
+    latency: float = Field(
+        0.0, description="End-to-end seconds, including queueing, failover and retries"
+    )
+    attempts: int = Field(0, description="Upstream requests sent, including retries")
+    hedged: bool = Field(False, description="A duplicate hedge request was sent")
+
+    agent: Optional[str] = None
+    step: Optional[int] = None
+    task_id: Optional[str] = None
+    purpose: Optional[str] = Field(
+        None, description="Why the call was made, e.g. compaction; None for agent steps"
+    )
+
+    @property
+    def retries(self) -> int:
+        return max(0, self.attempts - 1 - int(self.hedged))
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+# Receives every call record completed in the current context, e.g. run budgets
+UsageMeter = Callable[[LLMCallRecord], None]
+
+_usage_meters: ContextVar[Tuple[UsageMeter, ...]] = ContextVar(
+    "llm_usage_meters", default=()
+)
+
+
+@contextmanager
+def usage_meter(meter: UsageMeter) -> Iterator[None]:
+    """Pass the record of every LLM call completed in the block to `meter`.
+
+    Tasks created in the block, such as background compaction, inherit it.
+    """
+    token = _usage_meters.set(_usage_meters.get() + (meter,))
+    try:
+        yield
+    finally:
+        _usage_meters.reset(token)
+
+
+def report_usage(record: LLMCallRecord) -> None:
+    for meter in _usage_meters.get():
+        meter(record)
+
+
+class TelemetryAggregator:
+    """Keeps the most recent call records and answers summary queries"""
+
+    def __init__(self, max_records: int = 10000):
+        self._records: Deque[LLMCallRecord] = deque(maxlen=max_records)
+
+    def record(self, record: LLMCallRecord) -> None:
+        self._records.append(record)
+
+    def clear(self) -> None:
+        self._records.clear()
+
+    def records(self, **filters: Any) -> List[LLMCallRecord]:
+        """Return records whose fields equal every given filter value"""
+        return [
+            r
+            for r in self._records
+            if all(getattr(r, key) == value for key, value in filters.items())
+        ]
+
+    def latency_percentile(
+        self, q: float, field: str = "latency", min_samples: int = 1, **filters: Any
+    ) -> Optional[float]:
+        """Nearest-rank percentile (q in [0, 1]) of a timing field over successful calls.
+
+        Returns None when fewer than `min_samples` calls match.
+        """
+        values = sorted(
+            getattr(r, field)
+            for r in self.records(success=True, **filters)
+            if getattr(r, field) is not None and not r.cache_hit
+        )
+        if not values or len(values) < min_samples:
+            return None
+        index = min(len(values) - 1, max(0, round(q * len(values)) - 1))
+        return values[index]
+
+    def tokens_by(self, key: str, **filters: Any) -> Dict[Any, Dict[str, int]]:
+        """Sum prompt, completion and cached tokens grouped by a record field"""
+        totals: Dict[Any, Dict[str, int]] = defaultdict(
+            lambda: {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+        )
+        for r in self.records(**filters):
+            bucket = totals[getattr(r, key)]
+            bucket["prompt_tokens"] += r.prompt_tokens
+            bucket["completion_tokens"] += r.completion_tokens
+            bucket["cached_tokens"] += r.cached_tokens
+        return dict(totals)
+
+    def tokens_by_task(self) -> Dict[Optional[str], Dict[str, int]]:
+        return self.tokens_by("task_id")
+
+    def tokens_by_purpose(self, **filters: Any) -> Dict[Optional[str], Dict[str, int]]:
+        return self.tokens_by("purpose", **filters)
+
+    def summary(self, **filters: Any) -> Dict[str, Any]:
+        """Counts, latency percentiles and token totals for matching calls"""
+        records = self.records(**filters)
+        return {
+            "calls": len(records),
+            "errors": sum(1 for r in records if not r.success),
+            "cache_hits": sum(1 for r in records if r.cache_hit),
+            "retries": sum(r.retries for r in records),
+            "hedged": sum(1 for r in records if r.hedged),
+            "latency_p50": self.latency_percentile(0.5, **filters),
+            "latency_p95": self.latency_percentile(0.95, **filters),
+            "ttft_p50": self.latency_percentile(0.5, field="ttft", **filters),
+            "prompt_tokens": sum(r.prompt_tokens for r in records),
+            "completion_tokens": sum(r.completion_tokens for r in records),
+            "cached_tokens": sum(r.cached_tokens for r in records),
+            "cost": sum(r.cost or 0.0 for r in records),
+            "tokens_by_purpose": self.tokens_by_purpose(**filters),
+        }
+
+
+telemetry = TelemetryAggregator()
@@ -0,0 +1,71 @@
+"""Offline token estimation for chat messages.
+
+Counts are produced by a regex pre-tokenizer that mirrors how BPE tokenizers
+split text (words and case-change segments, digit groups, CJK characters,
+punctuation, indentation). It needs no vocabulary download, but it is an
+estimate rather than a bound: text far from the tokenizer's training data
+(random identifiers, encoded blobs, rare scripts) can need more tokens than
+counted. Callers that must not exceed a limit keep a margin, as
+`LLM.fit_to_context` does with `context_margin`.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+
+# Fixed per-message overhead for role and separator tokens
+MESSAGE_OVERHEAD = 4
+# Tokens primed for the assistant reply
+REPLY_OVERHEAD = 3
+
+_TOKEN_PATTERN = re.compile(
+    r"[A-Z]?[a-z]+"
+    r"|[A-Z]+(?![a-z])"
+    r"|\d{1,3}"
+    r"|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]"
+    r"|\n+"
+    r"|[ \t]{2,}"
+    r"|[^\sA-Za-z\d]",
+)
+_WORD_CHARS_PER_TOKEN = 5
+
+
+def count_text_tokens(text: Optional[str]) -> int:
+    """Estimate the number of tokens in a piece of text"""
+    if not text:
+        return 0
+    tokens = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        piece = match.group()
+        if piece[0].isascii() and piece[0].isalpha():
+            tokens += -(-len(piece) // _WORD_CHARS_PER_TOKEN)
+        else:
+            tokens += 1
+    return tokens
+
+
+def count_message_tokens(message: Dict[str, Any]) -> int:
+    """Estimate the tokens used by one message in OpenAI wire format"""
+    tokens = MESSAGE_OVERHEAD
+    content = message.get("content")
+    if isinstance(content, str):
+        tokens += count_text_tokens(content)
+    elif content:
+        tokens += count_text_tokens(json.dumps(content, ensure_ascii=False))
+    for tool_call in message.get("tool_calls") or []:
+        function = tool_call.get("function", {})
+        tokens += MESSAGE_OVERHEAD
+        tokens += count_text_tokens(function.get("name"))
+        tokens += count_text_tokens(function.get("arguments"))
+    tokens += count_text_tokens(message.get("name"))
+    if message.get("tool_call_id"):
+        tokens += MESSAGE_OVERHEAD
+    return tokens
+
+
+def count_tools_tokens(tools: Optional[List[dict]]) -> int:
+    """Estimate the tokens used by tool definitions sent with a request"""
+    if not tools:
+        return 0
+    return count_text_tokens(json.dumps(tools, ensure_ascii=False))
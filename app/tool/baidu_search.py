@@ -27,6 +27,8 @@ The tool returns a list of URLs that match the search query.
         "required": ["query"],
     }
 
+    read_only: bool = True
+
     async def execute(self, query: str, num_results: int = 10) -> List[str]:
         """
         Execute a Baidu search and return a list of URLs.
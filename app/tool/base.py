@@ -9,6 +9,12 @@ class BaseTool(ABC, BaseModel):
     description: str
     parameters: Optional[dict] = None
 
+    # Concurrency traits, used when an agent runs several tool calls at once.
+    # Read-only calls may overlap each other; all other calls run alone, in
+    # order. Calls naming the same resource never overlap.
+    read_only: bool = False
+    resource: Optional[str] = None
+
     class Config:
         arbitrary_types_allowed = True
 
@@ -16,10 +22,33 @@ class BaseTool(ABC, BaseModel):
         """Execute the tool with given parameters."""
         return await self.execute(**kwargs)
 
+    def can_run_concurrently(self, **kwargs) -> bool:
+        """Whether a call with these arguments may overlap other read-only calls"""
+        return self.read_only
+
     @abstractmethod
     async def execute(self, **kwargs) -> Any:
         """Execute the tool with given parameters."""
 
+    # Lifecycle hooks, used when agents and their tools are pooled and reused
+
+    async def warm_up(self) -> None:
+        """Start long-lived resources (processes, browsers) before the first call."""
+
+    async def reset(self) -> None:
+        """Clear per-task state so the tool can serve a new task.
+
+        Warm resources may be kept as long as nothing from the previous task
+        leaks through them.
+        """
+
+    async def health_check(self) -> bool:
+        """Whether the tool can serve another task."""
+        return True
+
+    async def cleanup(self) -> None:
+        """Release long-lived resources."""
+
     def to_param(self) -> Dict:
         """Convert tool to function call format."""
         return {
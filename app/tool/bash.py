@@ -96,6 +96,11 @@ class _BashSession:
             raise ToolError(
                 f"timed out: bash has not returned in {self._timeout} seconds and must be restarted",
             ) from None
+        except asyncio.CancelledError:
+            # The command's output is still pending and would be read as the
+            # next command's, so the shell must be restarted
+            self._timed_out = True
+            raise
 
         if output.endswith("\n"):
             output = output[:-1]
@@ -151,6 +156,27 @@ class Bash(BaseTool):
 
         raise ToolError("no command provided.")
 
+    async def warm_up(self) -> None:
+        if self._session is None:
+            self._session = _BashSession()
+            await self._session.start()
+
+    async def reset(self) -> None:
+        # A new shell drops the previous task's working directory and variables
+        await self.cleanup()
+        await self.warm_up()
+
+    async def health_check(self) -> bool:
+        session = self._session
+        if session is None:
+            return True
+        return session._process.returncode is None and not session._timed_out
+
+    async def cleanup(self) -> None:
+        if self._session is not None:
+            self._session.stop()
+            self._session = None
+
 
 if __name__ == "__main__":
     bash = Bash()
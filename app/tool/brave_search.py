@@ -32,6 +32,8 @@ The tool returns a list of URLs matching the search query."""
         self.api_key = kwargs.get("api_key", None)
         self.brave = Brave(api_key=self.api_key)
 
+    read_only: bool = True
+
     async def execute(self, query: str, num_results: int = 10) -> List[str]:
         """
         Execute Brave search and return a list of URLs
@@ -89,6 +89,7 @@ class BrowserUseTool(BaseTool):
         },
     }
 
+    resource: str = "browser"
     lock: asyncio.Lock = Field(default_factory=asyncio.Lock)
     browser: Optional[BrowserUseBrowser] = Field(default=None, exclude=True)
     context: Optional[BrowserContext] = Field(default=None, exclude=True)
@@ -100,6 +101,10 @@ class BrowserUseTool(BaseTool):
             raise ValueError("Parameters cannot be empty")
         return v
 
+    def can_run_concurrently(self, action: str = "", **kwargs) -> bool:
+        # Reading the page can overlap other work; anything else changes it
+        return action in ("get_html", "get_text", "screenshot")
+
     async def _ensure_browser_initialized(self) -> BrowserContext:
         """Ensure browser and context are initialized."""
         if self.browser is None:
@@ -258,6 +263,32 @@ class BrowserUseTool(BaseTool):
             except Exception as e:
                 return ToolResult(error=f"Failed to get browser state: {str(e)}")
 
+    async def warm_up(self) -> None:
+        async with self.lock:
+            await self._ensure_browser_initialized()
+
+    async def reset(self) -> None:
+        """Replace the browser context, dropping tabs, cookies and history.
+
+        The browser process itself stays up for the next task.
+        """
+        async with self.lock:
+            if self.context is not None:
+                await self.context.close()
+                self.context = None
+                self.dom_service = None
+            if self.browser is not None:
+                await self._ensure_browser_initialized()
+
+    async def health_check(self) -> bool:
+        """Whether a started browser is still connected and has a context"""
+        if self.browser is None:
+            return True
+        playwright_browser = getattr(self.browser, "playwright_browser", None)
+        if playwright_browser is not None and not playwright_browser.is_connected():
+            return False
+        return self.context is not None
+
     async def cleanup(self):
         """Clean up browser resources."""
         async with self.lock:
@@ -21,6 +21,7 @@ class CreateChatCompletion(BaseTool):
         list: "array",
     }
     response_type: Optional[Type] = None
+    read_only: bool = True
     required: List[str] = Field(default_factory=lambda: ["response"])
 
     def __init__(self, response_type: Optional[Type] = str):
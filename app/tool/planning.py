@@ -69,6 +69,10 @@ class PlanningTool(BaseTool):
     plans: dict = {}  # Dictionary to store plans by plan_id
     _current_plan_id: Optional[str] = None  # Track the current active plan
 
+    async def reset(self) -> None:
+        self.plans.clear()
+        self._current_plan_id = None
+
     async def execute(
         self,
         *,
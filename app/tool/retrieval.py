@@ -0,0 +1,108 @@
+"""BM25 ranking of tools against the conversation, to send only relevant ones."""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from app.tool.base import BaseTool
+
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by can for from has have if in into is it its of on or "
+    "that the this to use used using when which will with you your".split()
+)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [w for w in _WORD_PATTERN.findall(text.lower()) if w not in _STOP_WORDS]
+
+
+def _tool_text(tool: BaseTool) -> str:
+    """Name and description (weighted double) plus parameter descriptions"""
+    name = tool.name.replace("_", " ")
+    parts = [name, name, tool.description, tool.description]
+    for prop in ((tool.parameters or {}).get("properties") or {}).values():
+        parts.append(str(prop.get("description", "")))
+    return " ".join(parts)
+
+
+class ToolIndex:
+    """Okapi BM25 index over a fixed set of tools.
+
+    Built once per tool set; ranking a query costs one pass over its terms.
+    """
+
+    def __init__(self, tools: Sequence[BaseTool], k1: float = 1.2, b: float = 0.75):
+        self.tools = tools
+        self.k1 = k1
+        self.b = b
+        self.term_freqs: List[Counter] = [
+            Counter(tokenize(_tool_text(t))) for t in tools
+        ]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if tools else 0.0
+        doc_freq: Counter = Counter()
+        for tf in self.term_freqs:
+            doc_freq.update(tf.keys())
+        count = len(tools)
+        self.idf: Dict[str, float] = {
+            term: math.log(1 + (count - df + 0.5) / (df + 0.5))
+            for term, df in doc_freq.items()
+        }
+
+    def scores(self, query: str) -> List[float]:
+        """BM25 score of every tool for the query, in tool order"""
+        terms = Counter(t for t in tokenize(query) if t in self.idf)
+        scores = []
+        for tf, length in zip(self.term_freqs, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+            score = 0.0
+            for term, query_count in terms.items():
+                freq = tf.get(term)
+                if freq:
+                    score += (
+                        self.idf[term]
+                        * freq
+                        * (self.k1 + 1)
+                        / (freq + norm)
+                        * query_count
+                    )
+            scores.append(score)
+        return scores
+
+    def select(
+        self,
+        query: str,
+        top_k: int,
+        always: Iterable[str] = (),
+        recent: Iterable[str] = (),
+        recent_weight: float = 0.5,
+    ) -> Optional[List[BaseTool]]:
+        """Top-k tools for the query plus the always-on ones, in original order.
+
+        Recently used tools get a bonus of `recent_weight` times the best
+        score. Returns None when nothing matches, meaning the caller should
+        send the full tool set.
+        """
+        scores = self.scores(query)
+        best = max(scores, default=0.0)
+        if best <= 0:
+            return None
+        recent = set(recent)
+        for i, tool in enumerate(self.tools):
+            if tool.name in recent:
+                scores[i] += recent_weight * best
+
+        always = set(always)
+        ranked = sorted(
+            (i for i, tool in enumerate(self.tools) if tool.name not in always),
+            key=lambda i: scores[i],
+            reverse=True,
+        )
+        chosen = {i for i in ranked[:top_k] if scores[i] > 0}
+        chosen.update(i for i, tool in enumerate(self.tools) if tool.name in always)
+        return [tool for i, tool in enumerate(self.tools) if i in chosen]
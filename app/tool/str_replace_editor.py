@@ -88,6 +88,12 @@ class StrReplaceEditor(BaseTool):
 
     _file_history: list = defaultdict(list)
 
+    def can_run_concurrently(self, command: str = "", **kwargs) -> bool:
+        return command == "view"
+
+    async def reset(self) -> None:
+        self._file_history.clear()
+
     async def execute(
         self,
         *,
@@ -1,8 +1,22 @@
 """Collection classes for managing multiple tools."""
+import inspect
 from typing import Any, Dict, List
 
 from app.exceptions import ToolError
 from app.tool.base import BaseTool, ToolFailure, ToolResult
+from app.tool.validation import Validator, compile_schema
+
+
+def accepts_kwargs(tool: BaseTool) -> bool:
+    """Whether the tool's execute takes arbitrary keyword arguments"""
+    return any(
+        param.kind is inspect.Parameter.VAR_KEYWORD
+        for param in inspect.signature(tool.execute).parameters.values()
+    )
+
+
+def _validator(tool: BaseTool) -> Validator:
+    return compile_schema(tool.parameters, allow_extra=accepts_kwargs(tool))
 
 
 class ToolCollection:
@@ -11,6 +25,10 @@ class ToolCollection:
     def __init__(self, *tools: BaseTool):
         self.tools = tools
         self.tool_map = {tool.name: tool for tool in tools}
+        # Argument validators, compiled once when each tool is registered
+        self.validators: Dict[str, Validator] = {
+            tool.name: _validator(tool) for tool in tools
+        }
 
     def __iter__(self):
         return iter(self.tools)
@@ -24,6 +42,12 @@ class ToolCollection:
         tool = self.tool_map.get(name)
         if not tool:
             return ToolFailure(error=f"Tool {name} is invalid")
+        tool_input = tool_input or {}
+        errors = self.validators[name](tool_input)
+        if errors:
+            return ToolFailure(
+                error=f"Invalid arguments for tool '{name}': {'; '.join(errors)}"
+            )
         try:
             result = await tool(**tool_input)
             return result
@@ -47,6 +71,7 @@ class ToolCollection:
     def add_tool(self, tool: BaseTool):
         self.tools += (tool,)
         self.tool_map[tool.name] = tool
+        self.validators[tool.name] = _validator(tool)
         return self
 
     def add_tools(self, *tools: BaseTool):
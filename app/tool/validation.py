@@ -0,0 +1,221 @@
+"""Compiled validation of tool arguments against a tool's JSON schema.
+
+Schemas are compiled once into a tree of small check functions, so checking
+arguments on every call costs a few function calls per field instead of a
+schema interpretation pass. The supported subset covers what tool
+`parameters` use: type, enum, const, required, properties,
+additionalProperties, items, anyOf/oneOf, and length/range bounds.
+
+Unlike plain JSON Schema, undeclared top-level arguments are rejected unless
+the caller allows extras: a misspelled parameter name should come back to the
+model as an error rather than be silently ignored.
+"""
+
+import json
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+
+# Stop collecting after this many problems to keep messages compact
+MAX_ERRORS = 5
+
+Check = Callable[[Any, str, List[str]], None]
+Validator = Callable[[Any], List[str]]
+
+
+def _is_type(value: Any, kind: str) -> bool:
+    if kind == "string":
+        return isinstance(value, str)
+    if kind == "integer":
+        return (isinstance(value, int) and not isinstance(value, bool)) or (
+            isinstance(value, float) and value.is_integer()
+        )
+    if kind == "number":
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if kind == "boolean":
+        return isinstance(value, bool)
+    if kind == "array":
+        return isinstance(value, list)
+    if kind == "object":
+        return isinstance(value, dict)
+    if kind == "null":
+        return value is None
+    return True
+
+
+def _type_name(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list):
+        return "array"
+    if isinstance(value, dict):
+        return "object"
+    return type(value).__name__
+
+
+def _label(path: str) -> str:
+    return path or "arguments"
+
+
+def _compile(schema: Dict[str, Any]) -> Check:
+    checks: List[Check] = []
+
+    kinds = schema.get("type")
+    if kinds:
+        kinds = [kinds] if isinstance(kinds, str) else list(kinds)
+
+        def check_type(value, path, errors):
+            if not any(_is_type(value, kind) for kind in kinds):
+                errors.append(
+                    f"{_label(path)}: expected {' or '.join(kinds)}, got {_type_name(value)}"
+                )
+
+        checks.append(check_type)
+
+    if "enum" in schema:
+        allowed = schema["enum"]
+
+        def check_enum(value, path, errors):
+            if value not in allowed:
+                options = ", ".join(json.dumps(option) for option in allowed)
+                errors.append(f"{_label(path)}: must be one of {options}")
+
+        checks.append(check_enum)
+
+    if "const" in schema:
+        const = schema["const"]
+
+        def check_const(value, path, errors):
+            if value != const:
+                errors.append(f"{_label(path)}: must be {json.dumps(const)}")
+
+        checks.append(check_const)
+
+    for keyword, describe, compare in (
+        ("minLength", "at least {} characters", lambda v, n: len(v) >= n),
+        ("maxLength", "at most {} characters", lambda v, n: len(v) <= n),
+    ):
+        if keyword in schema:
+            checks.append(_bound(str, schema[keyword], describe, compare))
+    for keyword, describe, compare in (
+        ("minItems", "at least {} items", lambda v, n: len(v) >= n),
+        ("maxItems", "at most {} items", lambda v, n: len(v) <= n),
+    ):
+        if keyword in schema:
+            checks.append(_bound(list, schema[keyword], describe, compare))
+    for keyword, describe, compare in (
+        ("minimum", ">= {}", lambda v, n: v >= n),
+        ("maximum", "<= {}", lambda v, n: v <= n),
+    ):
+        if keyword in schema:
+            checks.append(_bound((int, float), schema[keyword], describe, compare))
+
+    properties = {
+        name: _compile(prop) for name, prop in schema.get("properties", {}).items()
+    }
+    required = schema.get("required", [])
+    additional = schema.get("additionalProperties", True)
+    extra_check = _compile(additional) if isinstance(additional, dict) else None
+    if properties or required or additional is not True:
+
+        def check_object(value, path, errors):
+            if not isinstance(value, dict):
+                return
+            prefix = f"{path}." if path else ""
+            missing = [name for name in required if name not in value]
+            if missing:
+                errors.append(f"{_label(path)}: missing required {', '.join(missing)}")
+            for name, item in value.items():
+                check = properties.get(name)
+                if check:
+                    check(item, prefix + name, errors)
+                elif additional is False:
+                    known = ", ".join(properties) or "none"
+                    errors.append(
+                        f"{prefix}{name}: unexpected parameter (allowed: {known})"
+                    )
+                elif extra_check:
+                    extra_check(item, prefix + name, errors)
+
+        checks.append(check_object)
+
+    if isinstance(schema.get("items"), dict):
+        item_check = _compile(schema["items"])
+
+        def check_items(value, path, errors):
+            if isinstance(value, list):
+                for index, item in enumerate(value):
+                    item_check(item, f"{path}[{index}]", errors)
+
+        checks.append(check_items)
+
+    options = schema.get("anyOf") or schema.get("oneOf")
+    if options:
+        option_checks = [_compile(option) for option in options]
+
+        def check_any(value, path, errors):
+            for check in option_checks:
+                attempt: List[str] = []
+                check(value, path, attempt)
+                if not attempt:
+                    return
+            errors.append(f"{_label(path)}: does not match any allowed form")
+
+        checks.append(check_any)
+
+    def check_all(value, path, errors):
+        for check in checks:
+            if len(errors) >= MAX_ERRORS:
+                return
+            check(value, path, errors)
+
+    return check_all
+
+
+def _bound(kind, limit, describe: str, compare) -> Check:
+    def check_bound(value, path, errors):
+        if isinstance(value, kind) and not isinstance(value, bool):
+            if not compare(value, limit):
+                errors.append(f"{_label(path)}: must be {describe.format(limit)}")
+
+    return check_bound
+
+
+@lru_cache(maxsize=256)
+def _compile_cached(schema_json: str) -> Validator:
+    check = _compile(json.loads(schema_json))
+
+    def validate(arguments: Any) -> List[str]:
+        errors: List[str] = []
+        check(arguments, "", errors)
+        return errors[:MAX_ERRORS]
+
+    return validate
+
+
+def compile_schema(
+    schema: Optional[Dict[str, Any]], allow_extra: bool = False
+) -> Validator:
+    """Compile a JSON schema into a function returning a list of problems.
+
+    Args:
+        schema: The tool's JSON schema for its parameters
+        allow_extra: Accept top-level arguments the schema does not declare,
+            for tools that take `**kwargs`. An explicit
+            `additionalProperties` in the schema always wins.
+
+    Identical schemas (e.g. the same tool registered by several agents)
+    share one compiled validator.
+    """
+    schema = schema or {}
+    if not allow_extra and schema.get("properties"):
+        schema = {"additionalProperties": False, **schema}
+    return _compile_cached(json.dumps(schema, sort_keys=True))
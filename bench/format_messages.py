@@ -0,0 +1,90 @@
+"""Benchmark LLM.format_messages over a growing agent history.
+
+Builds a synthetic Manus-like run (per step: a user prompt, an assistant tool
+call and a tool result) and formats the history as each step would, with the
+per-message wire-form cache warm and with it cleared before every call (the
+cost before messages cached their serialized form).
+
+    python -m bench.format_messages --steps 30 --repeat 200
+"""
+
+import argparse
+import time
+from typing import List
+
+from app.llm import LLM
+from app.schema import Function, Message, ToolCall
+
+
+def build_history(steps: int) -> List[Message]:
+    messages = []
+    for i in range(steps):
+        messages.append(Message.user_message("next step prompt " * 40))
+        call = ToolCall(
+            id=f"call_{i}",
+            function=Function(
+                name="python_execute",
+                arguments='{"code": "%s"}' % ("print(1)\\n" * 40),
+            ),
+        )
+        messages.append(
+            Message.from_tool_calls(content="thinking " * 30, tool_calls=[call])
+        )
+        messages.append(
+            Message.tool_message(
+                "output line\n" * 80, name="python_execute", tool_call_id=call.id
+            )
+        )
+    return messages
+
+
+def clear_caches(messages: List[Message]) -> None:
+    for message in messages:
+        message.__pydantic_private__.update(_wire_cache=None, _token_count=None)
+
+
+def measure(messages: List[Message], steps: int, repeat: int, cache: bool) -> tuple:
+    """Seconds for a whole run (one format per step) and for its last step.
+
+    Each run starts from fresh messages; without `cache`, every format call
+    starts from fresh messages too.
+    """
+    per_step = len(messages) // steps
+    run_total = 0.0
+    for _ in range(repeat):
+        clear_caches(messages)
+        start = time.perf_counter()
+        for step in range(1, steps + 1):
+            if not cache:
+                clear_caches(messages)
+            LLM.format_messages(messages[: step * per_step])
+        run_total += time.perf_counter() - start
+
+    last_total = 0.0
+    for _ in range(repeat):
+        if not cache:
+            clear_caches(messages)
+        start = time.perf_counter()
+        LLM.format_messages(messages)
+        last_total += time.perf_counter() - start
+    return run_total / repeat, last_total / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    messages = build_history(args.steps)
+    uncached = measure(messages, args.steps, args.repeat, cache=False)
+    cached = measure(messages, args.steps, args.repeat, cache=True)
+    for label, (run, last) in (("uncached", uncached), ("cached", cached)):
+        print(
+            f"{label:>8}: step {args.steps} {last * 1e6:8.1f} us, "
+            f"all {args.steps} steps {run * 1e3:6.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Benchmark LLM calls with and without HTTP connection reuse.
+
+Starts the local stand-in server (app.llm_stub) in a subprocess and sends
+non-streaming chat completions through clients built from [http] settings,
+once with keep-alive connections and once with every connection closed after
+its request, sequentially and at a given concurrency.
+
+    python -m bench.http_pool --requests 300 --concurrency 1 8
+
+Loopback without TLS understates the gain: against a remote HTTPS provider,
+every new connection also pays TCP and TLS handshakes.
+"""
+
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+from typing import List
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.config import HttpSettings
+from app.http_client import build_http_client
+
+
+def start_stub(port: int, service_time: float) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "app.llm_stub",
+            "--port",
+            str(port),
+            "--ttft",
+            str(service_time),
+            "--ttft-sigma",
+            "0",
+            "--tps",
+            "100000",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://localhost:{port}/v1/models", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("LLM stub did not start")
+
+
+async def run(
+    base_url: str, keepalive: int, concurrency: int, requests: int
+) -> List[float]:
+    """Latencies of `requests` calls made `concurrency` at a time"""
+    http_client = build_http_client(
+        HttpSettings(
+            max_connections=max(concurrency, 1),
+            max_keepalive_connections=keepalive,
+        )
+    )
+    client = AsyncOpenAI(
+        api_key="stub", base_url=base_url, http_client=http_client, max_retries=0
+    )
+    slots = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def call() -> None:
+        async with slots:
+            start = time.perf_counter()
+            await client.chat.completions.create(
+                model="stub", messages=[{"role": "user", "content": "hi"}]
+            )
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(call() for _ in range(requests)))
+    await http_client.aclose()
+    return sorted(latencies)
+
+
+async def bench(args: argparse.Namespace) -> None:
+    base_url = f"http://localhost:{args.port}/v1"
+    # Warm up the server before measuring
+    await run(base_url, keepalive=8, concurrency=4, requests=50)
+    for concurrency in args.concurrency:
+        for keepalive in (max(concurrency, 1), 0):
+            start = time.perf_counter()
+            latencies = await run(base_url, keepalive, concurrency, args.requests)
+            wall = time.perf_counter() - start
+            label = "keep-alive" if keepalive else "no reuse"
+            print(
+                f"concurrency {concurrency:>3} {label:>10}: "
+                f"p50 {latencies[len(latencies) // 2] * 1e3:6.2f} ms, "
+                f"p95 {latencies[int(len(latencies) * 0.95)] * 1e3:6.2f} ms, "
+                f"{args.requests / wall:6.0f} req/s"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument(
+        "--service-time", type=float, default=0.002, help="Stub seconds per call"
+    )
+    args = parser.parse_args()
+
+    stub = start_stub(args.port, args.service_time)
+    try:
+        asyncio.run(bench(args))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+
+if __name__ == "__main__":
+    main()
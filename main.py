@@ -1,11 +1,22 @@
+import argparse
 import asyncio
 
 from app.agent.manus import Manus
+from app.checkpoint import CheckpointWriter, load_checkpoint
 from app.logger import logger
 
 
 async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resume", help="Checkpoint file to resume a run from")
+    args = parser.parse_args()
+
     agent = Manus()
+    if args.resume:
+        agent.restore_checkpoint(load_checkpoint(args.resume))
+        agent.checkpoint = CheckpointWriter(args.resume)
+        logger.warning("Resuming from checkpoint...")
+        await agent.run()
     while True:
         try:
             prompt = input("Enter your prompt (or 'exit'/'quit' to quit): ")
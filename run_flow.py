@@ -1,17 +1,33 @@
+import argparse
 import asyncio
 import time
 
 from app.agent.manus import Manus
+from app.checkpoint import CheckpointWriter, load_checkpoint
 from app.flow.base import FlowType
 from app.flow.flow_factory import FlowFactory
 from app.logger import logger
 
 
 async def run_flow():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resume", help="Checkpoint file to resume a flow from")
+    args = parser.parse_args()
+
     agents = {
         "manus": Manus(),
     }
 
+    if args.resume:
+        flow = FlowFactory.create_flow(
+            flow_type=FlowType.PLANNING,
+            agents=agents,
+            checkpoint=CheckpointWriter(args.resume),
+        )
+        flow.restore_checkpoint(load_checkpoint(args.resume))
+        logger.warning("Resuming from checkpoint...")
+        logger.info(await flow.execute(""))
+
     while True:
         try:
             prompt = input("Enter your prompt (or 'exit' to quit): ")
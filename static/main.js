@@ -172,6 +172,30 @@ function setupSSE(taskId) {
             }
         });
 
+        // Add handler for streamed LLM tokens
+        eventSource.addEventListener('token', (event) => {
+            try {
+                const data = JSON.parse(event.data);
+                let stepContainer = container.querySelector('.step-container');
+                if (!stepContainer) {
+                    container.innerHTML = '<div class="step-container"></div>';
+                    stepContainer = container.querySelector('.step-container');
+                }
+
+                let live = stepContainer.querySelector('.step-item.stream:last-child pre');
+                if (!live) {
+                    const step = document.createElement('div');
+                    step.className = 'step-item stream';
+                    step.innerHTML = '<div class="log-line"><pre></pre></div>';
+                    stepContainer.appendChild(step);
+                    live = step.querySelector('pre');
+                }
+                live.textContent += data.content;
+            } catch (e) {
+                console.error('Token event handling failed:', e);
+            }
+        });
+
         // Add handler for tool event
         eventSource.addEventListener('tool', (event) => {
             clearInterval(heartbeatTimer);
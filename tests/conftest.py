@@ -0,0 +1,83 @@
+"""LLM clients served in-process by the app.llm_stub server"""
+
+import json
+import uuid
+from typing import Iterator, List
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from app.config import LLMSettings
+from app.endpoint_pool import Endpoint, EndpointPool
+from app.llm import LLM
+from app.llm_stub import StubLatency, StubScript, create_app
+
+
+@pytest.fixture
+def stub_client():
+    """Build an AsyncOpenAI client whose requests go to an in-process stub.
+
+    Latency defaults to none at all; request bodies sent are kept on the
+    client's `sent` list.
+    """
+
+    def build(script: StubScript = None, **latency) -> AsyncOpenAI:
+        script = script or StubScript()
+        script.latency = StubLatency(
+            **{"ttft": 0, "ttft_sigma": 0, "tokens_per_second": 1e6, **latency}
+        )
+        sent: List[dict] = []
+
+        async def record(request: httpx.Request) -> None:
+            sent.append(json.loads(request.content))
+
+        http_client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=create_app(script)),
+            event_hooks={"request": [record]},
+        )
+        client = AsyncOpenAI(
+            api_key="stub",
+            base_url="http://stub/v1",
+            http_client=http_client,
+            max_retries=0,
+        )
+        client.sent = sent
+        return client
+
+    return build
+
+
+@pytest.fixture
+def make_llm() -> Iterator:
+    """Build a fresh LLM that spreads requests over the given clients"""
+    names: List[str] = []
+
+    def build(*clients: AsyncOpenAI, **settings) -> LLM:
+        name = f"test-{uuid.uuid4().hex[:8]}"
+        names.append(name)
+        llm_settings = LLMSettings(
+            model="stub",
+            base_url="http://stub/v1",
+            api_key="stub",
+            api_type="",
+            api_version="",
+            **settings,
+        )
+        llm = LLM(name, {"default": llm_settings})
+        llm.pool = EndpointPool(
+            [
+                Endpoint(client, f"http://stub-{i}/v1")
+                for i, client in enumerate(clients)
+            ],
+            eject_failures=llm_settings.endpoint_eject_failures,
+            eject_seconds=llm_settings.endpoint_eject_seconds,
+            max_latency=llm_settings.endpoint_max_latency,
+        )
+        llm.client = llm.pool.endpoints[0].client
+        llm.cache = None
+        return llm
+
+    yield build
+    for name in names:
+        LLM._instances.pop(name, None)
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+
+pytest.importorskip("browser_use")
+
+from app.agent.pool import AgentPool
+from app.config import AgentPoolSettings
+from app.tool import BaseTool
+
+
+class Resource(BaseTool):
+    description: str = "A tool holding a process"
+    started: bool = False
+    closed: bool = False
+
+    async def execute(self) -> str:
+        return "ok"
+
+    async def warm_up(self) -> None:
+        self.started = True
+
+    async def cleanup(self) -> None:
+        self.closed = True
+
+
+class Agent:
+    """Just enough of an agent for the pool"""
+
+    def __init__(self, reset_delay: float = 0.0):
+        self.name = "agent"
+        self.available_tools = [Resource(name="bash"), Resource(name="browser_use")]
+        self.reset_delay = reset_delay
+
+    async def reset(self) -> None:
+        await asyncio.sleep(self.reset_delay)
+
+
+def test_warm_up_skips_cold_tools():
+    async def main():
+        pool = AgentPool(Agent, AgentPoolSettings(min_size=0))
+        agent = await pool.acquire()
+        return {tool.name: tool.started for tool in agent.available_tools}
+
+    assert asyncio.run(main()) == {"bash": True, "browser_use": False}
+
+
+def test_returned_agent_is_reused():
+    async def main():
+        pool = AgentPool(Agent, AgentPoolSettings(min_size=0, max_size=1))
+        async with pool.agent() as first:
+            pass
+        async with pool.agent() as second:
+            pass
+        return first, second, pool.stats()
+
+    first, second, stats = asyncio.run(main())
+    assert first is second
+    assert stats["created"] == 1 and stats["reused"] == 1
+
+
+def test_cancelled_release_frees_the_slot_and_discards_the_agent():
+    async def main():
+        pool = AgentPool(
+            lambda: Agent(reset_delay=10), AgentPoolSettings(min_size=0, max_size=1)
+        )
+        agent = await pool.acquire()
+        release = asyncio.create_task(pool.release(agent))
+        await asyncio.sleep(0)
+        release.cancel()
+        await asyncio.gather(release, return_exceptions=True)
+        # The only slot is free again: a new agent is handed out at once
+        replacement = await asyncio.wait_for(pool.acquire(), 1)
+        return agent, replacement, pool.stats()
+
+    agent, replacement, stats = asyncio.run(main())
+    assert replacement is not agent
+    assert all(tool.closed for tool in agent.available_tools)
+    assert stats["discarded"] == 1 and stats["idle"] == 0
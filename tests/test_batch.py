@@ -0,0 +1,81 @@
+import asyncio
+
+from app.llm import LLM
+from app.rate_limit import Priority, current_priority
+
+
+def test_batch_respects_concurrency_and_reports_failures(stub_client, make_llm):
+    llm = make_llm(stub_client())
+    running = peak = 0
+    priorities = []
+
+    def make_call(index):
+        async def call():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            priorities.append(current_priority())
+            await asyncio.sleep(0.01)
+            running -= 1
+            if index == 3:
+                raise ValueError("bad item")
+            return index
+
+        return call
+
+    async def main():
+        calls = (make_call(i) for i in range(6))
+        return [r async for r in llm._run_batch(calls, concurrency=2)]
+
+    results = asyncio.run(main())
+    assert peak == 2
+    assert set(priorities) == {Priority.BACKGROUND}
+    assert sorted(r.index for r in results) == list(range(6))
+    failed = [r for r in results if not r.ok]
+    assert [r.index for r in failed] == [3]
+    assert isinstance(failed[0].error, ValueError)
+    assert all(r.result == r.index for r in results if r.ok)
+
+
+def test_stopping_early_cancels_the_rest_of_the_batch(stub_client, make_llm):
+    llm = make_llm(stub_client())
+    started, cancelled = [], []
+
+    def make_call(index):
+        async def call():
+            started.append(index)
+            try:
+                await asyncio.sleep(0 if index == 0 else 10)
+            except asyncio.CancelledError:
+                cancelled.append(index)
+                raise
+            return index
+
+        return call
+
+    async def main():
+        batch = llm._run_batch((make_call(i) for i in range(10)), concurrency=3)
+        first = await batch.__anext__()
+        await batch.aclose()
+        await asyncio.sleep(0)
+        return first
+
+    first = asyncio.run(main())
+    assert first.result == 0
+    assert sorted(cancelled) == sorted(i for i in started if i != 0)
+    # Items beyond the workers' reach were never pulled from the iterable
+    assert len(started) <= 4
+
+
+def test_ask_many_yields_every_prompt(stub_client, make_llm):
+    client = stub_client()
+    llm: LLM = make_llm(client)
+    prompts = [[{"role": "user", "content": f"question {i}"}] for i in range(4)]
+
+    async def main():
+        return [r async for r in llm.ask_many(prompts, concurrency=2)]
+
+    results = asyncio.run(main())
+    assert sorted(r.index for r in results) == [0, 1, 2, 3]
+    assert all(r.ok and r.result for r in results)
+    assert len(client.sent) == 4
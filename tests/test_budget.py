@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import pytest
+
+from app.budget import BudgetUsage, RunBudget
+from app.config import BudgetSettings
+from app.exceptions import BudgetExceeded
+from app.llm_stub import StubRule, StubScript
+from app.telemetry import LLMCallRecord, report_usage
+
+
+def call_record(prompt_tokens: int, completion_tokens: int) -> LLMCallRecord:
+    return LLMCallRecord(
+        method="ask",
+        model="stub",
+        config_name="stub",
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+    )
+
+
+def test_step_token_limit_interrupts_the_step_at_its_next_await():
+    async def main():
+        budget = RunBudget(BudgetSettings(max_step_tokens=100), BudgetUsage())
+        with pytest.raises(BudgetExceeded) as raised:
+            async with budget.step():
+                report_usage(call_record(80, 40))
+                await asyncio.sleep(10)
+        assert "step tokens 120 of 100" in raised.value.message
+        # A new step starts with a fresh step allowance
+        async with budget.step():
+            report_usage(call_record(10, 10))
+        return budget
+
+    budget = asyncio.run(main())
+    assert budget.usage.llm_calls == 2
+    assert budget.usage.total_tokens == 140
+    assert budget.exhausted() is None
+
+
+def test_run_limit_is_reported_once_reached():
+    async def main():
+        budget = RunBudget(BudgetSettings(max_tokens=100), BudgetUsage())
+        with pytest.raises(BudgetExceeded):
+            async with budget.step():
+                report_usage(call_record(90, 20))
+                await asyncio.sleep(10)
+        return budget
+
+    assert asyncio.run(main()).exhausted() == "tokens 110 of 100"
+
+
+def test_step_timeout_interrupts_a_slow_step():
+    async def main():
+        budget = RunBudget(BudgetSettings(step_timeout=0.05), BudgetUsage())
+        with pytest.raises(BudgetExceeded) as raised:
+            async with budget.step():
+                await asyncio.sleep(10)
+        return raised.value.message
+
+    assert asyncio.run(main()).startswith("step seconds")
+
+
+def test_step_timeout_answers_dangling_tool_calls(stub_client, make_llm):
+    pytest.importorskip("browser_use")
+    from app.agent.toolcall import ToolCallAgent
+    from app.tool import BaseTool, ToolCollection
+
+    class Slow(BaseTool):
+        name: str = "slow"
+        description: str = "Takes a long time"
+        parameters: dict = {"type": "object", "properties": {}}
+
+        async def execute(self) -> str:
+            await asyncio.sleep(10)
+            return "done"
+
+    script = StubScript(
+        rules=[StubRule(tool_calls=[{"name": "slow", "arguments": {}}])]
+    )
+    # Set after construction, where per-agent config would override them
+    agent = ToolCallAgent(tool_top_k=None)
+    agent.max_steps = 1
+    agent.budget = BudgetSettings(step_timeout=0.2)
+    agent.available_tools = ToolCollection(Slow())
+    agent.llm = make_llm(stub_client(script))
+
+    result = asyncio.run(agent.run("do the slow thing"))
+    assert "Interrupted: step seconds" in result
+    call = next(m for m in agent.memory.messages if m.tool_calls).tool_calls[0]
+    answer = agent.memory.messages[-1]
+    assert answer.role == "tool" and answer.tool_call_id == call.id
+    assert answer.content.startswith("Error: Interrupted: step seconds")
+    assert json.loads(call.function.arguments) == {}
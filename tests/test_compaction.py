@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from app import compaction
+from app.compaction import SUMMARY_PREFIX, MemoryCompactor
+from app.config import CompactionSettings
+from app.schema import Function, Memory, Message, ToolCall
+from app.telemetry import telemetry
+
+
+@pytest.fixture(autouse=True)
+def no_routing(monkeypatch):
+    monkeypatch.setattr(compaction, "route_llm", lambda kind, llm, *a, **kw: llm)
+
+
+def make_memory(turns: int) -> Memory:
+    memory = Memory()
+    memory.add_message(Message.system_message("You are an agent"))
+    memory.add_message(Message.user_message("Find the answer"))
+    for i in range(turns):
+        call = ToolCall(id=f"c{i}", function=Function(name="bash", arguments="{}"))
+        memory.add_message(Message.from_tool_calls([call], content=f"step {i}"))
+        memory.add_message(Message.tool_message(f"output {i}", "bash", f"c{i}"))
+    return memory
+
+
+def test_summary_is_swapped_in_at_a_later_step(stub_client, make_llm):
+    client = stub_client(ttft=0.05)
+    llm = make_llm(client)
+    compactor = MemoryCompactor(CompactionSettings(trigger_messages=8, keep_recent=3))
+    memory = make_memory(turns=5)
+    recent = memory.messages[-4:]
+
+    async def main():
+        compactor.update(memory, llm)
+        # The step carries on while the summary is written
+        assert compactor._task is not None and len(memory.messages) == 12
+        await compactor._task
+        memory.add_message(Message.user_message("keep going"))
+        compactor.update(memory, llm)
+
+    asyncio.run(main())
+    messages = memory.messages
+    assert [m.content for m in messages[:2]] == ["You are an agent", "Find the answer"]
+    assert messages[2] is compactor.summary
+    assert messages[2].content.startswith(SUMMARY_PREFIX)
+    # The span ends before a call's results, so the pair stays together
+    assert messages[3:-1] == recent
+    assert messages[3].tool_calls and messages[4].role == "tool"
+    assert "output 0" in client.sent[0]["messages"][-1]["content"]
+    record = telemetry.records(config_name=llm.config_name)[-1]
+    assert record.purpose == "compaction"
+
+
+def test_summary_is_discarded_when_memory_changed(stub_client, make_llm):
+    llm = make_llm(stub_client(ttft=0.05))
+    compactor = MemoryCompactor(CompactionSettings(trigger_messages=8, keep_recent=3))
+    memory = make_memory(turns=5)
+
+    async def main():
+        compactor.update(memory, llm)
+        task = compactor._task
+        memory.replace(2, 4, [])
+        await task
+        compactor._apply(memory)
+
+    asyncio.run(main())
+    assert compactor.summary is None
+    assert len(memory.messages) == 10
+    assert not any(
+        m.content and m.content.startswith(SUMMARY_PREFIX) for m in memory.messages
+    )
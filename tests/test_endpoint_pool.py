@@ -0,0 +1,55 @@
+import asyncio
+
+from app.endpoint_pool import PooledStream
+
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def test_fails_over_to_a_healthy_endpoint_on_5xx(stub_client, make_llm):
+    failing = stub_client(error_rate=1.0)
+    healthy = stub_client()
+    llm = make_llm(failing, healthy, endpoint_eject_failures=1)
+    # Prefer the failing endpoint while it is healthy
+    llm.pool.endpoints[1].weight = 0.5
+
+    async def main():
+        return [await llm.ask(MESSAGES, stream=False) for _ in range(4)]
+
+    assert all(asyncio.run(main()))
+    assert len(healthy.sent) == 4
+    # Ejected after its first failure, so it is not tried again
+    assert len(failing.sent) == 1
+    assert not llm.pool.endpoints[0].healthy
+
+
+def test_stream_holds_its_endpoint_slot_until_closed(stub_client, make_llm):
+    llm = make_llm(stub_client())
+    endpoint = llm.pool.endpoints[0]
+
+    async def main():
+        stream = await llm._send_completion(
+            model="stub", messages=MESSAGES, max_tokens=10, stream=True
+        )
+        assert isinstance(stream, PooledStream)
+        assert endpoint.outstanding == 1
+        await stream.aclose()
+        assert endpoint.outstanding == 0
+
+    asyncio.run(main())
+
+
+def test_stream_read_to_the_end_releases_its_slot(stub_client, make_llm):
+    llm = make_llm(stub_client())
+    endpoint = llm.pool.endpoints[0]
+
+    async def main():
+        stream = await llm._send_completion(
+            model="stub", messages=MESSAGES, max_tokens=10, stream=True
+        )
+        chunks = [chunk async for chunk in stream]
+        assert chunks
+        assert endpoint.outstanding == 0
+        assert endpoint.latency is not None
+
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+import asyncio
+
+from app.llm import LLM
+from app.telemetry import LLMCallRecord, telemetry
+
+
+def _seed_latency(llm: LLM, attempt_latency: float, latency: float) -> None:
+    telemetry.record(
+        LLMCallRecord(
+            method="ask",
+            model=llm.model,
+            config_name=llm.config_name,
+            attempt_latency=attempt_latency,
+            latency=latency,
+        )
+    )
+
+
+def test_hedge_delay_learns_from_per_attempt_latency(stub_client, make_llm):
+    llm = make_llm(stub_client(), hedge=True, hedge_min_samples=1)
+    # A call that queued and retried for seconds but got its answer quickly
+    _seed_latency(llm, attempt_latency=0.02, latency=5.0)
+    assert llm._hedge_delay(stream=False) == 0.02
+
+
+def test_slow_request_is_hedged_and_the_loser_cancelled(stub_client, make_llm):
+    fast_client = stub_client()
+    fast = make_llm(fast_client)
+    slow_client = stub_client(ttft=5.0)
+    slow = make_llm(
+        slow_client,
+        hedge=True,
+        hedge_config=fast.config_name,
+        hedge_min_samples=1,
+        hedge_max_fraction=1.0,
+    )
+    _seed_latency(slow, attempt_latency=0.01, latency=0.01)
+
+    async def main():
+        return await asyncio.wait_for(
+            slow.ask([{"role": "user", "content": "hello"}], stream=False), 2
+        )
+
+    assert asyncio.run(main())
+    assert len(slow_client.sent) == len(fast_client.sent) == 1
+    record = telemetry.records(config_name=slow.config_name)[-1]
+    assert record.hedged and record.attempts == 2
+    assert slow.pool.endpoints[0].outstanding == 0
+
+
+def test_first_success_closes_the_other_winners():
+    class Response:
+        closed = False
+
+        async def close(self):
+            self.closed = True
+
+    async def main():
+        first, second = Response(), Response()
+        tasks = [asyncio.ensure_future(asyncio.sleep(0, r)) for r in (first, second)]
+        await asyncio.sleep(0.01)
+        winner = await LLM._first_success(tasks)
+        return winner, first, second
+
+    winner, first, second = asyncio.run(main())
+    loser = second if winner is first else first
+    assert loser.closed and not winner.closed
@@ -0,0 +1,50 @@
+from app.json_repair import repair_json
+from app.tool.bash import Bash
+from app.tool.python_execute import PythonExecute
+from app.tool.str_replace_editor import StrReplaceEditor
+
+
+BASH = Bash().parameters
+EDITOR = StrReplaceEditor().parameters
+
+
+def test_repairs_almost_json():
+    text = "```json\n{'command': 'ls -la', }\n```"
+    assert repair_json(text, BASH) == {"command": "ls -la"}
+
+
+def test_repairs_unescaped_quotes_in_single_string_field():
+    text = '{"code": "print("hi")"}'
+    assert repair_json(text, PythonExecute().parameters) == {"code": 'print("hi")'}
+
+
+def test_rejects_truncated_command():
+    assert (
+        repair_json('{"command": "rm -rf /tmp/build/cache && echo done', BASH) is None
+    )
+
+
+def test_rejects_truncated_file_text():
+    text = (
+        '{"command": "create", "path": "/workspace/app.py", '
+        '"file_text": "def main():\\n    return'
+    )
+    assert repair_json(text, EDITOR) is None
+
+
+def test_rejects_truncated_new_str():
+    text = (
+        '{"command": "str_replace", "path": "/workspace/app.py", '
+        '"old_str": "x = 1", "new_str": "x = '
+    )
+    assert repair_json(text, EDITOR) is None
+
+
+def test_rejects_truncated_object():
+    assert repair_json('{"command": "ls -la"', BASH) is None
+
+
+def test_undeclared_arguments_follow_the_tools_validator():
+    text = "{'command': 'ls', 'timeout': 5,}"
+    assert repair_json(text, BASH) is None
+    assert repair_json(text, BASH, allow_extra=True) == {"command": "ls", "timeout": 5}
@@ -0,0 +1,46 @@
+import asyncio
+
+from app.cache import ResponseCache
+from app.config import CacheSettings
+from app.telemetry import telemetry, telemetry_context
+
+
+def test_explicit_zero_temperature_is_sent_and_cached(stub_client, make_llm):
+    client = stub_client()
+    llm = make_llm(client, temperature=0.7)
+    llm.cache = ResponseCache(CacheSettings(enabled=True, disk_path=""))
+    messages = [{"role": "user", "content": "hello"}]
+
+    async def main():
+        first = await llm.ask(messages, stream=False, temperature=0)
+        second = await llm.ask(messages, stream=False, temperature=0)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first == second
+    assert [request["temperature"] for request in client.sent] == [0]
+
+
+def test_default_temperature_comes_from_config(stub_client, make_llm):
+    client = stub_client()
+    llm = make_llm(client, temperature=0.7)
+    asyncio.run(llm.ask([{"role": "user", "content": "hello"}], stream=False))
+    assert client.sent[0]["temperature"] == 0.7
+
+
+def test_calls_are_grouped_by_purpose(stub_client, make_llm):
+    llm = make_llm(stub_client())
+    messages = [{"role": "user", "content": "hello"}]
+
+    async def main():
+        await llm.ask(messages, stream=False)
+        with telemetry_context(purpose="compaction"):
+            await llm.ask(messages, stream=False, temperature=0.1)
+
+    telemetry.clear()
+    asyncio.run(main())
+    records = telemetry.records(config_name=llm.config_name)
+    assert [r.purpose for r in records] == [None, "compaction"]
+    by_purpose = telemetry.summary(config_name=llm.config_name)["tokens_by_purpose"]
+    assert set(by_purpose) == {None, "compaction"}
+    assert by_purpose["compaction"]["completion_tokens"] > 0
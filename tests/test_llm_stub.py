@@ -0,0 +1,38 @@
+import asyncio
+import sys
+
+import pytest
+from pydantic import ValidationError
+
+from app import llm_stub
+from app.llm_stub import StubLatency
+
+
+def test_zero_tokens_per_second_means_no_pacing(stub_client):
+    client = stub_client(tokens_per_second=0)
+    messages = [{"role": "user", "content": "hello"}]
+
+    async def main():
+        response = await client.chat.completions.create(model="stub", messages=messages)
+        stream = await client.chat.completions.create(
+            model="stub", messages=messages, stream=True
+        )
+        streamed = "".join([c.choices[0].delta.content or "" async for c in stream])
+        return response.choices[0].message.content, streamed
+
+    content, streamed = asyncio.run(main())
+    assert content and streamed
+
+
+@pytest.mark.parametrize(
+    "field", ["ttft", "ttft_sigma", "tokens_per_second", "retry_after"]
+)
+def test_negative_latency_is_rejected(field):
+    with pytest.raises(ValidationError):
+        StubLatency(**{field: -1})
+
+
+def test_command_line_rejects_negative_pacing(monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["llm_stub", "--tps", "-1"])
+    with pytest.raises(SystemExit):
+        llm_stub.main()
@@ -0,0 +1,85 @@
+from app.loop_detection import LoopDetector
+from app.schema import Function, Message, ToolCall
+
+
+class Run:
+    def __init__(self):
+        self.detector = LoopDetector(threshold=2)
+        self.messages = [Message.user_message("task")]
+
+    def step(self, content, call=None, result="ok"):
+        message = Message(role="assistant", content=content)
+        if call:
+            call_id = f"call_{len(self.messages)}"
+            name, arguments = call
+            message.tool_calls = [
+                ToolCall(id=call_id, function=Function(name=name, arguments=arguments))
+            ]
+        self.messages.append(message)
+        if call:
+            self.messages.append(
+                Message.tool_message(result, name=name, tool_call_id=call_id)
+            )
+        return self.detector.observe(self.messages)
+
+
+def test_exact_repeats_are_stuck():
+    run = Run()
+    content = "I will open the config file and look for the database settings"
+    assert [run.step(content) for _ in range(3)] == [False, False, True]
+
+
+def test_repeated_tool_call_is_stuck():
+    run = Run()
+    calls = ['{"q": "x", "n": 1}', '{"n":1,"q":"x"}', '{"q":"x","n":1}']
+    assert [run.step(None, ("search", args)) for args in calls] == [
+        False,
+        False,
+        True,
+    ]
+
+
+def test_repeated_tool_call_with_changing_output_is_stuck():
+    run = Run()
+    call = ("bash", '{"command": "make test"}')
+    results = [f"1 failed in {seconds}s" for seconds in (0.41, 0.38, 0.44)]
+    assert [run.step(None, call, result=r) for r in results] == [False, False, True]
+
+
+def test_similar_narration_of_progress_is_not_stuck():
+    run = Run()
+    results = [
+        run.step(
+            f"Now I will edit file module_{i}.py to update the import of the "
+            f"helper function used by the tests in that package",
+            ("str_replace_editor", f'{{"path": "module_{i}.py"}}'),
+            result=f"edited module_{i}.py",
+        )
+        for i in range(10)
+    ]
+    assert not any(results)
+
+
+NEAR_DUPLICATE = (
+    "The search returned nothing useful, so I will search the web again for the "
+    "latest information about the python release schedule and the planned "
+    "feature freeze date {}"
+)
+
+
+def test_near_duplicates_alone_are_not_stuck():
+    run = Run()
+    results = [
+        run.step(NEAR_DUPLICATE.format(word), ("web_search", f'{{"query": "{word}"}}'))
+        for word in ("next", "soon", "first")
+    ]
+    assert not any(results)
+
+
+def test_near_duplicate_with_repeated_tool_call_is_stuck():
+    run = Run()
+    search = ("web_search", '{"query": "python release schedule"}')
+    fetch = ("browser_use", '{"action": "go_to_url"}')
+    assert not run.step(NEAR_DUPLICATE.format("next"), search)
+    assert not run.step(NEAR_DUPLICATE.format("soon"), fetch)
+    assert run.step(NEAR_DUPLICATE.format("first"), search)
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+
+pytest.importorskip("browser_use")
+
+from app.agent.toolcall import ToolCallAgent
+from app.checkpoint import CheckpointWriter, load_checkpoint
+from app.flow.planning import PlanningFlow
+from app.schema import AgentState, Message
+
+
+def checkpoint_flow(path: str, statuses: list) -> None:
+    """Record a flow whose executor called terminate at the end of its last step"""
+    writer = CheckpointWriter(path)
+    agent = ToolCallAgent(name="worker")
+    flow = PlanningFlow(agents={"worker": agent}, checkpoint=writer)
+    flow.planning_tool.plans[flow.active_plan_id] = {
+        "plan_id": flow.active_plan_id,
+        "title": "Plan",
+        "steps": [f"step {i}" for i in range(len(statuses))],
+        "step_statuses": statuses,
+        "step_notes": [""] * len(statuses),
+    }
+    agent.memory.add_message(Message.user_message("step 0"))
+    agent.state = AgentState.FINISHED
+    writer.record_agent(agent)
+    writer.record_flow(flow)
+    writer.close()
+
+
+def resume_flow(path: str):
+    agent = ToolCallAgent(name="worker")
+    flow = PlanningFlow(agents={"worker": agent}, checkpoint=CheckpointWriter(path))
+    flow.restore_checkpoint(load_checkpoint(path))
+    executed = []
+
+    async def execute_step(executor, step_info):
+        executed.append((step_info["text"], executor.state))
+        await flow._mark_step_completed()
+        return f"did {step_info['text']}"
+
+    async def finalize_plan():
+        return "plan finished"
+
+    flow._execute_step = execute_step
+    flow._finalize_plan = finalize_plan
+    return flow, executed
+
+
+def test_resume_runs_the_remaining_steps(tmp_path):
+    path = str(tmp_path / "flow.jsonl")
+    checkpoint_flow(path, ["completed", "not_started", "not_started"])
+    flow, executed = resume_flow(path)
+    assert flow.agents["worker"].state == AgentState.FINISHED
+
+    result = asyncio.run(flow.execute(""))
+    assert executed == [("step 1", AgentState.IDLE), ("step 2", AgentState.IDLE)]
+    assert result.endswith("plan finished")
+
+
+def test_resume_of_a_completed_plan_runs_nothing(tmp_path):
+    path = str(tmp_path / "flow.jsonl")
+    checkpoint_flow(path, ["completed", "completed"])
+    flow, executed = resume_flow(path)
+
+    result = asyncio.run(flow.execute(""))
+    assert result == "No steps executed: flow already finished"
+    assert executed == []
+
+
+def test_resume_without_a_plan_runs_nothing(tmp_path):
+    path = str(tmp_path / "flow.jsonl")
+    checkpoint_flow(path, ["completed"])
+    flow, executed = resume_flow(path)
+    flow.planning_tool.plans.clear()
+
+    result = asyncio.run(flow.execute(""))
+    assert result == "No steps executed: no plan to resume"
+    assert executed == []
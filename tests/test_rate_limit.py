@@ -0,0 +1,84 @@
+import asyncio
+
+import httpx
+from openai import BadRequestError, InternalServerError, RateLimitError
+
+from app.rate_limit import Priority, RateLimiter
+from app.retry import RetryBudget, is_retryable, retry_after_seconds
+from app.token_counter import count_text_tokens
+
+
+def _error(cls, status: int, headers=None):
+    response = httpx.Response(
+        status, headers=headers, request=httpx.Request("POST", "http://stub/v1")
+    )
+    return cls("error", response=response, body=None)
+
+
+def test_interactive_requests_overtake_waiting_background_ones():
+    async def main():
+        limiter = RateLimiter(rpm=6000)
+        limiter.requests.level = 0
+        order = []
+
+        async def request(name, priority):
+            await limiter.acquire(priority=priority)
+            order.append(name)
+
+        background = [
+            asyncio.create_task(request(f"background-{i}", Priority.BACKGROUND))
+            for i in range(2)
+        ]
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(request("interactive", Priority.INTERACTIVE))
+        await asyncio.gather(*background, interactive)
+        return order
+
+    assert asyncio.run(main()) == ["interactive", "background-0", "background-1"]
+
+
+def test_cancelled_waiter_does_not_block_the_queue():
+    async def main():
+        limiter = RateLimiter(rpm=6000)
+        limiter.requests.level = 0
+        first = asyncio.create_task(limiter.acquire())
+        second = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.wait_for(second, timeout=1)
+
+    asyncio.run(main())
+
+
+def test_streamed_completion_tokens_are_charged(stub_client, make_llm, monkeypatch):
+    llm = make_llm(stub_client(), tpm=100000)
+    charged = []
+    monkeypatch.setattr(llm.rate_limiter, "record_usage", charged.append)
+
+    async def main():
+        return await llm.ask([{"role": "user", "content": "hello"}], stream=True)
+
+    reply = asyncio.run(main())
+    assert charged == [count_text_tokens(reply)]
+
+
+def test_only_transient_errors_are_retryable():
+    assert is_retryable(_error(InternalServerError, 503))
+    assert is_retryable(_error(RateLimitError, 429))
+    assert not is_retryable(_error(BadRequestError, 400))
+    assert not is_retryable(ValueError("bad response"))
+
+
+def test_retry_after_header_is_read():
+    assert retry_after_seconds(_error(RateLimitError, 429, {"retry-after": "3"})) == 3
+    error = _error(RateLimitError, 429, {"retry-after-ms": "250"})
+    assert retry_after_seconds(error) == 0.25
+
+
+def test_retry_budget_caps_retries():
+    budget = RetryBudget(ratio=0.5, min_per_minute=1)
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    budget.record_request()
+    budget.record_request()
+    assert budget.try_spend()
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_upstream_call():
+    async def main():
+        flight = SingleFlight()
+        calls = 0
+
+        async def upstream():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("k", upstream) for _ in range(3)))
+        assert results == ["result"] * 3
+        assert calls == 1
+        assert flight.stats() == {"started": 1, "coalesced": 2, "in_flight": 0}
+
+    asyncio.run(main())
+
+
+def test_upstream_survives_one_caller_cancelling():
+    async def main():
+        flight = SingleFlight()
+
+        async def upstream():
+            await asyncio.sleep(0.01)
+            return "result"
+
+        first = asyncio.create_task(flight.do("k", upstream))
+        second = asyncio.create_task(flight.do("k", upstream))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "result"
+        assert first.cancelled()
+
+    asyncio.run(main())
+
+
+def test_upstream_is_cancelled_when_the_last_caller_leaves():
+    async def main():
+        flight = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def upstream():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.create_task(flight.do("k", upstream)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        assert flight.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_failure_reaches_every_caller_and_releases_the_key():
+    async def main():
+        flight = SingleFlight()
+
+        async def upstream():
+            await asyncio.sleep(0)
+            raise RuntimeError("upstream failed")
+
+        results = await asyncio.gather(
+            flight.do("k", upstream), flight.do("k", upstream), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flight.in_flight == 0
+        with pytest.raises(RuntimeError):
+            await flight.do("k", upstream)
+        assert flight.started == 2
+
+    asyncio.run(main())
+
+
+def test_identical_llm_requests_reach_the_provider_once(stub_client, make_llm):
+    client = stub_client(ttft=0.05)
+    llm = make_llm(client)
+    messages = [{"role": "user", "content": "hello"}]
+
+    async def main():
+        return await asyncio.gather(
+            llm.ask(messages, stream=False), llm.ask(messages, stream=False)
+        )
+
+    first, second = asyncio.run(main())
+    assert first == second
+    assert len(client.sent) == 1
@@ -0,0 +1,29 @@
+import pytest
+
+from app.exceptions import TokenLimitExceeded
+from app.token_counter import count_text_tokens
+
+
+def test_counts_plain_english_by_word():
+    assert count_text_tokens("The quick brown fox jumps over the lazy dog.") == 10
+
+
+def test_dense_text_counts_more_than_its_words():
+    # camelCase, base64 and hex split at every case or letter/digit change
+    assert count_text_tokens("getUserAccountBalanceHistory") >= 6
+    assert count_text_tokens("QWxhZGRpbjpvcGVuIHNlc2FtZQ==") >= 12
+    assert count_text_tokens("3fa9c1e2b7d04f6a") >= 10
+
+
+def test_indentation_is_counted():
+    assert count_text_tokens("        return x") > count_text_tokens("return x")
+
+
+def test_fit_to_context_keeps_a_margin(make_llm, stub_client):
+    llm = make_llm(stub_client(), context_window=1000, max_tokens=100)
+    message = {"role": "user", "content": "word " * 840}
+    llm.context_margin = 0
+    assert llm.fit_to_context([message]) == [message]
+    llm.context_margin = 0.1
+    with pytest.raises(TokenLimitExceeded):
+        llm.fit_to_context([message])
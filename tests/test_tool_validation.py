@@ -0,0 +1,47 @@
+import asyncio
+
+from app.tool.bash import Bash
+from app.tool.terminate import Terminate
+from app.tool.tool_collection import ToolCollection
+from app.tool.validation import compile_schema
+
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"query": {"type": "string"}, "limit": {"type": "integer"}},
+    "required": ["query"],
+}
+
+
+def test_accepts_declared_arguments():
+    assert compile_schema(SCHEMA)({"query": "x", "limit": 3}) == []
+
+
+def test_rejects_undeclared_arguments_by_default():
+    errors = compile_schema(SCHEMA)({"query": "x", "limt": 3})
+    assert errors == ["limt: unexpected parameter (allowed: limit, query)"]
+
+
+def test_allow_extra_accepts_undeclared_arguments():
+    assert compile_schema(SCHEMA, allow_extra=True)({"query": "x", "limt": 3}) == []
+
+
+def test_explicit_additional_properties_wins():
+    schema = {**SCHEMA, "additionalProperties": {"type": "string"}}
+    assert compile_schema(schema)({"query": "x", "tag": "a"}) == []
+    assert compile_schema(schema)({"query": "x", "tag": 1}) == [
+        "tag: expected string, got integer"
+    ]
+
+
+def test_collection_rejects_misspelled_parameter():
+    tools = ToolCollection(Terminate())
+    result = asyncio.run(
+        tools.execute(name="terminate", tool_input={"stauts": "success"})
+    )
+    assert "stauts: unexpected parameter" in result.error
+
+
+def test_collection_allows_extras_for_kwargs_tools():
+    tools = ToolCollection(Bash())
+    assert tools.validators["bash"]({"command": "ls", "timeout": 5}) == []
@@ -0,0 +1,143 @@
+import asyncio
+import json
+
+import pytest
+
+
+pytest.importorskip("browser_use")
+
+from app.agent.toolcall import ToolCallAgent
+from app.schema import AgentState, Function, ToolCall
+from app.tool import BaseTool, Terminate, ToolCollection
+
+
+class Lookup(BaseTool):
+    name: str = "lookup"
+    description: str = "Read something"
+    parameters: dict = {"type": "object", "properties": {"key": {"type": "string"}}}
+    read_only: bool = True
+
+    async def execute(self, key: str = "") -> str:
+        return f"value of {key}"
+
+
+class Write(BaseTool):
+    name: str = "write"
+    description: str = "Change something"
+    parameters: dict = {"type": "object", "properties": {"key": {"type": "string"}}}
+
+    async def execute(self, key: str = "") -> str:
+        return f"wrote {key}"
+
+
+def make_agent(*tools: BaseTool) -> ToolCallAgent:
+    agent = ToolCallAgent()
+    agent.available_tools = ToolCollection(*tools)
+    return agent
+
+
+def call(call_id: str, name: str, **arguments) -> ToolCall:
+    return ToolCall(
+        id=call_id, function=Function(name=name, arguments=json.dumps(arguments))
+    )
+
+
+def test_early_dispatch_starts_only_leading_read_only_calls():
+    async def main():
+        agent = make_agent(Lookup(), Write(), Terminate())
+        agent._dispatch_early(call("c1", "lookup", key="a"))
+        agent._dispatch_early(call("c2", "write", key="a"))
+        agent._dispatch_early(call("c3", "lookup", key="a"))
+        assert list(agent._early_results) == ["c1"]
+        assert await agent._early_results["c1"] == (
+            "Observed output of cmd `lookup` executed:\nvalue of a"
+        )
+
+    asyncio.run(main())
+
+
+def test_early_dispatch_never_starts_special_tools():
+    async def main():
+        agent = make_agent(Lookup(), Terminate())
+        agent._dispatch_early(call("c1", "terminate", status="success"))
+        await asyncio.sleep(0)
+        assert agent._early_results == {}
+        assert agent.state == AgentState.IDLE
+
+    asyncio.run(main())
+
+
+def test_stream_error_cancels_and_reopens_early_dispatch():
+    async def main():
+        agent = make_agent(Lookup(), Write())
+        agent._dispatch_early(call("c1", "lookup", key="a"))
+        agent._dispatch_early(call("c2", "write", key="a"))
+        task = agent._early_results["c1"]
+        agent._cancel_early_results()
+        await asyncio.sleep(0)
+        assert task.cancelled()
+        # The retried stream dispatches its calls afresh
+        agent._dispatch_early(call("c3", "lookup", key="b"))
+        assert list(agent._early_results) == ["c3"]
+        await agent._early_results["c3"]
+
+    asyncio.run(main())
+
+
+EVENTS: list = []
+
+
+class Probe(BaseTool):
+    """Records when each call starts and ends, and how many overlap"""
+
+    description: str = "Probe"
+    parameters: dict = {"type": "object", "properties": {"key": {"type": "string"}}}
+    running: int = 0
+    peak: int = 0
+
+    async def execute(self, key: str = "") -> str:
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        EVENTS.append(f"start {key}")
+        await asyncio.sleep(0.01)
+        EVENTS.append(f"end {key}")
+        self.running -= 1
+        return key
+
+
+def run_calls(agent: ToolCallAgent, *commands: ToolCall) -> list:
+    results = asyncio.run(agent._execute_tool_calls(list(commands)))
+    return [result.rsplit("\n", 1)[-1] for result in results]
+
+
+def test_read_only_calls_overlap_and_return_in_call_order():
+    probe = Probe(name="read", read_only=True)
+    agent = make_agent(probe)
+    results = run_calls(agent, *(call(f"c{i}", "read", key=str(i)) for i in range(3)))
+    assert results == ["0", "1", "2"]
+    assert probe.peak == 3
+
+
+def test_calls_on_one_resource_are_serialized():
+    probe = Probe(name="browse", read_only=True, resource="browser")
+    agent = make_agent(probe)
+    results = run_calls(agent, *(call(f"c{i}", "browse", key=str(i)) for i in range(3)))
+    assert results == ["0", "1", "2"]
+    assert probe.peak == 1
+
+
+def test_a_mutating_call_waits_for_earlier_calls_and_runs_alone():
+    EVENTS.clear()
+    read = Probe(name="read", read_only=True)
+    write = Probe(name="write")
+    agent = make_agent(read, write)
+    results = run_calls(
+        agent,
+        call("c1", "read", key="r1"),
+        call("c2", "read", key="r2"),
+        call("c3", "write", key="w"),
+        call("c4", "read", key="r3"),
+    )
+    assert results == ["r1", "r2", "w", "r3"]
+    assert read.peak == 2
+    assert EVENTS[4:] == ["start w", "end w", "start r3", "end r3"]